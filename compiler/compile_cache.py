@@ -0,0 +1,179 @@
+# cranks c compiler
+# caches on disk. content addressed.
+#   CompileCache     compiled programs. by the source
+#   FunctionCache    the asm of one function. by its ir
+
+import os
+import json
+import shutil
+import hashlib
+import contextlib
+
+from compiler.ir import DataItem
+
+COMPILER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+compiler_digest_memo = None
+
+
+def compiler_digest():
+    # the version of the compiler is its own sources. the python files and the runtime libraries.
+    global compiler_digest_memo
+    if compiler_digest_memo is None:
+        digest = hashlib.sha256()
+        for file_name in sorted(os.listdir(COMPILER_DIR)):
+            if os.path.splitext(file_name)[1] in ['.py', '.asm', '.s']:
+                digest.update(file_name.encode('utf8'))
+                with open(os.path.join(COMPILER_DIR, file_name), 'rb') as f:
+                    digest.update(f.read())
+
+        compiler_digest_memo = digest.hexdigest()
+
+    return compiler_digest_memo
+
+
+class CompileCache:
+    # key = hash of the source without comments, the compiler and the target options
+    # entry = a folder named by the key. the asm and the exe of one compile.
+
+    # a hit touches the folder. once the cache is over max_bytes the least recently used go.
+    # an entry is written to a temp folder and moved in place. workers may share the cache.
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = {'hit':0, 'miss':0, 'store':0, 'evict':0}
+
+    def key(self, source, options):
+        digest = hashlib.sha256(compiler_digest().encode('utf8'))
+        for option in options:
+            digest.update(f'{option}\0'.encode('utf8'))
+
+        digest.update(source.encode('utf8'))
+        return digest.hexdigest()[:32]
+
+    def fetch(self, key, output_dir, files):
+        # files: name in the entry -> name in output_dir. True when all were there.
+        folder = os.path.join(self.directory, key)
+        try:
+            for entry_name, output_name in files.items():
+                shutil.copy2(os.path.join(folder, entry_name), os.path.join(output_dir, output_name))
+        except OSError:
+            # no entry, a partial one, or another worker evicted it just now
+            self.stats['miss'] += 1
+            return False
+
+        os.utime(folder)
+        self.stats['hit'] += 1
+        return True
+
+    def store(self, key, output_dir, files):
+        # after a build that made all the files. nothing is stored when one is missing.
+        if not all(os.path.exists(os.path.join(output_dir, output_name)) for output_name in files.values()):
+            return
+
+        folder = os.path.join(self.directory, key)
+        temp = f'{folder}.{os.getpid()}.tmp'
+        shutil.rmtree(temp, ignore_errors = True)
+        os.makedirs(temp)
+        for entry_name, output_name in files.items():
+            shutil.copy2(os.path.join(output_dir, output_name), os.path.join(temp, entry_name))
+
+        # a store only follows a miss. an entry still there is stale or partial.
+        shutil.rmtree(folder, ignore_errors = True)
+        try:
+            os.replace(temp, folder)
+            self.stats['store'] += 1
+        except OSError:
+            # another worker stored the same entry in between
+            shutil.rmtree(temp, ignore_errors = True)
+
+        self.evict()
+
+    def evict(self):
+        entries = [] # (last use, bytes, folder)
+        for name in os.listdir(self.directory):
+            folder = os.path.join(self.directory, name)
+            if os.path.isdir(folder) and not name.endswith('.tmp'):
+                size = sum(entry.stat().st_size for entry in os.scandir(folder))
+                entries.append((os.stat(folder).st_mtime, size, folder))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, folder in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            shutil.rmtree(folder, ignore_errors = True)
+            total -= size
+            self.stats['evict'] += 1
+
+    def report(self):
+        return ' '.join(f'{name} = {count}' for name, count in self.stats.items())
+
+
+class FunctionCache:
+    # key = hash of the ir of one function after the module passes, the compiler and the target
+    # entry = a json file. the lines of the function after peephole and the data items it adds.
+
+    # the ir is all lowering sees of a function. inlined callees and folded constants are in it.
+    # labels and strings are named inside their function. a change to one function keeps the keys of the others.
+
+    # a hit touches the file. once the cache is over max_bytes the least recently used go.
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = {'hit':0, 'miss':0, 'store':0, 'evict':0}
+
+    def key(self, function_ir, options):
+        digest = hashlib.sha256(compiler_digest().encode('utf8'))
+        for option in options:
+            digest.update(f'{option}\0'.encode('utf8'))
+
+        digest.update(function_ir.encode('utf8'))
+        return digest.hexdigest()[:32]
+
+    def fetch(self, key):
+        # (lines, data items) or None
+        path = os.path.join(self.directory, f'{key}.json')
+        try:
+            with open(path, 'r', encoding = 'utf8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.stats['miss'] += 1
+            return None
+
+        os.utime(path)
+        self.stats['hit'] += 1
+        return entry['lines'], [DataItem(*item) for item in entry['data']]
+
+    def store(self, key, lines, data):
+        os.makedirs(self.directory, exist_ok = True)
+        path = os.path.join(self.directory, f'{key}.json')
+        temp = f'{path}.{os.getpid()}.tmp'
+        with open(temp, 'w', encoding = 'utf8') as f:
+            json.dump({'lines': lines, 'data': [[item.kind, item.name, item.value, item.comment, item.const] for item in data]}, f)
+
+        os.replace(temp, path)
+        self.stats['store'] += 1
+        self.evict()
+
+    def evict(self):
+        entries = [] # (last use, bytes, path)
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            total -= size
+            self.stats['evict'] += 1
+
+    def report(self):
+        return ' '.join(f'{name} = {count}' for name, count in self.stats.items())
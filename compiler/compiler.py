@@ -11,236 +11,491 @@ import functools
 import subprocess
 # import locale
 import datetime
-import copy
 import pprint
 import json
-import inspect
+import time
+import hashlib
+import contextlib
+import concurrent.futures
+import multiprocessing
 
 import compiler.component as comp
 import compiler.tool as tool
+import compiler.lexer as lexer
+from compiler.packrat import PackratCache
+from compiler.compile_cache import CompileCache, FunctionCache
+from compiler.ir import IRModule, IRBuilder
+from compiler.inline import Inlining
+from compiler.constfold import ConstantFolding
+from compiler.loopopt import LoopOptimization
+from compiler.dce import DeadCodeElimination
+from compiler.lowering import Lowering
+from compiler.lowering_linux import LinuxLowering
+from compiler.peephole import Peephole
 from compiler.tool import CompilerError, CodeError, Color
 
 
 class Scope:
+    # names of one block. outer is the Scope of the enclosing block,
+    # an empty dict for the global scope.
+    # entering a block links a new Scope to its outer one. nothing is copied.
+
     def __init__(self, outer = {}):
         self.current = {}
         self.outer = outer
-        self.variable_stack_size = 0
 
     def __repr__(self):
-        return f'current = {pprint.pformat(self.current)}\nouter = {pprint.pformat(self.outer)}\nvariable_stack_size = {self.variable_stack_size}'
+        return f'current = {pprint.pformat(self.current)}\nouter = {pprint.pformat(self.outer)}'
+
+    def get(self, name, default = None):
+        # walk the chain from this block out to the global scope
+        scope = self
+        while isinstance(scope, Scope):
+            item = scope.current.get(name, None)
+            if item is not None:
+                return item
+
+            scope = scope.outer
+
+        return default
+
+
+class TypedefScopes:
+    # typedef names seen while parsing. one dict per block.
+
+    # every change goes to an undo log. a snapshot is the log length and
+    # rolling back undoes the newer changes, so save()/load() copy nothing.
+
+    # version identifies the current content. a new change gets a new version,
+    # rolling back restores the old one.
+
+    def __init__(self):
+        self.scopes = [{}]
+        self.undo_log = [] # (action, data, version before the change)
+        self.version = 0
+        self.version_count = 0
+
+    def __repr__(self):
+        return f'TypedefScopes version = {self.version} scopes = {pprint.pformat(self.scopes)}'
+
+    def new_version(self, action, data):
+        self.undo_log.append((action, data, self.version))
+        self.version_count += 1
+        self.version = self.version_count
+
+    def enter(self):
+        self.new_version('enter', None)
+        self.scopes.append({})
+
+    def leave(self):
+        self.new_version('leave', self.scopes.pop())
+
+    def add(self, item):
+        current = self.scopes[-1]
+        self.new_version('add', (item['name'], current.get(item['name'], None)))
+        current[item['name']] = item
+
+    def get(self, name):
+        for scope in reversed(self.scopes):
+            item = scope.get(name, None)
+            if item is not None:
+                return item
+
+        return None
+
+    def snapshot(self):
+        return len(self.undo_log), self.version
+
+    def rollback(self, snapshot):
+        log_len, version = snapshot
+
+        while len(self.undo_log) > log_len:
+            action, data, self.version = self.undo_log.pop()
+            if action == 'enter':
+                self.scopes.pop()
+            elif action == 'leave':
+                self.scopes.append(data)
+            else: # add
+                name, old_item = data
+                if old_item is None:
+                    del self.scopes[-1][name]
+                else:
+                    self.scopes[-1][name] = old_item
+
+        if self.version != version:
+            # the log was rolled back past this snapshot and grew again
+            raise CompilerError(f'stale typedef snapshot {snapshot} version = {self.version}')
+
+
+# where cranks_libc.asm and cranks_libc_linux.s are
+COMPILER_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(COMPILER_DIR) # has test_case and output
+
+
+# target -> lowering
+#   windows    ml64 and link. microsoft abi. cranks_libc.asm
+#   linux      gnu as and ld. system v abi. cranks_libc_linux.s
+TARGETS = {'windows': Lowering, 'linux': LinuxLowering}
 
 
 class Compiler:
-    def __init__(self, ml64_path, win_sdk_lib_path):
+    def __init__(self, ml64_path, win_sdk_lib_path, target = 'windows'):
+        if target not in TARGETS:
+            raise CompilerError(f'unknown target {target}. one of {", ".join(TARGETS)}')
+
         self.ml64_path = ml64_path
         self.win_sdk_lib_path = win_sdk_lib_path
+        self.target = target
+        self.whole_program = True # the module is all of the program. see compile_object
+        self.tool_versions = {} # assembler or linker command -> version text
         self.depth = 0
         self.print_depth = False
-        self.print_on = True
+        self.log = tool.DebugLog()
         self.silent_test = True
         self.saved_index = None
-        self.source_file_index = None
         self.source_file_buffer = None
         self.source_file_buffer_len = None
+        self.tokens = None
+        self.token_index = 0
         self.keywords = {'auto', 'double', 'int', 'struct', 'break', 'else', 'long', 'switch', 'case', 'enum',
                          'register', 'typedef', 'char', 'extern', 'return', 'union', 'const', 'float', 'short',
                          'unsigned', 'continue', 'for', 'signed', 'void', 'default', 'goto', 'sizeof', 'volatile', 'do',
                          'if', 'static', 'while'}
-        self.hex_digits = '0123456789abcdefABCDEF'
 
         # self.out_f = open('./output/cranks_compiler.log', 'w', encoding = 'utf8')
-        self.asm_head = io.StringIO()
-        self.asm_data = io.StringIO()  # .data
-        self.asm_code = io.StringIO()  # .code
+        # ir of the current compile. components build it. lowering turns it into asm
+        self.ir = IRBuilder(IRModule())
 
         self.current_function = None
         self.current_lineno = 1
 
-        # for label name
-        # todo
-        self.item_id = 0
-
-        # two set for each scope. current and outer
+        # each scope has its own names and a link to the outer scope
 
         # default ({}, {})
-        #     scope A ({A}, {})
-        #         scope B ({B}, {A})
-        #             scope C ({C}, {AB})
-        #                 scope D ({D}, {ABC})
-        #         scope E ({E}, {A})
+        #     scope A ({A}, default)
+        #         scope B ({B}, A)
+        #             scope C ({C}, B)
+        #                 scope D ({D}, C)
+        #         scope E ({E}, A)
 
-        # for gen_asm
+        # for gen_ir
         self.scopes = [Scope()] # default empty
 
         # for typedef in parsing
-        self.typedef_scopes = [Scope()]
+        self.typedef_scopes = TypedefScopes()
+
+        # memo for grammar methods. opt-in. see set_packrat_on_off
+        self.packrat = None
+
+        # compiled programs on disk. opt-in. see set_compile_cache_on_off
+        self.compile_cache = None
+
+        # asm of functions on disk. opt-in. see set_function_cache_on_off
+        self.function_cache = None
+
+        # absolute. the working directory does not matter. the cache has the runtime object. shared by the workers
+        self.set_dirs(os.path.join(REPO_DIR, 'test_case'), os.path.join(REPO_DIR, 'output'))
+
+    def __deepcopy__(self, memo):
+        # components keep a reference to the compiler. copying them must not clone the compiler.
+        return self
 
     def init(self):
         self.depth = 0
-        self.asm_head = io.StringIO()
-        self.asm_data = io.StringIO()  # .data
-        self.asm_code = io.StringIO()  # .code
+        self.ir = IRBuilder(IRModule())
         self.current_function = None
         self.current_lineno = 1
-        self.item_id = 0
         self.scopes = [Scope()]  # default empty
-        self.source_file_index = -1
+        self.typedef_scopes = TypedefScopes()
+        self.tokens = None
+        if self.packrat is not None:
+            self.packrat.clear()
+        self.token_index = 0
 
     def enter_scope(self):
-        # combine to new_outer
-        new_outer = copy.deepcopy(self.scopes[-1].outer)
-        new_outer.update(self.scopes[-1].current)
-        self.scopes.append(Scope(new_outer))
+        self.scopes.append(Scope(self.scopes[-1]))
 
     def leave_scope(self):
         self.scopes.pop()
 
-    def add_function_stack_offset(self, offset):
-        self.current_function.offset += offset
-        return self.current_function.offset
-
-    def get_function_stack_offset(self):
-        return self.current_function.offset
-
     def enter_typedef_scope(self):
-        # combine to new_outer
-        new_outer = copy.deepcopy(self.typedef_scopes[-1].outer)
-        new_outer.update(self.typedef_scopes[-1].current)
-        self.typedef_scopes.append(Scope(new_outer))
+        self.typedef_scopes.enter()
 
     def leave_typedef_scope(self):
-        self.typedef_scopes.pop()
+        self.typedef_scopes.leave()
 
     def add_to_typedef_scope(self, item):
-        self.typedef_scopes[-1].current[item['name']] = item
+        self.typedef_scopes.add(item)
 
 
     def go_deep(func):
+        # depth and trace for the recursive rules. declarations and types.
+        # rule tracing is compiled out with python -O. the rule is called directly.
+        if not tool.DEBUG_LOG:
+            return func
+
+        rule = func.__name__
+
         @functools.wraps(func)
         def do_go_deep(self, *args, **kwargs):
             self.depth += 1
-            if self.depth > 100:
-                # self.dbg('fuck depth')
-                # exit(0)
-                raise CompilerError(f'fuck depth [{self.depth}]')
+
+            trace = self.log.enabled('parser')
+            if trace:
+                self.trace_rule(rule, '')
+
             ret = func(self, *args, **kwargs)
+
+            if trace:
+                self.trace_rule(rule, 'return {}', (ret,))
+
             self.depth -= 1
             return ret
 
         return do_go_deep
 
-    def set_print_on_off(self, on_off):
-        self.print_on = on_off
-        comp.NoObject.print_on = on_off
+    def stack_rule(func):
+        # rule written as a generator. statements and expressions nest without limit,
+        # so they do not use the python stack. a stack rule calls another one with
+        #     exp = yield self.get_expression
+        #     ce = yield self.get_conditional_expression, (cast,)
+        # and gets its return value back. run_stack_rules keeps the callers on a list.
+
+        # calling it like a normal method runs it and every stack rule below it.
+
+        @functools.wraps(func)
+        def do_stack_rule(self, *args):
+            return self.run_stack_rules(do_stack_rule, args)
+
+        do_stack_rule.generator = func
+        do_stack_rule.memo = False # see packrat_memo
+        return do_stack_rule
+
+    def run_stack_rules(self, rule, args):
+        trace = tool.DEBUG_LOG and self.log.enabled('parser')
+
+        frames = [] # (generator, rule name, packrat key) of the running rules
+        call = (rule, args)
+        value = None
 
-    def dbg(self, text):
-        # inspect.stack()[0][3] is function name
-        if self.print_on:
-            if self.print_depth:
-                # print(f'\33[38;5;1m[depth = {self.depth:04}]{" " * (self.depth * 2)}{text}')
-                print(f'[depth = {self.depth:04}]{" " * (self.depth * 2)}{inspect.stack()[1][3]} {text}')
+        while True:
+            if call is not None:
+                rule, args = call
+                call = None
+                name = rule.__name__
+
+                key = None
+                entry = None
+                if rule.memo and self.packrat is not None:
+                    key = (name, self.token_index, self.typedef_scopes.version, args, ())
+                    entry = self.packrat.get(key)
+
+                if entry is not None:
+                    value, self.token_index, self.current_lineno = entry
+                    if not frames:
+                        return value
+                else:
+                    self.depth += 1
+                    if trace:
+                        self.trace_rule(name, '')
+
+                    frames.append((rule.generator(self, *args), name, key))
+                    value = None
+
+            generator, name, key = frames[-1]
+
+            try:
+                request = generator.send(value)
+            except StopIteration as stop:
+                value = stop.value
+                frames.pop()
+
+                if trace:
+                    self.trace_rule(name, 'return {}', (value,))
+
+                self.depth -= 1
+
+                if key is not None:
+                    if self.typedef_scopes.version == key[2]:
+                        self.packrat.put(key, (value, self.token_index, self.current_lineno))
+                    else:
+                        self.packrat.skip(name)
+
+                if not frames:
+                    return value
+
+                continue
+
+            if type(request) is tuple:
+                call = request
             else:
-                print(f'{inspect.stack()[1][3]} {text}')
+                call = (request, ())
 
-    def print_normal(self, text):
-        if self.print_on:
-            print(f'{text}')
+    def packrat_memo(func):
+        # reuse the result of a rule already tried at the same token index
+        # stack rules are memoized by run_stack_rules
+        if hasattr(func, 'generator'):
+            func.memo = True
+            return func
 
-    def print_red(self, text):
-        if self.print_on:
-            print(f'{Color.red}{text}{Color.end}')
+        rule = func.__name__
 
-    def print_yellow(self, text):
-        if self.print_on:
-            print(f'{Color.yellow}{text}{Color.end}')
+        @functools.wraps(func)
+        def do_packrat_memo(self, *args, **kwargs):
+            if self.packrat is None:
+                return func(self, *args, **kwargs)
 
-    def print_green(self, text):
-        if self.print_on:
-            print(f'{Color.green}{text}{Color.end}')
+            version = self.typedef_scopes.version
+            key = (rule, self.token_index, version, args, tuple(kwargs.items()))
 
-    def print_orange(self, text):
-        if self.print_on:
-            print(f'{Color.orange}{text}{Color.end}')
+            entry = self.packrat.get(key)
+            if entry is not None:
+                ret, self.token_index, self.current_lineno = entry
+                return ret
 
-    def dbg_ok(self, text):
-        if self.print_depth:
-            self.print_green(f'[depth = {self.depth:04}]{" " * (self.depth * 2)}{text}')
+            ret = func(self, *args, **kwargs)
+
+            if self.typedef_scopes.version == version:
+                self.packrat.put(key, (ret, self.token_index, self.current_lineno))
+            else:
+                self.packrat.skip(rule)
+
+            return ret
+
+        return do_packrat_memo
+
+    def set_packrat_on_off(self, on_off, max_size = 100000):
+        if on_off:
+            self.packrat = PackratCache(max_size)
         else:
-            self.print_green(f'{text}')
+            self.packrat = None
+
+    def set_dirs(self, source_dir, output_dir, cache_dir = None):
+        # sources and .ans files come from source_dir. asm, objects and exes go to output_dir
+        # cache_dir default = output_dir/cache. all are made absolute
+        self.source_dir = os.path.abspath(source_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.cache_dir = os.path.abspath(cache_dir or os.path.join(output_dir, 'cache'))
+        if self.compile_cache is not None:
+            self.compile_cache.directory = os.path.join(self.cache_dir, 'compile')
+        if self.function_cache is not None:
+            self.function_cache.directory = os.path.join(self.cache_dir, 'function')
+
+    def set_compile_cache_on_off(self, on_off, max_bytes = 64 << 20):
+        # in cache_dir/compile
+        if on_off:
+            self.compile_cache = CompileCache(os.path.join(self.cache_dir, 'compile'), max_bytes)
+        else:
+            self.compile_cache = None
 
-    def dbg_fail(self, text):
-        if self.print_depth:
-            self.print_red(f'[depth = {self.depth:04}]{" " * (self.depth * 2)}{text}')
+    def set_function_cache_on_off(self, on_off, max_bytes = 64 << 20):
+        # in cache_dir/function
+        if on_off:
+            self.function_cache = FunctionCache(os.path.join(self.cache_dir, 'function'), max_bytes)
         else:
-            self.print_red(f'{text}')
+            self.function_cache = None
 
-    def dbg_yellow(self, text):
+    def set_print_on_off(self, on_off):
+        self.log.print_on = on_off
+        comp.NoObject.print_on = on_off
+
+    def set_log_channel_on_off(self, channel, on_off):
+        # channels: lexer parser codegen
+        self.log.set_channel_on_off(channel, on_off)
+
+    # text is a str.format template. args are formatted only when the output is on.
+    # dbg('ce = {}', ce) costs nothing in a silent build. dbg(f'ce = {ce}') builds the repr anyway.
+
+    def depth_text(self, text, args = ()):
         if self.print_depth:
-            self.print_yellow(f'[depth = {self.depth:04}]{" " * (self.depth * 2)}{text}')
+            # print(f'\33[38;5;1m[depth = {self.depth:04}]{" " * (self.depth * 2)}{text}')
+            return f'[depth = {self.depth:04}]{" " * (self.depth * 2)}{tool.format_log(text, args)}'
         else:
-            self.print_yellow(f'{text}')
+            return tool.format_log(text, args)
+
+    def trace_rule(self, rule, text, args = ()):
+        print(self.depth_text(f'{rule} {tool.format_log(text, args)}'))
+
+    def dbg(self, text, *args):
+        # parser channel. prefixed with the calling method name
+        if tool.DEBUG_LOG and self.log.enabled('parser'):
+            self.trace_rule(sys._getframe(1).f_code.co_name, text, args)
+
+    def print_normal(self, text, *args):
+        if self.log.print_on:
+            print(tool.format_log(text, args))
+
+    def print_red(self, text, *args):
+        if self.log.print_on:
+            print(tool.format_log(text, args, Color.red))
+
+    def print_yellow(self, text, *args):
+        if self.log.print_on:
+            print(tool.format_log(text, args, Color.yellow))
+
+    def print_green(self, text, *args):
+        if self.log.print_on:
+            print(tool.format_log(text, args, Color.green))
+
+    def print_orange(self, text, *args):
+        if self.log.print_on:
+            print(tool.format_log(text, args, Color.orange))
+
+    def dbg_ok(self, text, *args):
+        if self.log.print_on:
+            print(tool.format_log(self.depth_text(text, args), color = Color.green))
+
+    def dbg_fail(self, text, *args):
+        if self.log.print_on:
+            print(tool.format_log(self.depth_text(text, args), color = Color.red))
+
+    def dbg_yellow(self, text, *args):
+        if self.log.print_on:
+            print(tool.format_log(self.depth_text(text, args), color = Color.yellow))
 
     def error(self, text):
         tool.print_orange(f'{text}')
         sys.exit(0)
 
-    def getc(self):
-        self.source_file_index += 1
-
-        if self.source_file_index < self.source_file_buffer_len:
-            c = self.source_file_buffer[self.source_file_index]
-            if c == '\n':
-                self.current_lineno += 1
-                # self.dbg(f'{self.current_lineno = }')
+    def tokenize(self):
+        self.tokens = lexer.Lexer(self.source_file_buffer, self.log).tokenize()
+        self.token_index = 0
 
-            self.dbg(f'return {c = }')
-            return c
+    def next_token(self):
+        # the last token is EOF. never move past it.
+        token = self.tokens[self.token_index]
+        if token.kind != lexer.EOF:
+            self.token_index += 1
+            self.current_lineno = token.line
 
-        return None
-
-    def getc_skip_white(self):
-        while True:
-            c = self.getc()
-            if c.isspace():
-                self.dbg('space')
-            else:
-                return c
+        return token
 
-    def skip_white(self):
-        while True:
-            c = self.getc()
-            if c is None:
-                return False
+    def now_at_end(self):
+        return self.tokens[self.token_index].kind == lexer.EOF
 
-            if not c.isspace():
-                self.source_file_index -= 1
-                return True
+    type_name_keywords = {'void', 'char', 'short', 'int', 'long', 'float', 'double', 'signed', 'unsigned',
+                          'struct', 'union', 'enum', 'const', 'volatile'}
 
-    def now_all_white(self):
-        self.dbg(f'')
-        index = self.source_file_index
-        while True:
-            index += 1
-            if index >= self.source_file_buffer_len:
-                return True
+    def now_at_type_name(self):
+        # type-specifier or type-qualifier. see get_specifier_qualifier_list
+        token = self.tokens[self.token_index]
+        if token.kind != lexer.IDENTIFIER:
+            return False
 
-            c = self.source_file_buffer[index]
-            if not c.isspace():
-                self.dbg(f'not c.isspace() {c}')
-                return False
+        return token.value in self.type_name_keywords or self.typedef_scopes.get(token.value) is not None
 
     def save(self):
-        return self.source_file_index, self.current_lineno, copy.deepcopy(self.typedef_scopes)
+        return self.token_index, self.current_lineno, self.typedef_scopes.snapshot()
 
     def load(self, save_data):
-        self.source_file_index, self.current_lineno, self.typedef_scopes = save_data
+        self.token_index, self.current_lineno, typedef_snapshot = save_data
+        self.typedef_scopes.rollback(typedef_snapshot)
 
     def get_index(self):
-        return self.source_file_index
+        return self.token_index
 
     def set_index(self, index):
-        self.source_file_index = index
+        self.token_index = index
 
     def raise_code_error(self, msg = ''):
         raise CodeError(f'line {self.current_lineno}: {msg}')
@@ -249,13 +504,11 @@ class Compiler:
     @go_deep
     def get_template(self):
         # rule
-        self.dbg(f'')
         save_1 = self.save()
 
 
         # fail
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
@@ -263,8 +516,6 @@ class Compiler:
         # external-declaration
         # translation-unit external-declaration
 
-        self.dbg(f'')
-
         eds = []
 
         while True:
@@ -307,14 +558,11 @@ class Compiler:
             else:
                 self.load(save_1)
 
-                self.skip_white()
-
-                if not self.now_all_white():
+                if not self.now_at_end():
                     self.raise_code_error(f'get declaration failed')
 
                 break
 
-        self.dbg(f'return {eds}')
         return comp.TranslationUnit(self, eds)
 
     @go_deep
@@ -322,23 +570,19 @@ class Compiler:
         # function-definition
         # declaration # global
 
-        self.dbg(f'')
         save_1 = self.save()
 
         fd = self.get_function_definition()
         if fd:
-            self.dbg(f'return {fd}')
             return fd
 
         self.load(save_1)
 
         decl = self.get_declaration()
         if decl:
-            self.dbg(f'return {decl}')
             return decl
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
@@ -348,7 +592,6 @@ class Compiler:
         # declaration-list? is unusual, replace with
         # declaration-specifiers declarator compound-statement
 
-        self.dbg(f'')
         save_1 = self.save()
 
         dss = self.get_declaration_specifiers(for_what = 'function_definition')
@@ -360,18 +603,15 @@ class Compiler:
                 if cs:
                     # self.dbg_ok(f'get_function_definition return {(dss, declarator, dl, cs)}')
                     fd = comp.FunctionDefinition(self, dss, declarator, cs)
-                    self.dbg(f'return {(dss, declarator, cs)}')
                     return fd
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_declaration_list(self):
         # declaration
         # declaration-list declaration
-        self.dbg(f'')
         save_1 = self.save()
 
         decl = self.get_declaration()
@@ -382,51 +622,44 @@ class Compiler:
                 if decl:
                     decls.append(decl)
                 else:
-                    self.dbg(f'return {decls}')
                     return decls
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
-    @go_deep
+    @stack_rule
     def get_compound_statement(self):
         # { block-item-list }
 
-        self.dbg(f'')
         save_1 = self.save()
 
         self.enter_typedef_scope()
 
         if self.get_a_string('{'):
-            bil = self.get_block_item_list()
+            bil = yield self.get_block_item_list
             if self.get_a_string('}'):
-                self.dbg(f'return {bil}')
-
                 self.leave_typedef_scope()
                 # return bil
                 return comp.CompoundStatement(self, bil)
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
-    @go_deep
+    @stack_rule
     def get_block_item_list(self):
         # block-item
         # block-item-list block-item
-        self.dbg(f'')
         save_1 = self.save()
 
         bil = []
 
-        bi = self.get_block_item()
+        bi = yield self.get_block_item
         if bi:
             bil = [bi]
             while True:
                 save_2 = self.save()
 
-                bi = self.get_block_item()
+                bi = yield self.get_block_item
                 if bi:
                     bil.append(bi)
                 else:
@@ -435,14 +668,12 @@ class Compiler:
         else:
             self.load(save_1)
 
-        self.dbg(f'return {bil}')
         return bil
 
-    @go_deep
+    @stack_rule
     def get_block_item(self):
         # declaration
         # statement
-        self.dbg(f'')
         save_1 = self.save()
 
         decl = self.get_declaration()
@@ -456,21 +687,19 @@ class Compiler:
                     scope_item = {'name':typedef.name, 'data':typedef}
                     self.add_to_typedef_scope(scope_item)
 
-            self.dbg(f'return {decl}')
             return decl
 
         self.load(save_1)
 
-        stmt = self.get_statement()
+        stmt = yield self.get_statement
         if stmt:
-            self.dbg(f'return {stmt}')
             return stmt
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
-    @go_deep
+    @packrat_memo
+    @stack_rule
     def get_statement(self):
         # labeled-statement
         # compound-statement
@@ -479,110 +708,94 @@ class Compiler:
         # iteration-statement
         # jump-statement
 
-        self.dbg(f'')
         save_1 = self.save()
 
-        ls = self.get_labeled_statement()
+        ls = yield self.get_labeled_statement
         if ls:
-            self.dbg(f'return {ls}')
             return ls
 
-        cs = self.get_compound_statement()
+        cs = yield self.get_compound_statement
         if cs:
-            self.dbg(f'return {cs}')
             return cs
 
-        es = self.get_expression_statement()
+        es = yield self.get_expression_statement
         if es:
-            self.dbg(f'return {es}')
             return es
 
-        ss = self.get_selection_statement()
+        ss = yield self.get_selection_statement
         if ss:
-            self.dbg(f'return {ss}')
             return ss
 
-        its = self.get_iteration_statement()
+        its = yield self.get_iteration_statement
         if its:
-            self.dbg(f'return {its}')
             return its
 
-        js = self.get_jump_statement()
+        js = yield self.get_jump_statement
         if js:
-            self.dbg(f' return {js}')
             return js
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
-    @go_deep
+    @stack_rule
     def get_labeled_statement(self):
         # identifier : statement
         # case constant-expression : statement
         # default : statement
 
-        self.dbg(f'')
         save_1 = self.save()
 
         idf = self.get_identifier()
         if idf:
             if idf not in ['case', 'default']:
                 if self.get_a_string(':'):
-                    stmt = self.get_statement()
+                    stmt = yield self.get_statement
                     if stmt:
-                        self.dbg(f'return {"identifier", idf, stmt}')
                         return comp.LabeledStatement(self, [idf, stmt])
             elif idf == 'case':
-                ce = self.get_constant_expression()
+                ce = yield self.get_constant_expression
                 if ce:
                     if self.get_a_string(':'):
-                        stmt = self.get_statement()
+                        stmt = yield self.get_statement
                         if stmt:
-                            self.dbg(f'return {"case", ce, stmt}')
                             return comp.LabeledStatement(self, ['case', ce, stmt])
             elif idf == 'default':
                 if self.get_a_string(':'):
-                    stmt = self.get_statement()
+                    stmt = yield self.get_statement
                     if stmt:
-                        self.dbg(f'return {"default", stmt}')
                         return comp.LabeledStatement(self, ['default', stmt])
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
-    @go_deep
+    @stack_rule
     def get_iteration_statement(self):
         # while ( expression ) statement
         # do statement while ( expression ) ;
         # for ( expression? ; expression? ; expression? ) statement
         # for ( declaration expression? ; expression? ) statement
 
-        self.dbg(f'')
         save_1 = self.save()
 
         idf = self.get_identifier()
         if idf == 'while':
             if self.get_a_string('('):
-                exp = self.get_expression()
+                exp = yield self.get_expression
                 if exp:
                     if self.get_a_string(')'):
-                        stmt = self.get_statement()
+                        stmt = yield self.get_statement
                         if stmt:
-                            self.dbg(f'return {("while", exp, stmt)}')
                             return comp.IterationStatement(self, 0, exp_1 = exp, stmt = stmt)
         elif idf == 'do':
-            stmt = self.get_statement()
+            stmt = yield self.get_statement
             if stmt:
                 idf = self.get_identifier()
                 if idf == 'while':
                     if self.get_a_string('('):
-                        exp = self.get_expression()
+                        exp = yield self.get_expression
                         if exp:
                             if self.get_a_string(')'):
                                 if self.get_a_string(';'):
-                                    self.dbg(f'return {("do", stmt, "while", exp)}')
                                     return comp.IterationStatement(self, 1, exp_1 = exp, stmt = stmt)
         elif idf == 'for':
             if self.get_a_string('('):
@@ -594,98 +807,86 @@ class Compiler:
                 if not decl:
                     self.load(save_2)
 
-                    exp_1 = self.get_expression()
+                    exp_1 = yield self.get_expression
                     if not self.get_a_string(';'):
                         # fail
                         self.load(save_1)
-                        self.dbg(f'return comp.NoObject()')
                         return comp.NoObject()
 
-                exp_2 = self.get_expression()
+                exp_2 = yield self.get_expression
                 if self.get_a_string(';'):
-                    exp_3 = self.get_expression()
+                    exp_3 = yield self.get_expression
                     if self.get_a_string(')'):
-                        stmt = self.get_statement()
+                        stmt = yield self.get_statement
                         if stmt:
-                            self.dbg(f'return {("for", exp_1, exp_2, exp_3, stmt)}')
                             return comp.IterationStatement(self, 2, declaration = decl, exp_1 = exp_1, exp_2 = exp_2, exp_3 = exp_3, stmt = stmt)
 
         # fail
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
-    @go_deep
+    @stack_rule
     def get_selection_statement(self):
         # if ( expression ) statement
         # if ( expression ) statement else statement
         # switch ( expression ) statement
 
-        self.dbg(f'')
         save_1 = self.save()
 
         idf = self.get_identifier()
         if idf == 'if':
             if self.get_a_string('('):
-                exp = self.get_expression()
+                exp = yield self.get_expression
                 if exp:
                     if self.get_a_string(')'):
-                        stmt_1 = self.get_statement()
+                        stmt_1 = yield self.get_statement
                         if stmt_1:
                             save_2 = self.save()
                             idf = self.get_identifier()
                             if idf == 'else':
-                                stmt_2 = self.get_statement()
+                                stmt_2 = yield self.get_statement
                                 if stmt_2:
-                                    self.dbg(f'return {("if", exp, stmt_1, "else", stmt_2)}')
                                     return comp.SelectionStatement(self, exp = exp, stmt_1 = stmt_1, stmt_2 = stmt_2)
 
                             self.load(save_2)
-                            self.dbg(f'return {("if", exp, stmt_1)}')
                             return comp.SelectionStatement(self, exp = exp, stmt_1 = stmt_1)
         elif idf == 'switch':
             if self.get_a_string('('):
-                exp = self.get_expression()
+                exp = yield self.get_expression
                 if exp:
                     if self.get_a_string(')'):
-                        stmt_1 = self.get_statement()
+                        stmt_1 = yield self.get_statement
                         if stmt_1:
-                            self.dbg(f'return {("switch", exp, stmt_1)}')
                             return comp.SelectionStatement(self, switch = 'switch', exp = exp, stmt_1 = stmt_1)
 
         # fail
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
-    @go_deep
+    @stack_rule
     def get_expression_statement(self):
         # expression? ;
 
-        self.dbg(f'')
         save_1 = self.save()
 
-        exp = self.get_expression()
+        exp = yield self.get_expression
         # if exp is None:
         #     exp = []
 
         if self.get_a_string(';'):
-            self.dbg(f'return {exp}')
             return comp.ExpressionStatement(self, exp)
 
         # fail
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
-    @go_deep
+    @stack_rule
     def get_jump_statement(self):
         # goto identifier ;
         # continue ;
         # break ;
         # return expression? ;
 
-        self.dbg(f'')
         save_1 = self.save()
 
         idf = self.get_identifier()
@@ -695,46 +896,38 @@ class Compiler:
         if idf == 'goto':
             idf = self.get_identifier()
             if idf:
-                c = self.getc_skip_white()
-                if c == ';':
-                    self.dbg(f'return {("goto", idf)}')
+                if self.get_a_string(';'):
                     return comp.JumpStatement(self, cmd = 'goto', idf = idf)
 
         self.load(save_2)
 
         if idf == 'continue':
-            c = self.getc_skip_white()
-            if c == ';':
-                self.dbg(f'return {("continue", None)}')
+            if self.get_a_string(';'):
                 return comp.JumpStatement(self, cmd = 'continue')
 
         self.load(save_2)
 
         if idf == 'break':
-            c = self.getc_skip_white()
-            if c == ';':
-                self.dbg(f'return {("break", None)}')
+            if self.get_a_string(';'):
                 return comp.JumpStatement(self, cmd = 'break')
 
         self.load(save_2)
 
         if idf == 'return':
-            exp = self.get_expression()
+            exp = yield self.get_expression
             if exp:
                 pass
             else:
                 pass
 
-            c = self.getc_skip_white()
-            if c == ';':
-                self.dbg(f'return {("return", exp)}')
+            if self.get_a_string(';'):
                 return comp.JumpStatement(self, cmd = 'return', exp = exp)
 
         # fail
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
+    @packrat_memo
     @go_deep
     def get_declaration(self):
         # declaration-specifiers init-declarator-list? ;
@@ -745,7 +938,6 @@ class Compiler:
         # struct S3              s1, s2                ;
         # struct {int a, b;}     s1, s2                ;
 
-        self.dbg(f'')
         save_1 = self.save()
 
         dss = self.get_declaration_specifiers() # const int ...
@@ -754,20 +946,17 @@ class Compiler:
 
             if self.get_a_string(';'):
                 declaration = comp.Declaration(self, dss, idl)
-                self.dbg(f'return {(dss, idl)}')
                 # return dss, idl
                 return declaration
 
         # fail
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_init_declarator_list(self):
         # init-declarator
         # init-declarator-list , init-declarator
-        self.dbg(f'')
         save_1 = self.save()
 
         idt = self.get_init_declarator()
@@ -784,11 +973,9 @@ class Compiler:
                         continue
 
                 self.load(save_2)
-                self.dbg(f'return {idts}')
                 return idts
 
         # fail
-        self.dbg('return comp.NoObject()')
         self.load(save_1)
         return comp.NoObject()
 
@@ -797,7 +984,6 @@ class Compiler:
         # declarator
         # declarator = initializer
 
-        self.dbg(f'')
         save_1 = self.save()
 
         dtr = self.get_declarator()
@@ -808,23 +994,20 @@ class Compiler:
             if self.get_a_string('='):
                 init = self.get_initializer()
                 if init:
-                    self.dbg(f'return {(dtr, init)}')
                     return comp.InitDeclarator(self, dtr, init)
             else:
                 self.load(save_2)
-                self.dbg(f'return {(dtr, None)}')
                 return comp.InitDeclarator(self, dtr, comp.NoObject())
 
         # fail
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
+    @packrat_memo
     @go_deep
     def get_declarator(self, for_what = None):
         # pointer? direct-declarator
 
-        self.dbg(f'')
         save_1 = self.save()
 
         pointer = self.get_pointer()
@@ -835,11 +1018,9 @@ class Compiler:
 
         dd = self.get_direct_declarator(for_what = for_what)
         if dd:
-            self.dbg(f'return {(pointer, dd)}')
             return [pointer, dd]
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     # an object's property
@@ -868,8 +1049,6 @@ class Compiler:
         # direct-declarator ( parameter-type-list ) # function
         # direct-declarator ( identifier-list? ) # function # old style. but need this to match f()
 
-        self.dbg(f'')
-
         obj_data = {} # 'lv':1}
 
         idf = self.get_identifier()
@@ -884,7 +1063,6 @@ class Compiler:
                         data = [decl]
 
         if not idf:
-            self.dbg(f'return comp.NoObject()')
             return comp.NoObject()
 
         array_data = {'dim':0, 'ranks':[]}
@@ -897,7 +1075,7 @@ class Compiler:
                 if self.get_a_string(']'):
                     # data.append(ce)
 
-                    self.dbg(f'ce = {ce}')
+                    self.dbg('ce = {}', ce)
 
                     array_data['dim'] += 1
                     array_data['ranks'].append(ce)
@@ -934,15 +1112,12 @@ class Compiler:
         if array_data['dim'] > 0:
             obj_data['array_data'] = array_data
 
-        self.dbg(f'return {obj_data}')
-
         return obj_data
 
     @go_deep
     def get_identifier_list(self):
         # identifier
         # identifier-list , identifier
-        self.dbg(f'')
         save_1 = self.save()
 
         idfs = []
@@ -962,14 +1137,12 @@ class Compiler:
         else:
             self.load(save_1)
 
-        self.dbg(f'return {idfs}')
         return idfs
 
     @go_deep
     def get_parameter_type_list(self):
         # parameter-list
         # parameter-list , ...
-        self.dbg(f'')
         save_1 = self.save()
 
         pl = self.get_parameter_list()
@@ -977,22 +1150,18 @@ class Compiler:
             save_2 = self.save()
             if self.get_a_string(','):
                 if self.get_a_string('...'):
-                    self.dbg(f'return {(pl, "...")}')
                     return pl, "..."
 
             self.load(save_2)
-            self.dbg(f'return {(pl, None)}')
             return pl, None
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_parameter_list(self):
         # parameter-declaration
         # parameter-list , parameter-declaration
-        self.dbg(f'')
         save_1 = self.save()
 
         pd = self.get_parameter_declaration()
@@ -1009,33 +1178,27 @@ class Compiler:
                         continue
 
                 self.load(save_2)
-                self.dbg(f'return {pl}')
                 return pl
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_parameter_declaration(self):
         # declaration-specifiers declarator
         # declaration-specifiers abstract-declarator?
-        self.dbg(f'')
         save_1 = self.save()
 
         dss = self.get_declaration_specifiers()
         if dss:
             decl = self.get_declarator()
             if decl:
-                self.dbg(f'return {(dss, decl)}')
                 return dss, decl
 
             ad = self.get_abstract_declarator()
-            self.dbg(f'return {(dss, ad)}')
             return dss, ad
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
@@ -1044,12 +1207,10 @@ class Compiler:
         # { initializer-list }
         # { initializer-list , }
 
-        self.dbg(f'')
         save_1 = self.save()
 
         ae = self.get_assignment_expression()
         if ae:
-            self.dbg(f'return {ae}')
             return ae
 
         self.load(save_1)
@@ -1060,25 +1221,21 @@ class Compiler:
                 save_2 = self.save()
 
                 if self.get_a_string('}'):
-                    self.dbg(f'return {il}')
                     return il
 
                 self.load(save_2)
                 if self.get_a_string(','):
                     if self.get_a_string('}'):
-                        self.dbg(f'return {il}')
                         return il
 
         # fail
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_initializer_list(self):
         # designation? initializer
         # initializer-list , designation? initializer
-        self.dbg(f'')
         save_1 = self.save()
 
         dst = self.get_designation()
@@ -1105,27 +1262,22 @@ class Compiler:
                 self.load(save_2)
                 break
 
-            self.dbg(f'return {data}')
             return data
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_designation(self):
         # designator-list =
-        self.dbg(f'')
         save_1 = self.save()
 
         dstl = self.get_designator_list()
         if dstl:
             if self.get_a_string('='):
-                self.dbg(f'return {dstl}')
                 return dstl
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
 
@@ -1133,7 +1285,6 @@ class Compiler:
     def get_designator_list(self):
         # designator
         # designator-list designator
-        self.dbg(f'')
         save_1 = self.save()
 
         dst = self.get_designator()
@@ -1147,25 +1298,21 @@ class Compiler:
                     dsts.append(dst)
                 else:
                     self.load(save_2)
-                    self.dbg(f'return {dsts}')
                     return dsts
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_designator(self):
         # [ constant-expression ]
         # . identifier
-        self.dbg(f'')
         save_1 = self.save()
 
         if self.get_a_string('['):
             ce = self.get_constant_expression()
             if ce:
                 if self.get_a_string(']'):
-                    self.dbg(f'return {ce}')
                     return ce
 
         self.load(save_1)
@@ -1173,13 +1320,12 @@ class Compiler:
         if self.get_a_string('.'):
             idf = self.get_identifier()
             if idf:
-                self.dbg(f'return {idf}')
                 return idf
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
+    @packrat_memo
     @go_deep
     def get_declaration_specifiers(self, for_what = None):
         # storage-class-specifier declaration-specifiers? # 'auto', 'register', 'static', 'extern', 'typedef'
@@ -1188,7 +1334,6 @@ class Compiler:
         # function-specifier declaration-specifiers? # 'inline'
         # alignment-specifier declaration-specifiers?
 
-        self.dbg(f'')
         save_1 = self.save()
 
         storage_class_specifier = None # at most one
@@ -1254,26 +1399,21 @@ class Compiler:
                    'type_qualifier':type_qualifier,
                    'function_spec':function_spec,
                    'alignment_spec':alignment_spec}
-            self.dbg(f'return {dss}')
             return dss
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
 
     @go_deep
     def get_storage_class_specifier(self):
         # at most one storage class specifier may be given in a declaration
-        self.dbg(f'')
 
         idf = self.get_identifier()
 
         if idf in ['auto', 'register', 'static', 'extern', 'typedef']:
-            self.dbg(f'return {idf}')
             return idf
 
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
@@ -1294,37 +1434,31 @@ class Compiler:
         # typedefs has scope info like normal declarations
         # need a typedef-name set for each scope
 
-        self.dbg(f'')
         save_1 = self.save()
 
         idf = self.get_identifier()
 
         if not idf:
             self.load(save_1)
-            self.dbg(f'return comp.NoObject()')
             return comp.NoObject()
 
         if idf.name in ['void', 'char', 'short', 'int', 'long', 'float', 'double', 'signed', 'unsigned']:
-            self.dbg(f'return {idf.name}')
             return comp.TypeSpecifier(self, idf.name)
 
         if idf.name in ['struct', 'union']:
             if for_what == 'function_definition':
                 self.load(save_1)
-                self.dbg(f'return comp.NoObject()')
                 return comp.NoObject()
 
             su = self.get_struct_or_union_specifier(idf.name)
             if su:
                 return comp.TypeSpecifier(self, su)
 
-            self.dbg(f'return comp.NoObject()')
             return comp.NoObject()
 
         if idf == 'enum':
             es = self.get_enum_specifier()
             if es:
-                self.dbg(f'return {("enum", es)}')
                 return comp.TypeSpecifier(self, ("enum", es))
 
         # typedef-name
@@ -1336,31 +1470,23 @@ class Compiler:
             return comp.TypeSpecifier(self, typedef)
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_typedef(self, name):
-        self.dbg(f'')
         save_1 = self.save()
 
-        typedef = self.typedef_scopes[-1].current.get(name, None)
+        typedef = self.typedef_scopes.get(name)
         if typedef:
             return typedef['data']
-        else:
-            typedef = self.typedef_scopes[-1].outer.get(name, None)
-            if typedef:
-                return typedef['data']
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_enum_specifier(self):
         # enum identifier? { enumerator-list }
         # enum identifier
-        self.dbg(f'')
         save_1 = self.save()
 
         idf = self.get_identifier()
@@ -1371,24 +1497,20 @@ class Compiler:
             el = self.get_enumerator_list()
             if el:
                 if self.get_a_string('}'):
-                    self.dbg(f'return {("enum", idf, el)}')
                     return "enum", idf, el
 
         self.load(save_2)
 
         if idf:
-            self.dbg(f'return {("enum", idf, comp.NoObject())}')
             return "enum", idf, comp.NoObject()
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_enumerator_list(self):
         # enumerator
         # enumerator-list , enumerator
-        self.dbg(f'')
         save_1 = self.save()
 
         etr = self.get_enumerator()
@@ -1405,18 +1527,15 @@ class Compiler:
                         continue
 
                 self.load(save_2)
-                self.dbg(f'return {etrs}')
                 return etrs
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_enumerator(self):
         # identifier
         # identifier = constant-expression
-        self.dbg(f'')
         save_1 = self.save()
 
         idf = self.get_identifier()
@@ -1426,662 +1545,312 @@ class Compiler:
             if self.get_a_string('='):
                 ce = self.get_constant_expression()
                 if ce:
-                    self.dbg(f'return {(idf, ce)}')
                     return idf, ce
 
             self.load(save_2)
-            self.dbg(f'return {(idf, comp.NoObject())}')
             return idf, comp.NoObject()
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_function_specifier(self):
         # inline
-        self.dbg(f'')
 
         idf = self.get_identifier()
         if idf:
             if idf.name == 'inline':
                 return 'inline'
 
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_alignment_specifier(self):
-        self.dbg(f'')
-
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
-    @go_deep
+    @stack_rule
     def get_constant_expression(self):
         # conditional-expression
 
-        self.dbg(f'return comp.NoObject()')
         save_1 = self.save()
 
-        ce = self.get_conditional_expression()
+        ce = yield self.get_conditional_expression
 
         if ce:
-            self.dbg(f'return {ce}')
             return ce
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
 
-    @go_deep
-    def get_conditional_expression(self):
+    @stack_rule
+    def get_conditional_expression(self, first = None):
         # logical-or-expression
         # logical-or-expression ? expression : conditional-expression
 
-        self.dbg(f'')
+        # first - cast-expression already parsed by get_assignment_expression
+
         save_1 = self.save()
 
-        loe = self.get_logical_or_expression()
+        loe = yield self.get_logical_or_expression, (first,)
         if loe:
             save_2 = self.save()
             if self.get_a_string('?'):
-                exp = self.get_expression()
+                exp = yield self.get_expression
                 if exp:
                     if self.get_a_string(':'):
-                        ce = self.get_conditional_expression()
+                        ce = yield self.get_conditional_expression
                         if ce:
                             new_ce = comp.ConditionalExpression(self, loe, exp, ce)
-                            self.dbg(f'return {new_ce}')
                             return new_ce
 
             self.load(save_2)
             new_ce = comp.ConditionalExpression(self, loe, comp.NoObject(), comp.NoObject())
-            self.dbg(f'return {new_ce}')
             return new_ce
 
 
-        self.dbg(f'return comp.NoObject()')
         self.load(save_1)
         return comp.NoObject()
 
-    @go_deep
-    def get_logical_or_expression(self):
-        # logical-and-expression
-        # logical-or-expression || logical-and-expression
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        lae = self.get_logical_and_expression()
-        if lae:
-            data = [lae]
+    # binary operator levels. low to high precedence.
+    # (component, operators, set_opt on right items)
+    binary_levels = [
+        (comp.LogicalOrExpression, ['||'], False),                # logical-or-expression || logical-and-expression
+        (comp.LogicalAndExpression, ['&&'], False),               # logical-and-expression && inclusive-or-expression
+        (comp.InclusiveOrExpression, ['|'], False),               # inclusive-or-expression | exclusive-or-expression
+        (comp.ExclusiveOrExpression, ['^'], False),               # exclusive-or-expression ^ and-expression
+        (comp.AndExpression, ['&'], False),                       # and-expression & equality-expression
+        (comp.EqualityExpression, ['==', '!='], True),            # equality-expression == relational-expression
+        (comp.RelationalExpression, ['<', '>', '<=', '>='], True), # relational-expression < shift-expression
+        (comp.ShiftExpression, ['<<', '>>'], True),               # shift-expression << additive-expression
+        (comp.AdditiveExpression, ['+', '-'], True),              # additive-expression + multiplicative-expression
+        (comp.MultiplicativeExpression, ['*', '/', '%'], True),   # multiplicative-expression * cast-expression
+    ]
 
-            while True:
-                save_2 = self.save()
-
-                if self.get_a_string('||'):
-                    lae = self.get_logical_and_expression()
-                    if lae:
-                        data.append(lae)
-                        continue
+    binary_operator_level = {opt:level for level, (_, opts, _) in enumerate(binary_levels) for opt in opts}
 
-                self.load(save_2)
-                break
+    @stack_rule
+    def get_logical_or_expression(self, first = None):
+        # precedence climbing over binary_levels.
+        # one get_cast_expression per operand instead of one call per level.
 
-            self.dbg(f'return {data}')
-            return comp.LogicalOrExpression(self, data)
+        # a level with a single item is not built. the item is used directly,
+        # so a plain operand stays a CastExpression instead of ten nested chains.
 
-        self.dbg(f'return comp.NoObject()')
-        self.load(save_1)
-        return comp.NoObject()
+        # stack of open chains [level, data, operator before the next item]. levels increase.
 
-    @go_deep
-    def get_logical_and_expression(self):
-        # inclusive-or-expression
-        # logical-and-expression && inclusive-or-expression
+        current = first
+        if not current:
+            current = yield self.get_cast_expression
 
-        self.dbg(f'')
-        save_1 = self.save()
+        if not current:
+            return comp.NoObject()
 
-        ioe = self.get_inclusive_or_expression()
-        if ioe:
-            data = [ioe]
+        stack = []
 
-            while True:
-                save_2 = self.save()
+        while True:
+            token = self.tokens[self.token_index]
+            if token.kind != lexer.PUNCTUATOR or token.value not in self.binary_operator_level:
+                break
 
-                if self.get_a_string('&&'):
-                    lae = self.get_inclusive_or_expression()
-                    if lae:
-                        data.append(lae)
-                        continue
+            save_2 = self.save()
+            self.next_token()
 
+            right = yield self.get_cast_expression
+            if not right:
                 self.load(save_2)
                 break
 
-            self.dbg(f'return {data}')
-            return comp.LogicalAndExpression(self, data)
+            opt = token.value
+            level = self.binary_operator_level[opt]
 
-        self.dbg(f'return comp.NoObject()')
-        self.load(save_1)
-        return comp.NoObject()
+            # close chains with higher precedence
+            while stack and stack[-1][0] > level:
+                current = self.close_binary_level(stack.pop(), current)
 
-    @go_deep
-    def get_inclusive_or_expression(self):
-        # exclusive-or-expression
-        # inclusive-or-expression | exclusive-or-expression
+            if stack and stack[-1][0] == level:
+                top = stack[-1]
+                if self.binary_levels[level][2]:
+                    current.set_opt(top[2])
+                top[1].append(current)
+                top[2] = opt
+            else:
+                stack.append([level, [current], opt])
 
-        self.dbg(f'')
-        save_1 = self.save()
+            current = right
 
-        eoe = self.get_exclusive_or_expression()
-        if eoe:
-            data = [eoe]
+        while stack:
+            current = self.close_binary_level(stack.pop(), current)
 
-            while True:
-                save_2 = self.save()
+        return current
 
-                if self.get_a_string('|'):
-                    lae = self.get_exclusive_or_expression()
-                    if lae:
-                        data.append(lae)
-                        continue
+    def close_binary_level(self, item, current):
+        level, data, opt = item
 
-                self.load(save_2)
-                break
+        if self.binary_levels[level][2]:
+            current.set_opt(opt)
+        data.append(current)
 
-            self.dbg(f'return {data}')
-            return comp.InclusiveOrExpression(self, data)
+        return self.binary_levels[level][0](self, data)
 
-        self.dbg(f'return comp.NoObject()')
-        self.load(save_1)
-        return comp.NoObject()
 
-    @go_deep
-    def get_exclusive_or_expression(self):
-        # and-expression
-        # exclusive-or-expression ^ and-expression
+    @packrat_memo
+    @stack_rule
+    def get_expression(self):
+        # assignment-expression
+        # expression , assignment-expression
 
-        self.dbg(f'')
         save_1 = self.save()
 
-        ae = self.get_and_expression()
+        ae = yield self.get_assignment_expression
         if ae:
-            data = [ae]
+            aes = [ae]
 
             while True:
                 save_2 = self.save()
 
-                if self.get_a_string('^'):
-                    lae = self.get_and_expression()
-                    if lae:
-                        data.append(lae)
+                if self.get_a_string(','):
+                    ae = yield self.get_assignment_expression
+                    if ae:
+                        aes.append(ae)
                         continue
 
                 self.load(save_2)
                 break
 
-            self.dbg(f'return {data}')
-            return comp.ExclusiveOrExpression(self, data)
+            return comp.Expression(self, aes)
 
-        self.dbg(f'return comp.NoObject()')
+        # fail
         self.load(save_1)
         return comp.NoObject()
 
-    @go_deep
-    def get_and_expression(self):
-        # equality-expression
-        # and-expression & equality-expression
 
-        self.dbg(f'')
-        save_1 = self.save()
+    @packrat_memo
+    @stack_rule
+    def get_assignment_expression(self):
+        # conditional-expression
+        # unary-expression assignment-operator assignment-expression
 
-        ee = self.get_equality_expression()
-        if ee:
-            data = [ee]
+        # parse a cast-expression once. if it is a plain unary-expression followed by
+        # an assignment-operator, this is an assignment. otherwise it is the first
+        # operand of the conditional-expression.
 
-            while True:
-                save_2 = self.save()
+        save_1 = self.save()
 
-                if self.get_a_string('&'):
-                    save_3 = self.save()
-                    if self.getc() in '&=':  # avoid && &=
-                        self.load(save_2)
-                        break
+        cast = yield self.get_cast_expression
+        if not cast:
+            self.load(save_1)
+            return comp.NoObject()
 
-                    self.load(save_3)
+        if not cast.casts:
+            save_2 = self.save()
 
-                    lae = self.get_equality_expression()
-                    if lae:
-                        data.append(lae)
-                        continue
+            opt = self.get_assignment_operator()
+            if opt:
+                ae = yield self.get_assignment_expression
+                if ae:
+                    ass = comp.AssignmentExpression(self, ue = cast.ue, opt = opt, ae = ae)
+                    return ass
 
-                self.load(save_2)
-                break
+            self.load(save_2)
 
-            self.dbg(f'return {data}')
-            return comp.AndExpression(self, data)
+        ce = yield self.get_conditional_expression, (cast,)
+        if ce:
+            ass = comp.AssignmentExpression(self, ce = ce)
+            return ass
 
-        self.dbg(f'return comp.NoObject()')
         self.load(save_1)
         return comp.NoObject()
 
-    @go_deep
-    def get_equality_expression(self):
-        # relational-expression
-        # equality-expression == relational-expression
-        # equality-expression != relational-expression
 
-        self.dbg(f'')
+    @packrat_memo
+    @stack_rule
+    def get_unary_expression(self):
+        # postfix-expression
+        # ++ unary-expression
+        # -- unary-expression
+        # unary-operator cast-expression
+        # sizeof unary-expression
+        # sizeof ( type-name )
+
         save_1 = self.save()
 
-        ree = self.get_relational_expression()
-        if ree:
-            data = [ree]
+        pe = yield self.get_postfix_expression
+        if pe:
+            new_ue = comp.UnaryExpression(self, pe = pe)
+            return new_ue
 
-            while True:
-                save_2 = self.save()
+        self.load(save_1)
 
-                if self.get_a_string('=='):
-                    ree = self.get_relational_expression()
-                    if ree:
-                        ree.set_opt('==')
-                        data.append(ree)
-                        continue
+        if self.get_a_string('++'):
+            ue = yield self.get_unary_expression
+            if ue:
+                new_ue = comp.UnaryExpression(self, pp = '++', ue = ue)
+                return new_ue
 
-                self.load(save_2)
+        self.load(save_1)
 
-                if self.get_a_string('!='):
-                    ree = self.get_relational_expression()
-                    if ree:
-                        ree.set_opt('!=')
-                        data.append(ree)
-                        continue
+        if self.get_a_string('--'):
+            ue = yield self.get_unary_expression
+            if ue:
+                new_ue = comp.UnaryExpression(self, pp = '--', ue = ue)
+                return new_ue
 
-                self.load(save_2)
-                break
+        self.load(save_1)
 
-            self.dbg(f'return {data}')
-            return comp.EqualityExpression(self, data)
+        # cast
+        uo = self.get_unary_operator()
+        if uo:
+            cast = yield self.get_cast_expression
+            if cast:
+                new_ue = comp.UnaryExpression(self, uo = uo, cast = cast)
+                return new_ue
 
-        self.dbg(f'return comp.NoObject()')
         self.load(save_1)
-        return comp.NoObject()
 
-    @go_deep
-    def get_relational_expression(self):
-        # shift-expression
-        # relational-expression < shift-expression
-        # relational-expression > shift-expression
-        # relational-expression <= shift-expression
-        # relational-expression >= shift-expression
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        se = self.get_shift_expression()
-        if se:
-            data = [se]
+        idf = self.get_identifier()
+        if idf == 'sizeof':
+            # ( type-name ) first. sizeof(TS1) parses as an expression too
+            save_2 = self.save()
+            if self.get_a_string('(') and self.now_at_type_name():
+                tn = self.get_type_name()
+                if tn:
+                    if self.get_a_string(')'):
+                        new_ue = comp.UnaryExpression(self, sizeof = 'sizeof', tn = tn)
+                        return new_ue
 
-            while True:
-                save_2 = self.save()
+            self.load(save_2)
+            ue = yield self.get_unary_expression
+            if ue:
+                new_ue = comp.UnaryExpression(self, ue = ue, sizeof = 'sizeof')
+                return new_ue
 
-                if self.get_a_string('<'):
-                    se = self.get_shift_expression()
-                    if se:
-                        se.set_opt('<')
-                        data.append(se)
-                        continue
+        self.load(save_1)
+        return comp.NoObject()
 
-                self.load(save_2)
 
-                if self.get_a_string('>'):
-                    se = self.get_shift_expression()
-                    if se:
-                        se.set_opt('>')
-                        data.append(se)
-                        continue
+    @go_deep
+    def get_assignment_operator(self):
+        # = *= /= %= += -= <<= >>= &= ^= |=
 
-                self.load(save_2)
+        save_1 = self.save()
 
-                if self.get_a_string('<='):
-                    se = self.get_shift_expression()
-                    if se:
-                        se.set_opt('<=')
-                        data.append(se)
-                        continue
+        ops = ['=', '*=', '/=', '%=', '+=', '-=', '<<=', '>>=', '&=', '^=', '|=']
 
-                self.load(save_2)
-
-                if self.get_a_string('>='):
-                    se = self.get_shift_expression()
-                    if se:
-                        se.set_opt('>=')
-                        data.append(se)
-                        continue
-
-                self.load(save_2)
-                break
-
-            self.dbg(f'return {data}')
-            return comp.RelationalExpression(self, data)
-
-        self.dbg(f'return comp.NoObject()')
-        self.load(save_1)
-        return comp.NoObject()
-
-    @go_deep
-    def get_shift_expression(self):
-        # additive-expression
-        # shift-expression << additive-expression
-        # shift-expression >> additive-expression
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        ae = self.get_additive_expression()
-        if ae:
-            data = [ae]
-
-            while True:
-                save_2 = self.save()
-
-                if self.get_a_string('<<'):
-                    ae = self.get_additive_expression()
-                    if ae:
-                        ae.set_opt('<<')
-                        data.append(ae)
-                        continue
-
-                self.load(save_2)
-
-                if self.get_a_string('>>'):
-                    ae = self.get_additive_expression()
-                    if ae:
-                        ae.set_opt('>>')
-                        data.append(ae)
-                        continue
-
-                self.load(save_2)
-                break
-
-            self.dbg(f'return {data}')
-            return comp.ShiftExpression(self, data)
-
-        self.dbg(f'return comp.NoObject()')
-        self.load(save_1)
-        return comp.NoObject()
-
-    @go_deep
-    def get_additive_expression(self):
-        # multiplicative-expression
-        # additive-expression + multiplicative-expression
-        # additive-expression - multiplicative-expression
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        me = self.get_multiplicative_expression()
-        if me:
-            data = [me]
-
-            while True:
-                save_2 = self.save()
-
-                if self.get_a_string('+'):
-                    me = self.get_multiplicative_expression()
-                    if me:
-                        me.set_opt('+')
-                        data.append(me)
-                        continue
-
-                self.load(save_2)
-
-                if self.get_a_string('-'):
-                    me = self.get_multiplicative_expression()
-                    if me:
-                        me.set_opt('-')
-                        data.append(me)
-                        continue
-
-                self.load(save_2)
-                break
-
-            self.dbg(f'return {data}')
-            return comp.AdditiveExpression(self, data)
-
-        self.dbg(f'return comp.NoObject()')
-        self.load(save_1)
-        return comp.NoObject()
-
-    @go_deep
-    def get_multiplicative_expression(self):
-        # cast-expression
-        # multiplicative-expression * cast-expression
-        # multiplicative-expression / cast-expression
-        # multiplicative-expression % cast-expression
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        ce = self.get_cast_expression()
-        if ce:
-            data = [ce] # first
-
-            while True:
-                save_2 = self.save()
-
-                if self.get_a_string('*'):
-                    ce = self.get_cast_expression()
-                    if ce:
-                        ce.set_opt('*')
-                        data.append(ce)
-                        continue
-
-                self.load(save_2)
-
-                if self.get_a_string('/'):
-                    ce = self.get_cast_expression()
-                    if ce:
-                        ce.set_opt('/')
-                        data.append(ce)
-                        continue
-
-                self.load(save_2)
-
-                if self.get_a_string('%'):
-                    ce = self.get_cast_expression()
-                    if ce:
-                        ce.set_opt('%')
-                        data.append(ce)
-                        continue
-
-                self.load(save_2)
-                break
-
-            self.dbg(f'return {data}')
-            return comp.MultiplicativeExpression(self, data)
-
-        self.dbg(f'return comp.NoObject()')
-        self.load(save_1)
-        return comp.NoObject()
-
-
-    @go_deep
-    def get_expression(self):
-        # assignment-expression
-        # expression , assignment-expression
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        ae = self.get_assignment_expression()
-        if ae:
-            aes = [ae]
-
-            while True:
-                save_2 = self.save()
-
-                if self.get_a_string(','):
-                    ae = self.get_assignment_expression()
-                    if ae:
-                        aes.append(ae)
-                        continue
-
-                self.load(save_2)
-                break
-
-            self.dbg(f'return {aes}')
-            return comp.Expression(self, aes)
+        for op in ops:
+            if self.get_a_string(op): # == is a different token
+                return op
 
         # fail
-        self.dbg(f'return comp.NoObject()')
         self.load(save_1)
         return comp.NoObject()
 
-
-    @go_deep
-    def get_assignment_expression(self):
-        # conditional-expression
-        # unary-expression assignment-operator assignment-expression
-
-        # greedy？
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        ue = self.get_unary_expression()
-        if ue:
-            opt = self.get_assignment_operator()
-            if opt:
-                ae = self.get_assignment_expression()
-                if ae:
-                    ass = comp.AssignmentExpression(self, ue = ue, opt = opt, ae = ae)
-                    self.dbg(f'return {ass}')
-                    return ass
-
-        self.load(save_1)
-
-        ce = self.get_conditional_expression()
-        if ce:
-            ass = comp.AssignmentExpression(self, ce = ce)
-            self.dbg(f'return {ass}')
-            return ass
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-
-    @go_deep
-    def get_unary_expression(self):
-        # postfix-expression
-        # ++ unary-expression
-        # -- unary-expression
-        # unary-operator cast-expression
-        # sizeof unary-expression
-        # sizeof ( type-name )
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        pe = self.get_postfix_expression()
-        if pe:
-            new_ue = comp.UnaryExpression(self, pe = pe)
-            self.dbg(f'return {new_ue}')
-            return new_ue
-
-        self.load(save_1)
-
-        if self.get_a_string('++'):
-            ue = self.get_unary_expression()
-            if ue:
-                new_ue = comp.UnaryExpression(self, pp = '++', ue = ue)
-                self.dbg(f'return {new_ue}')
-                return new_ue
-
-        self.load(save_1)
-
-        if self.get_a_string('--'):
-            ue = self.get_unary_expression()
-            if ue:
-                new_ue = comp.UnaryExpression(self, pp = '--', ue = ue)
-                self.dbg(f'return {new_ue}')
-                return new_ue
-
-        self.load(save_1)
-
-        # cast
-        uo = self.get_unary_operator()
-        if uo:
-            cast = self.get_cast_expression()
-            if cast:
-                new_ue = comp.UnaryExpression(self, uo = uo, cast = cast)
-                self.dbg(f'return {new_ue}')
-                return new_ue
-
-        self.load(save_1)
-
-        idf = self.get_identifier()
-        if idf == 'sizeof':
-            ue = self.get_unary_expression()
-            if ue:
-                new_ue = comp.UnaryExpression(self, ue = ue, sizeof = 'sizeof')
-                self.dbg(f'return {new_ue}')
-                return new_ue
-
-            if self.get_a_string('('):
-                tn = self.get_type_name()
-                if tn:
-                    if self.get_a_string(')'):
-                        new_ue = comp.UnaryExpression(self, sizeof = 'sizeof', tn = tn)
-                        self.dbg(f'return {new_ue}')
-                        return new_ue
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-
-    @go_deep
-    def get_assignment_operator(self):
-        # = *= /= %= += -= <<= >>= &= ^= |=
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        ops = ['=', '*=', '/=', '%=', '+=', '-=', '<<=', '>>=', '&=', '^=', '|=']
-
-        for op in ops:
-            save_2 = self.save()
-            if self.get_a_string(op):
-                if op == '=':
-                    save_3 = self.save()
-                    # avoid ==
-                    if self.getc() == '=':
-                        self.load(save_2)
-                        continue
-
-                    self.load(save_3)
-
-                self.dbg(f'return {op}')
-                return op
-            else:
-                self.load(save_1)
-
-        # fail
-        self.dbg(f'return comp.NoObject()')
-        self.load(save_1)
-        return comp.NoObject()
-
-    @go_deep
+    @packrat_memo
+    @stack_rule
     def get_cast_expression(self):
         # unary-expression
         # ( type-name ) cast-expression
 
-        self.dbg(f'')
         save_1 = self.save()
 
         casts = []
@@ -2089,7 +1858,9 @@ class Compiler:
         while True:
             save_2 = self.save()
 
-            if self.get_a_string('('):
+            # only try a type-name when one can start here. otherwise the implicit int
+            # specifier-qualifier-list lets the abstract-declarator recurse into every ( of ( ( ( ...
+            if self.get_a_string('(') and self.now_at_type_name():
                 tn = self.get_type_name()
                 if tn:
                     if self.get_a_string(')'):
@@ -2097,33 +1868,29 @@ class Compiler:
                         continue
 
             self.load(save_2)
-            ue = self.get_unary_expression()
+            ue = yield self.get_unary_expression
             if ue:
                 cast = comp.CastExpression(self, casts, ue)
-                self.dbg(f'return {cast}')
                 return cast
 
             # fail
             break
 
-        self.dbg(f'return comp.NoObject()')
         self.load(save_1)
         return comp.NoObject()
 
+    @packrat_memo
     @go_deep
     def get_type_name(self):
         # specifier-qualifier-list abstract-declarator?
 
-        self.dbg(f'')
         save_1 = self.save()
 
         sql = self.get_specifier_qualifier_list()
         if sql:
             ad = self.get_abstract_declarator()
-            self.dbg(f'return {(sql, ad)}')
             return sql, ad
 
-        self.dbg(f'return comp.NoObject()')
         self.load(save_1)
         return comp.NoObject()
 
@@ -2131,7 +1898,6 @@ class Compiler:
     def get_abstract_declarator(self):
         # pointer
         # pointer? direct-abstract-declarator
-        self.dbg(f'')
         save_1 = self.save()
 
         ptr = self.get_pointer()
@@ -2143,7 +1909,6 @@ class Compiler:
             if dad:
                 return comp.NoObject(), dad
 
-        self.dbg(f'return comp.NoObject()')
         self.load(save_1)
         return comp.NoObject()
 
@@ -2153,7 +1918,6 @@ class Compiler:
         #  direct-abstract-declarator? [ constant-expression? ]
         #  direct-abstract-declarator? ( parameter-type-list? )
 
-        self.dbg(f'')
         save_1 = self.save()
 
         ad = comp.NoObject()
@@ -2192,26 +1956,22 @@ class Compiler:
             break
 
         if len(data) != 0:
-            self.dbg(f'return {(ad, data)}')
             return ad, data
 
-        self.dbg(f'return comp.NoObject()')
         self.load(save_1)
         return comp.NoObject()
 
     @go_deep
     def get_unary_operator(self):
+        token = self.tokens[self.token_index]
+        if token.kind == lexer.PUNCTUATOR and token.value in ['&', '*', '+', '-', '~', '!']:
+            self.next_token()
+            return token.value
 
-        self.skip_white()
-
-        c = self.getc()
-        if c in ['&', '*', '+', '-', '~', '!']:
-            return c
-
-        self.source_file_index -= 1
         return comp.NoObject()
 
-    @go_deep
+    @packrat_memo
+    @stack_rule
     def get_postfix_expression(self):
         # primary-expression
         # postfix-expression [ expression ]
@@ -2221,10 +1981,9 @@ class Compiler:
         # postfix-expression ++
         # postfix-expression --
 
-        self.dbg(f'')
         save_1 = self.save()
 
-        primary = self.get_primary_expression()
+        primary = yield self.get_primary_expression
         if primary:
             data = []
 
@@ -2232,7 +1991,7 @@ class Compiler:
                 save_2 = self.save()
 
                 if self.get_a_string('['):
-                    exp = self.get_expression()
+                    exp = yield self.get_expression
                     if exp:
                         if self.get_a_string(']'):
                             data.append(('array index', exp))
@@ -2241,7 +2000,7 @@ class Compiler:
                 self.load(save_2)
 
                 if self.get_a_string('('):
-                    aes = self.get_argument_expression_list()
+                    aes = yield self.get_argument_expression_list
                     if self.get_a_string(')'):
                         data.append(('function call', aes))
                         continue
@@ -2277,22 +2036,19 @@ class Compiler:
                 self.load(save_2)
                 break
 
-            self.dbg(f'return {(primary, data)}')
             return comp.PostfixExpression(self, primary, data)
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
-    @go_deep
+    @stack_rule
     def get_argument_expression_list(self):
         # assignment-expression
         # argument-expression-list , assignment-expression
 
-        self.dbg(f'')
         save_1 = self.save()
 
-        ae = self.get_assignment_expression()
+        ae = yield self.get_assignment_expression
         if ae:
             aes = [ae]
 
@@ -2300,7 +2056,7 @@ class Compiler:
                 save_2 = self.save()
 
                 if self.get_a_string(','):
-                    ae = self.get_assignment_expression()
+                    ae = yield self.get_assignment_expression
                     if ae:
                         aes.append(ae)
                         continue
@@ -2308,79 +2064,58 @@ class Compiler:
                 self.load(save_2)
                 break
 
-            self.dbg(f'return {aes}')
             return aes
 
-        self.dbg(f'return comp.NoObject()')
         self.load(save_1)
         # return comp.NoObject()
         return []
 
-    @go_deep
+    @packrat_memo
+    @stack_rule
     def get_primary_expression(self):
         # identifier
         # constant
         # string-literal
         # ( expression )
 
-        self.dbg(f'')
-
         save_1 = self.save()
 
         idf = self.get_identifier()
         if idf and idf.name not in self.keywords:
-            self.dbg(f'return {idf}')
             return comp.PrimaryExpression(self, idf = idf)
 
         self.load(save_1)
 
         const = self.get_constant()
         if const:
-            self.dbg(f'return {const}')
             return comp.PrimaryExpression(self, const = const)
 
         self.load(save_1)
 
         string = self.get_string_literal()
         if string:
-            self.dbg(f'return {string}')
             return comp.PrimaryExpression(self, string = string)
 
         self.load(save_1)
 
         if self.get_a_string('('):
-            exp = self.get_expression()
+            exp = yield self.get_expression
             if exp:
                 if self.get_a_string(')'):
-                    self.dbg(f'return {exp}')
                     return comp.PrimaryExpression(self, exp = exp)
 
-        self.dbg(f'return comp.NoObject()')
         self.load(save_1)
         return comp.NoObject()
 
     @go_deep
     def get_string_literal(self):
         # encoding-prefix? " s-char-sequence? "
-        self.dbg(f'')
-        save_1 = self.save()
 
-        if self.get_a_string('"'):
-            string = ''
-            while True:
-                c = self.getc()
-                if c is None:
-                    return comp.NoObject()
-                elif c == '\\': # todo
-                    # pass
-                    string += c
-                elif c == '"':
-                    return string
-                else:
-                    string += c
+        token = self.tokens[self.token_index]
+        if token.kind == lexer.STRING_LITERAL:
+            self.next_token()
+            return token.value
 
-        self.dbg(f'return comp.NoObject()')
-        self.load(save_1)
         return comp.NoObject()
 
     @go_deep
@@ -2390,21 +2125,17 @@ class Compiler:
         # floating-constant
         # enumeration-constant
 
-        self.dbg(f'')
         save_1 = self.save()
 
         if False: # floating point is complicated. ignore for now.
             fc = self.get_floating_constant()
             if fc:
-                self.dbg(f'get_floating_constant {fc}')
                 return fc
 
         ic = self.get_integer_constant()
         if ic:
-            self.dbg(f'get_integer_constant {ic}')
             return ic
 
-        self.dbg(f'return comp.NoObject()')
         self.load(save_1)
         return comp.NoObject()
 
@@ -2414,123 +2145,13 @@ class Compiler:
         # octal-constant integer-suffix?
         # hexadecimal-constant integer-suffix?
 
-        self.dbg(f'')
-        save_1 = self.save()
-
-        dc = self.get_decimal_constant()
-        if dc:
-            self.dbg(f'{dc}')
-            return comp.Constant(self, 'int', int(dc, 10))
-
-        # 0x first
-        hc = self.get_hexadecimal_constant()
-        if hc:
-            self.dbg(f'{hc}')
-            return comp.Constant(self, 'int', int(hc, 16))
+        # the lexer already converted the value
 
-        oc = self.get_octal_constant()
-        if oc:
-            self.dbg(f'{oc}')
-            return comp.Constant(self, 'int', int(oc, 8))
+        token = self.tokens[self.token_index]
+        if token.kind == lexer.INTEGER_CONSTANT:
+            self.next_token()
+            return comp.Constant(self, 'int', token.value)
 
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-    @go_deep
-    def get_hexadecimal_constant(self):
-        # hexadecimal-prefix hexadecimal-digit
-        # hexadecimal-constant hexadecimal-digit
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        if not self.get_a_string('0x') and not self.get_a_string('0X'):
-            self.load(save_1)
-            self.dbg(f'return comp.NoObject()')
-            return comp.NoObject()
-
-        string = '0x'
-
-        while True:
-            c = self.getc()
-            if c.isdigit() and c in '0123456789abcdefABCDEF':
-                string += c
-                continue
-            # elif c.isspace():
-            #     return int(string)
-            # elif c.isalpha() or c == '':
-            #     return int(string)
-            else:
-                self.source_file_index -= 1
-                self.dbg(f'return {int(string, 16)}')
-                # return int(string, 8)
-                return string
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-    @go_deep
-    def get_octal_constant(self):
-        # 0
-        # octal-constant octal-digit
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        c = self.getc_skip_white()
-        if c == '0':
-            string = c
-
-            while True:
-                c = self.getc()
-                if c in '01234567':
-                    string += c
-                    continue
-                # elif c.isspace():
-                #     return int(string)
-                # elif c.isalpha() or c == '':
-                #     return int(string)
-                else:
-                    self.source_file_index -= 1
-                    self.dbg(f'return {int(string, 8)}')
-                    # return int(string, 8)
-                    return string
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-    @go_deep
-    def get_decimal_constant(self):
-        # nonzero-digit
-        # decimal-constant digit
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        c = self.getc_skip_white()
-        if c.isdigit() and c != '0':
-            string = c
-
-            while True:
-                c = self.getc()
-                if c.isdigit():
-                    string += c
-                    continue
-                # elif c.isspace():
-                #     return int(string)
-                # elif c.isalpha() or c == '':
-                #     return int(string)
-                else:
-                    self.source_file_index -= 1
-                    # return int(string)
-                    self.dbg(f'return {string}')
-                    return string
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
@@ -2538,228 +2159,11 @@ class Compiler:
         # decimal-floating-constant
         # hexadecimal-floating-constant
 
-        self.dbg(f'')
-        save_1 = self.save()
-
-        dfc = self.get_decimal_floating_constant()
-        if dfc:
-            self.dbg(f'{dfc}')
-            return comp.Constant(self, 'float', dfc)
-
-        if False: # todo
-            hfc = self.get_hexadecimal_loating_constant()
-            if hfc:
-                self.dbg(f'{hfc}')
-                return comp.Constant(self, 'int', int(hc, 16))
-
-            self.load(save_1)
-            self.dbg(f'return comp.NoObject()')
-            return comp.NoObject()
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-    @go_deep
-    def get_decimal_floating_constant(self):
-        # fractional-constant exponent-part? floating-suffix? # 123.456e-3L
-        # digit-sequence exponent-part floating-suffix?       # 123456e6f but 123456L is legal in gcc?
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        self.skip_white()
-
-        fc = self.get_fractional_constant()
-        if fc:
-            ep = self.get_exponent_part()
-
-            save_2 = self.save()
-            floating_suffix = self.getc()
-            if floating_suffix not in 'flFL':
-                self.load(save_2)
-                floating_suffix = comp.NoObject()
-
-            return True, fc, ep, floating_suffix # True = is fractional
-
-        ds = self.get_digit_sequence()
-        if ds:
-            ep = self.get_exponent_part()
-            if ep:
-                save_2 = self.save()
-                floating_suffix = self.getc()
-                if floating_suffix not in 'flFL':
-                    self.load(save_2)
-                    floating_suffix = comp.NoObject()
-                return False, ds, ep, floating_suffix
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-    @go_deep
-    def get_fractional_constant(self):
-        # digit-sequence? . digit-sequence
-        # digit-sequence .
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        ds_1 = self.get_digit_sequence()
-
-        dot = self.get_a_string('.', skip_white = False)
-        if dot:
-            ds_2 = self.get_digit_sequence()
-            if ds_1 or ds_2:
-                self.dbg(f'return {(ds_1, ds_2)}')
-                return ds_1, ds_2
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-    @go_deep
-    def get_digit_sequence(self):
-        # digit
-        # digit-sequence digit
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        digit = self.get_digit()
-        if digit:
-            digits = digit
-
-            while True:
-                digit = self.get_digit()
-                if digit:
-                    digits += digit
-                else:
-                    self.dbg(f'return {digits}')
-                    return digits
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-    @go_deep
-    def get_exponent_part(self):
-        # e sign? digit-sequence
-        # E sign? digit-sequence
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        eE = self.get_a_string('e', skip_white = False)
-        if not eE:
-            e = self.get_a_string('E', skip_white = False)
-
-        if eE:
-            sign = self.get_a_string('+', skip_white = False)
-            if not sign:
-                sign = self.get_a_string('-', skip_white = False)
-
-            ds = self.get_digit_sequence()
-            if ds:
-                self.dbg(f'return {(sign, ds)}')
-                return sign, ds
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-    @go_deep
-    def get_hexadecimal_floating_constant(self):
-        # hexadecimal-prefix hexadecimal-fractional-constant binary-exponent-part floating-suffix? # 0x123.456e-3L
-        # hexadecimal-prefix hexadecimal-digit-sequence binary-exponent-part floating-suffix?      # 0x123456e6f but 123456L is legal in gcc?
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        prefix = self.get_a_string('0x')
-        if not prefix:
-            prefix = self.get_a_string('0X')
-
-        if prefix:
-            hfc = self.get_hexadecimal_fractional_constant()
-
-
-        fc = self.get_fractional_constant()
-        if fc:
-            ep = self.get_exponent_part()
-
-            save_2 = self.save()
-            floating_suffix = self.getc()
-            if floating_suffix not in 'flFL':
-                self.load(save_2)
-                floating_suffix = comp.NoObject()
-
-            return True, fc, ep, floating_suffix  # True = is fractional
-
-        ds = self.get_digit_sequence()
-        if ds:
-            ep = self.get_exponent_part()
-            if ep:
-                save_2 = self.save()
-                floating_suffix = self.getc()
-                if floating_suffix not in 'flFL':
-                    self.load(save_2)
-                    floating_suffix = comp.NoObject()
-                return False, ds, ep, floating_suffix
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-    @go_deep
-    def get_hexadecimal_fractional_constant(self):
-        # hexadecimal-digit-sequence? . hexadecimal-digit-sequence
-        # hexadecimal-digit-sequence .
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        ds_1 = self.get_hexadecimal_digit_sequence()
+        token = self.tokens[self.token_index]
+        if token.kind == lexer.FLOATING_CONSTANT:
+            self.next_token()
+            return comp.Constant(self, 'float', token.value)
 
-        dot = self.get_a_string('.', skip_white = False)
-        if dot:
-            ds_2 = self.get_hexadecimal_digit_sequence()
-            if ds_1 or ds_2:
-                self.dbg(f'return {(ds_1, ds_2)}')
-                return ds_1, ds_2
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
-        return comp.NoObject()
-
-    @go_deep
-    def get_hexadecimal_digit_sequence(self):
-        # hexadecimal-digit
-        # hexadecimal-digit-sequence hexadecimal-digit
-
-        self.dbg(f'')
-        save_1 = self.save()
-
-        digit = self.getc()
-        if digit and digit in self.hex_digits:
-            digits = digit
-
-            while True:
-                digit = self.getc()
-                if digit:
-                    if digit in self.hex_digits:
-                        digits += digit
-                        # elif digit.isspace():
-                        #    return digits
-                    else:
-                        self.dbg(f'return {digits}')
-                        return digits
-                else:
-                    self.dbg(f'return {digits}')
-                    return digits
-
-        self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
@@ -2767,16 +2171,13 @@ class Compiler:
         # const
         # volatile
 
-        self.dbg(f'')
         save_1 = self.save()
 
         idf = self.get_identifier()
         if idf in ['const', 'volatile']:
-            self.dbg(f'return {idf}')
             return idf.name
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
@@ -2784,7 +2185,6 @@ class Compiler:
         # type-qualifier
         # type-qualifier-list type-qualifier
 
-        self.dbg(f'')
         save_1 = self.save()
 
         tq = self.get_type_qualifier()
@@ -2796,11 +2196,9 @@ class Compiler:
                 if tq:
                     data.append(tq)
                 else:
-                    self.dbg(f'return {data}')
                     return data
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
@@ -2816,7 +2214,6 @@ class Compiler:
         # 2. disposable struct. use once.
         # 3. S2 must exist
 
-        self.dbg(f'')
         save_1 = self.save()
 
         idf = self.get_identifier()
@@ -2828,17 +2225,14 @@ class Compiler:
             if sdl:
                 if self.get_a_string('}'):
                     # ok
-                    self.dbg(f'return {(head, idf.name, sdl)}')
                     return comp.StructUnion(self, head, idf.name, sdl)
 
         self.load(save_2)
         if idf:
-            self.dbg(f'return {(head, idf.name, comp.NoObject())}')
             return comp.StructUnion(self, head, idf.name, comp.NoObject())
 
         # failed
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
 
@@ -2847,7 +2241,6 @@ class Compiler:
         # struct-declaration
         # struct-declaration-list struct-declaration
 
-        self.dbg(f'')
         save_1 = self.save()
 
         sd = self.get_struct_declaration()
@@ -2860,11 +2253,9 @@ class Compiler:
                     sds.append(sd)
                     continue
 
-                self.dbg(f'return {sds}')
                 return sds
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
 
@@ -2872,7 +2263,6 @@ class Compiler:
     def get_struct_declaration(self):
         # specifier-qualifier-list struct-declarator-list ;
 
-        self.dbg(f'')
         save_1 = self.save()
 
         sql = self.get_specifier_qualifier_list() # const int ...
@@ -2880,18 +2270,15 @@ class Compiler:
             sdl = self.get_struct_declarator_list()
             if sdl:
                 if self.get_a_string(';'):
-                    self.dbg(f'return {(sql, sdl)}')
                     return sql, sdl
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_struct_declarator_list(self):
         # struct-declarator
         # struct-declarator-list , struct-declarator
-        self.dbg(f'')
         save_1 = self.save()
 
         sd = self.get_struct_declarator()
@@ -2908,18 +2295,15 @@ class Compiler:
                         continue
 
                 self.load(save_2)
-                self.dbg(f'return {sds}')
                 return sds
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
     @go_deep
     def get_struct_declarator(self):
         # declarator
         # declarator? : constant-expression
-        self.dbg(f'')
         save_1 = self.save()
 
         dect = self.get_declarator()
@@ -2928,17 +2312,14 @@ class Compiler:
         if self.get_a_string(':'):
             ce = self.get_constant_expression()
             if ce:
-                self.dbg(f'return {(dect, ce)}')
                 return dect, ce
 
         self.load(save_2)
 
         if dect:
-            self.dbg(f'return {(dect, None)}')
             return dect, None
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
 
@@ -2952,7 +2333,6 @@ class Compiler:
         # * = [[]]
         # * *const * = [[], ['const'], []]
 
-        self.dbg(f'')
         save_1 = self.save()
 
         ptrs = []
@@ -2968,18 +2348,15 @@ class Compiler:
             break
 
         if True: # len(ptrs) != 0:
-            self.dbg(f'return {ptrs}')
             return ptrs
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
         #####
 
         if not self.get_a_string('*'):
             self.load(save_1)
-            self.dbg(f'get_pointer return comp.NoObject()')
             return comp.NoObject()
 
         tqs = []
@@ -2994,11 +2371,9 @@ class Compiler:
 
         pointer = self.get_pointer()
         if pointer:
-            self.dbg(f'return True')
             return True
         else:
             self.load(save_1)
-            self.dbg(f'return comp.NoObject()')
             return comp.NoObject()
 
     @go_deep
@@ -3008,7 +2383,6 @@ class Compiler:
 
         # if no type-specifier, default int.
 
-        self.dbg(f'')
         save_1 = self.save()
 
         data = []
@@ -3037,111 +2411,35 @@ class Compiler:
             data.append(comp.TypeSpecifier(self, 'int'))
 
         if len(data) != 0:
-            self.dbg(f'return {data}')
             return data
 
         self.load(save_1)
-        self.dbg(f'return comp.NoObject()')
         return comp.NoObject()
 
-    @go_deep
-    def get_identifier_nondigit(self):
-        return self.get_nondigit()
-
     @go_deep
     def get_identifier(self):
         # identifier-nondigit
         #    identifier identifier-nondigit
         #    identifier digit
 
-        # must start with an identifier-nondigit, followed by identifier-nondigit or digit.
-
-        self.dbg(f'')
-        self.skip_white()
-
-        # save_1 = self.save()
-
-        c = self.get_identifier_nondigit() # get a nondigit
-
-        if c is None:
-            self.dbg(f'return comp.NoObject()')
-            # self.load(save_1)
-            return comp.NoObject()
-        else:
-            idf = c
-
-            while True:
-                c = self.get_identifier_nondigit()  # get a nondigit
-                if c:
-                    idf += c
-                    continue
-
-                c = self.get_digit()  # get a digit
-                if c:
-                    idf += c
-                    continue
-
-                break
-
-            self.skip_white()
-            self.dbg(f'return {idf}')
-            # return idf
-            return comp.Identifier(self, idf)
-
-    def get_a_string(self, string:str, skip_white = True, tail_white = False):
-        self.dbg(f' {string}')
-        save_1 = self.save()
-
-        if skip_white:
-            self.skip_white()
-
-        for c in string:
-            self.source_file_index += 1
-            if self.source_file_index >= self.source_file_buffer_len:
-                self.load(save_1)
-                self.dbg(f'{string} return False')
-                return False
-
-            if c != self.source_file_buffer[self.source_file_index]:
-                self.load(save_1)
-                self.dbg(f'{string} return False')
-                return False
-
-        if tail_white:
-            c = self.getc()
-            if c.isspace():
-                return True
-            else:
-                return False
+        # keywords are identifier tokens too. callers check the name.
 
-        self.dbg(f'{string} return True')
-        return True
-
-    def get_digit(self):
-        c = self.getc()
-        if c is None:
-            return comp.NoObject()
-
-        if c.isdigit():
-            return c
+        token = self.tokens[self.token_index]
+        if token.kind == lexer.IDENTIFIER:
+            self.next_token()
+            return comp.Identifier(self, token.value)
 
-        self.source_file_index -= 1
         return comp.NoObject()
 
-    def get_nondigit(self):
-        c = self.getc()
-        if c is None:
-            return None
-
-        if c == '_' or c.isalpha():
-            self.dbg(f'return {c}')
-            return c
+    def get_a_string(self, string:str):
+        # match one punctuator token
 
-        if c == '\n':
-            self.current_lineno -= 1
+        token = self.tokens[self.token_index]
+        if token.kind == lexer.PUNCTUATOR and token.value == string:
+            self.next_token()
+            return True
 
-        self.source_file_index -= 1
-        return None
+        return False
 
     def simple_self_test(self):
         idf = comp.Identifier(self, 'wtf')
@@ -3149,19 +2447,43 @@ class Compiler:
         assert idf in ['666', 'wtf']
 
     def gen_asm(self, name, tu):
+        # ast -> ir -> asm
         self.dbg_yellow(f'gen_asm')
         try:
-            self.asm_head.write(f'; {name}.asm\n; {datetime.datetime.now()}\n\n')
-            # self.asm_head.write(f'include cranks_libc.asm\n')
-            self.asm_data.write(f'    .data\n\n')
+            self.ir = IRBuilder(IRModule(name))
+            tu.gen_ir()
+
+            inlining = Inlining(self.ir.module)
+            inlining.run()
+            self.log.write('codegen', 'inline {}', (inlining.report(),), Color.orange)
+
+            constfold = ConstantFolding(self.ir.module)
+            constfold.run()
+            self.log.write('codegen', 'constfold {}', (constfold.report(),), Color.orange)
+
+            loopopt = LoopOptimization(self.ir.module)
+            loopopt.run()
+            self.log.write('codegen', 'loopopt {}', (loopopt.report(),), Color.orange)
 
-            helper_var = f'right_32f qword 0ffffffffh ; ffffffffh not work \n'
-            self.asm_data.write(helper_var)
+            dce = DeadCodeElimination(self.ir.module, self.whole_program)
+            dce.run()
+            self.log.write('codegen', 'dce {}', (dce.report(),), Color.orange)
 
-            tu.gen_asm()
+            ir_text = self.ir.module.dump()
+            self.log.write('ir', '{}', (ir_text,))
+            with open(os.path.join(self.output_dir, f'{name}.ir'), 'w', encoding = 'utf8') as f:
+                f.write(ir_text)
 
-            with open(f'./{name}.asm', 'w', encoding = 'utf8') as f:
-                f.write(self.asm_head.getvalue() + self.asm_data.getvalue() + self.asm_code.getvalue())
+            lowering = TARGETS[self.target](self.ir.module, self.log)
+            asm_name = f'{name}.{lowering.asm_ext}'
+            asm_head = f'{lowering.comment} {asm_name}\n{lowering.comment} {datetime.datetime.now()}\n\n'
+            # asm_head += f'include cranks_libc.asm\n'
+            code = lowering.finish_code(self.lower_functions(lowering))
+
+            asm = lowering.lower_data() + '\n'.join(code)
+
+            with open(os.path.join(self.output_dir, asm_name), 'w', encoding = 'utf8') as f:
+                f.write(asm_head + asm)
 
             return True
         #except CompilerError as e:
@@ -3174,6 +2496,40 @@ class Compiler:
 
         return False
 
+    def lower_functions(self, lowering):
+        # lowering and peephole one function at a time. with the function cache on,
+        # a function with the same ir as before takes its lines from the cache.
+        module = self.ir.module
+        peephole = Peephole()
+        lines = list(lowering.code_start)
+
+        for function in module.functions:
+            key = None
+            if self.function_cache is not None:
+                key = self.function_cache.key(function.dump(), [self.target])
+                entry = self.function_cache.fetch(key)
+                if entry is not None:
+                    function_lines, data = entry
+                    lines += function_lines
+                    module.data += data
+                    continue
+
+            function_lines, data = lowering.lower_function(function)
+            function_lines = peephole.optimize(function_lines)
+            if key is not None:
+                self.function_cache.store(key, function_lines, data)
+
+            lines += function_lines
+            module.data += data
+
+        lines += lowering.code_end
+
+        self.log.write('codegen', 'peephole {}', (peephole.report(),), Color.orange)
+        if self.function_cache is not None:
+            self.log.write('codegen', 'function cache {}', (self.function_cache.report(),), Color.orange)
+
+        return lines
+
     def remove_comments(self, name):
         # remove simple comments
         # ugly
@@ -3273,50 +2629,49 @@ class Compiler:
                 index += 1
                 continue
 
-        with open(f'./{name}_no_comment.c', 'w', encoding = 'utf8') as f:
+        with open(os.path.join(self.output_dir, f'{name}_no_comment.c'), 'w', encoding = 'utf8') as f:
             f.write(source_file_buffer_new.getvalue())
 
         self.source_file_buffer = source_file_buffer_new.getvalue()
         self.source_file_buffer_len = len(self.source_file_buffer)
 
 
-    def compile_and_run(self, source_file_name, silent = False):
-        error = None
-        try:
-            self.init()
-
-            self.dbg_ok(f'compile {source_file_name}')
-            file_name = os.path.basename(source_file_name)
-            self.dbg_ok(f'file_name = {file_name}')
-            name = os.path.splitext(file_name)[0]
-            self.dbg_ok(f'name = {name}')
-
-            with open(f'../test_case/{source_file_name}', 'r', encoding = 'utf8') as f:
-                self.source_file_buffer = f.read()
-                self.source_file_buffer_len = len(self.source_file_buffer)
+    def load_source(self, source_file_name):
+        # source_dir/source_file_name into source_file_buffer without comments. returns the name
+        self.init()
 
-            self.remove_comments(name)
+        self.dbg_ok(f'compile {source_file_name}')
+        file_name = os.path.basename(source_file_name)
+        self.dbg_ok(f'file_name = {file_name}')
+        name = os.path.splitext(file_name)[0]
+        self.dbg_ok(f'name = {name}')
 
-            if silent:
-                self.set_print_on_off(False)
+        with open(os.path.join(self.source_dir, source_file_name), 'r', encoding = 'utf8') as f:
+            self.source_file_buffer = f.read()
+            self.source_file_buffer_len = len(self.source_file_buffer)
 
-            self.print_depth = True
-            tu = self.get_translation_unit()
-            self.print_depth = False
+        self.remove_comments(name)
 
-            tu.print_me()
+        return name
 
-            result = self.gen_asm(name, tu)
+    def compile_and_run(self, source_file_name, silent = False):
+        error = None
+        try:
+            name = self.load_source(source_file_name)
 
-            if silent:
-                self.set_print_on_off(True)
+            cache_key = self.compile_cache_key()
+            if cache_key is not None and self.compile_cache.fetch(cache_key, self.output_dir, self.compiled_files(name)):
+                self.dbg_ok(f'compile cache hit {cache_key}')
+                result = True
+            else:
+                result = self.compile_source(name, silent) and self.build(name)
+                if result and cache_key is not None:
+                    self.compile_cache.store(cache_key, self.output_dir, self.compiled_files(name))
 
             if result:
-                result = self.build(name)
+                result, output = self.run(name + '.exe' if self.target == 'windows' else f'./{name}')
                 if result:
-                    result, output = self.run(name + '.exe')
-                    if result:
-                        return True, output
+                    return True, output
 
         except CompilerError as e:
             self.dbg_fail(e)
@@ -3330,69 +2685,224 @@ class Compiler:
 
         return False, error
 
-    def build(self, name):
-        # call assembler. build exe
-        # now in output folder
+    def compile_source(self, name, silent):
+        # source_file_buffer without comments -> asm
+        self.tokenize()
 
-        # self.dbg(f'sys.getfilesystemencoding() = {sys.getfilesystemencoding()}')
-        # self.dbg(f'locale.getencoding() = {locale.getencoding()}')
-        # self.dbg(f'locale.getlocale() = {locale.getlocale()}')
+        if silent:
+            self.set_print_on_off(False)
 
-        lib_path = self.win_sdk_lib_path # f'C:/Program Files (x86)/Windows Kits/10/Lib/10.0.22621.0/um/x64/'
-        lib_string = f'"{lib_path}kernel32.lib" "{lib_path}user32.lib"'
-        # lib_string = ''
-        libc_name = 'cranks_libc'
+        self.print_depth = True
+        self.log.stage = 'parser'
+        tu = self.get_translation_unit()
+        self.print_depth = False
 
-        # "c:\Program Files\Microsoft Visual Studio\2022\Community\VC\Tools\MSVC\14.37.32822\bin\Hostx64\x64\ml64.exe" ./test.asm /link /subsystem:console /entry:main
-        # cmd_1 = '"c:\Program Files\Microsoft Visual Studio\2022\Community\VC\Tools\MSVC\14.37.32822\bin\Hostx64\x64\ml64.exe" ./test.asm /link /subsystem:console /entry:main'
-        ml64_exe = self.ml64_path # '"c:/Program Files/Microsoft Visual Studio/2022/Community/VC/Tools/MSVC/14.37.32822/bin/Hostx64/x64/ml64.exe"'
+        if self.packrat is not None:
+            self.print_normal(self.packrat.report())
 
-        cmd_1 = f'{ml64_exe} /c ../compiler/{libc_name}.asm'
+        if self.log.enabled('parser'):
+            tu.print_me()
 
-        cmd_2 = f'{ml64_exe} ./{name}.asm ./{libc_name}.obj {lib_string} /link /subsystem:console /entry:main '
+        self.log.stage = 'codegen'
+        result = self.gen_asm(name, tu)
 
-        # default /stack:1048576,4096
-        # https://learn.microsoft.com/en-us/cpp/build/reference/stacksize?view=msvc-170
-        # without calling __chkstk, large stack array will cause memory violation
-        # https://learn.microsoft.com/en-us/windows/win32/devnotes/-win32-__chkstk?source=recommendations
-        # https://stackoverflow.com/questions/4123609/allocating-a-buffer-of-more-a-page-size-on-stack-will-corrupt-memory
-        # https://www.metricpanda.com/rival-fortress-update-45-dealing-with-__chkstk-__chkstk_ms-when-cross-compiling-for-windows/
-        # not using __chkstk for simplicity
-        cmd_2 += '/stack:1048576,1048576'
+        if silent:
+            self.set_print_on_off(True)
 
-        # todo: subprocess displays garbage on error with chinese system.
+        return result
 
+    def compile_object(self, source_file_name, silent = False):
+        # one translation unit of many. source -> asm -> object. returns the path of the object
+        # functions main does not call stay. other units may call them.
+        self.whole_program = False
         try:
-            self.dbg_yellow(f'run assembler {cmd_1}')
-            result = subprocess.run(cmd_1, shell = True, encoding = 'utf-8')  # , encoding = 'utf8'
-            # result = subprocess.run(cmd, shell = True, encoding = 'utf8') # , encoding = 'utf8'
-            self.dbg_yellow(f'assembler result = {result}')
-            if result.returncode == 0:
-                self.dbg_ok(f'assembler ok')
-            else:
-                raise CompilerError(f'assembler failed 1')
+            name = self.load_source(source_file_name)
+            if not self.compile_source(name, silent):
+                raise CompilerError(f'{source_file_name} gen_asm failed')
 
-            self.dbg_yellow(f'run assembler {cmd_2}')
-            # check_output run
-            result = subprocess.run(cmd_2, shell = True, encoding = 'utf-8') # , encoding = 'utf8'
-            self.dbg_yellow(f'assembler result = {result}')
-            if result.returncode == 0:
-                self.dbg_ok(f'assembler ok')
+            return self.assemble(name)
+        finally:
+            self.whole_program = True
+            if silent:
+                self.set_print_on_off(True)
+
+    def compile_files(self, source_file_names, jobs = 1, silent = False):
+        # each file is its own translation unit. one object each, over a process pool when jobs > 1.
+        # then one link with the runtime. the program is named after the first file.
+        # a function defined in another file needs its prototype. it becomes an extern.
+        error = None
+        try:
+            name = os.path.splitext(os.path.basename(source_file_names[0]))[0]
+            start = time.perf_counter()
+
+            if jobs > 1:
+                objects = self.compile_objects_parallel(source_file_names, jobs, silent)
             else:
-                raise CompilerError(f'assembler failed 2')
+                objects = []
+                for source_file_name in source_file_names:
+                    file_start = time.perf_counter()
+                    objects.append(self.compile_object(source_file_name, silent))
+                    self.dbg_ok(f'{source_file_name} object ok! {time.perf_counter() - file_start:.2f}s')
 
-            return True
+            self.link(name, objects + [self.runtime_object()])
+            self.print_normal('files = {} jobs = {} build = {:.2f}s', len(objects), jobs, time.perf_counter() - start)
 
-        except subprocess.CalledProcessError as e:
-            self.dbg_fail(f'assembler failed. error = {e}')
+            result, output = self.run(name + '.exe' if self.target == 'windows' else f'./{name}')
+            if result:
+                return True, output
 
-        return False
+        except CompilerError as e:
+            self.dbg_fail(e)
+        except CodeError as e:
+            traceback.print_exc()
+            self.dbg_fail(e)
+            error = e
+
+        return False, error
+
+    def compile_objects_parallel(self, source_file_names, jobs, silent):
+        # paths of the objects in the order of the files. each worker writes them to its own folder.
+        objects = {}
+        failed = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers = jobs, initializer = init_worker,
+                                                    initargs = (self.worker_settings(), multiprocessing.Value('i', 0))) as pool:
+            futures = [pool.submit(compile_object_worker, source_file_name, silent) for source_file_name in source_file_names]
+            for future in concurrent.futures.as_completed(futures):
+                source_file_name, obj, error, log_text, seconds = future.result()
+                if error is None:
+                    objects[source_file_name] = obj
+                    self.dbg_ok(f'{source_file_name} object ok! {seconds:.2f}s')
+                else:
+                    failed.append(source_file_name)
+                    print(log_text)
+                    self.dbg_fail(f'{source_file_name} {error} {seconds:.2f}s')
+
+        if failed:
+            raise CompilerError(f'compile failed. {", ".join(failed)}')
+
+        return [objects[source_file_name] for source_file_name in source_file_names]
+
+    def compile_cache_key(self):
+        # None when the cache is off. the options are all that changes the asm and the exe.
+        if self.compile_cache is None:
+            return None
+
+        # the exe has the runtime object in it. its name has the hash of the runtime source.
+        # ml64 is the assembler and hands the objects to link. on linux ld links.
+        options = [self.target, os.path.basename(self.runtime_object())]
+        if self.target == 'windows':
+            options += [self.tool_version(self.ml64_path), self.win_sdk_lib_path]
+        else:
+            options += [self.tool_version('as'), self.tool_version('ld')]
+
+        return self.compile_cache.key(self.source_file_buffer, options)
+
+    def compiled_files(self, name):
+        # name in a compile cache entry -> name in the output folder
+        asm_ext = TARGETS[self.target].asm_ext
+        exe_ext = '.exe' if self.target == 'windows' else ''
+        return {f'program.{asm_ext}': f'{name}.{asm_ext}', f'program{exe_ext}': f'{name}{exe_ext}'}
+
+    def build(self, name):
+        # call assembler. build exe
+        # the commands run in the output folder
+        self.link(name, [self.assemble(name), self.runtime_object()])
+
+        return True
+
+    def tool_version(self, tool_command):
+        # the banner of the assembler or the linker. ml64 prints it with no args. as and ld have --version
+        if tool_command not in self.tool_versions:
+            command = f'{tool_command} --version' if self.target == 'linux' else tool_command
+            result = subprocess.run(command, shell = True, encoding = 'utf-8', errors = 'replace',
+                                    stdout = subprocess.PIPE, stderr = subprocess.STDOUT)
+            lines = result.stdout.strip().splitlines()
+            self.tool_versions[tool_command] = lines[0] if lines else ''
+
+        return self.tool_versions[tool_command]
+
+    def runtime_object(self):
+        # the runtime library is assembled once into cache_dir. the name has a hash of its source and the assembler.
+        # a change to either makes a new object. returns its path
+        if self.target == 'linux':
+            libc_name, source_ext, obj_ext, assembler = 'cranks_libc_linux', 's', 'o', 'as'
+            command = 'as --64 -o "{obj}" "{source}"'
+        else:
+            libc_name, source_ext, obj_ext, assembler = 'cranks_libc', 'asm', 'obj', self.ml64_path
+            command = f'{self.ml64_path} /c /Fo"{{obj}}" "{{source}}"'
+
+        source = os.path.join(COMPILER_DIR, f'{libc_name}.{source_ext}')
+        with open(source, 'rb') as f:
+            digest = hashlib.sha256(f.read())
+        digest.update(self.tool_version(assembler).encode('utf8'))
+
+        obj = os.path.abspath(os.path.join(self.cache_dir, f'{libc_name}_{digest.hexdigest()[:16]}.{obj_ext}'))
+        if os.path.exists(obj):
+            self.dbg_ok(f'runtime object cached {obj}')
+            return obj
+
+        # workers may build it at the same time. each one writes its own file and moves it in place.
+        os.makedirs(self.cache_dir, exist_ok = True)
+        temp = f'{obj}.{os.getpid()}.tmp'
+        command = command.format(obj = temp, source = source)
+        self.dbg_yellow(f'run assembler {command}')
+        result = subprocess.run(command, shell = True, encoding = 'utf-8', cwd = self.output_dir)
+        self.dbg_yellow(f'assembler result = {result}')
+        if result.returncode != 0:
+            raise CompilerError(f'assembler failed 1')
+
+        os.replace(temp, obj)
+        self.dbg_ok(f'runtime object built {obj}')
+
+        return obj
+
+    def run_build_command(self, command, error):
+        self.dbg_yellow(f'run {command}')
+        result = subprocess.run(command, shell = True, encoding = 'utf-8', cwd = self.output_dir)
+        self.dbg_yellow(f'result = {result}')
+        if result.returncode != 0:
+            raise CompilerError(error)
+
+    def assemble(self, name):
+        # the asm of name to an object. returns its path
+        if self.target == 'linux':
+            self.run_build_command(f'as --64 -o ./{name}.o ./{name}.s', 'assembler failed 2')
+            return os.path.abspath(os.path.join(self.output_dir, f'{name}.o'))
+
+        self.run_build_command(f'{self.ml64_path} /c /Fo"./{name}.obj" ./{name}.asm', 'assembler failed 2')
+        return os.path.abspath(os.path.join(self.output_dir, f'{name}.obj'))
+
+    def link(self, name, objects):
+        # the objects to the exe of name. the runtime object is one of them
+        objects = ' '.join(f'"{obj}"' for obj in objects)
+
+        if self.target == 'linux':
+            # gnu ld. no libc. cranks_libc_linux.s has _start
+            self.run_build_command(f'ld -o ./{name} {objects}', 'linker failed')
+        else:
+            # ml64 hands the objects to link
+            # "c:/Program Files/Microsoft Visual Studio/2022/Community/VC/Tools/MSVC/14.37.32822/bin/Hostx64/x64/ml64.exe"
+            lib_path = self.win_sdk_lib_path # f'C:/Program Files (x86)/Windows Kits/10/Lib/10.0.22621.0/um/x64/'
+            lib_string = f'"{lib_path}kernel32.lib" "{lib_path}user32.lib"'
+
+            # default /stack:1048576,4096
+            # https://learn.microsoft.com/en-us/cpp/build/reference/stacksize?view=msvc-170
+            # without calling __chkstk, large stack array will cause memory violation
+            # https://learn.microsoft.com/en-us/windows/win32/devnotes/-win32-__chkstk?source=recommendations
+            # https://stackoverflow.com/questions/4123609/allocating-a-buffer-of-more-a-page-size-on-stack-will-corrupt-memory
+            # https://www.metricpanda.com/rival-fortress-update-45-dealing-with-__chkstk-__chkstk_ms-when-cross-compiling-for-windows/
+            # not using __chkstk for simplicity
+            # todo: subprocess displays garbage on error with chinese system.
+            self.run_build_command(f'{self.ml64_path} {objects} {lib_string} /Fe"./{name}.exe" '
+                                   f'/link /subsystem:console /entry:main /stack:1048576,1048576', 'linker failed')
+
+        self.dbg_ok(f'link ok')
 
     def run(self, name):
         try:
             self.dbg_yellow(f'start run {name}')
             # check_output run
-            result = subprocess.run(f'{name}', shell = True, encoding = 'utf-8', stdout = subprocess.PIPE)  # , encoding = 'utf8'
+            result = subprocess.run(f'{name}', shell = True, encoding = 'utf-8', stdout = subprocess.PIPE, cwd = self.output_dir)  # , encoding = 'utf8'
             self.dbg_yellow(f'run {name} result = {result}')
             if result.returncode == 0:
                 self.dbg_ok(f'run ok')
@@ -3409,12 +2919,9 @@ class Compiler:
 
         return False, None
 
-    def run_tests(self):
-        self.dbg_ok(f'os.getcwd() = {os.getcwd()}')
-        os.chdir('./output')
-        self.dbg_ok(f'os.getcwd() now = {os.getcwd()}')
-
-        with open(f'../test_case/test.json') as test_json:
+    def run_tests(self, jobs = 1):
+        # jobs > 1 runs the tests over a process pool. see run_tests_parallel
+        with open(os.path.join(self.source_dir, 'test.json')) as test_json:
             test_info = json.load(test_json)
             print(test_info)
 
@@ -3425,31 +2932,150 @@ class Compiler:
             test_end = test_info['test_end']
             silent_test = test_info['silent_test']
 
+            if jobs > 1:
+                self.run_tests_parallel(range(test_start, test_end + 1), silent_test, jobs)
+                return
+
             for i in range(test_start, test_end + 1):
-                ok, output = self.compile_and_run(f'test_{i}.c', silent = silent_test)
-                if not ok:
-                    if isinstance(output, CompilerError):
-                        raise CompilerError(f'test_{i}.c failed. lineno = {self.current_lineno}')
-                    elif isinstance(output, CodeError): # fail test
-                        output = io.StringIO(output.raw_msg)
-                    else:
-                        raise CompilerError(f'test_{i}.c failed. lineno = {self.current_lineno}')
+                start = time.perf_counter()
+                ok, output = self.compile_test(i, silent_test)
+                self.check_answer(i, self.test_output(i, ok, output))
+
+                self.dbg_ok(f'test_{i}.c test ok! {time.perf_counter() - start:.2f}s')
+
+            self.dbg_ok(f'run_tests ok')
+
+    def compile_test(self, i, silent):
+        # test_{i}_*.c are more translation units of test_{i}.c. they are linked with it
+        extras = sorted(file_name for file_name in os.listdir(self.source_dir)
+                        if file_name.startswith(f'test_{i}_') and file_name.endswith('.c'))
+        if extras:
+            return self.compile_files([f'test_{i}.c'] + extras, silent = silent)
+
+        return self.compile_and_run(f'test_{i}.c', silent = silent)
+
+    def test_output(self, i, ok, output):
+        # what compile_and_run gave, as the text to check. a fail test gives its code error.
+        if not ok:
+            if isinstance(output, CodeError): # fail test
+                return output.raw_msg
+
+            raise CompilerError(f'test_{i}.c failed. lineno = {self.current_lineno}')
+
+        return output
+
+    def check_answer(self, i, output):
+        output = io.StringIO(output)
+        with open(os.path.join(self.source_dir, f'test_{i}.ans'), 'r', encoding = 'utf8') as answer:
+            line = 0
+            while True:
+                answer_line = answer.readline()
+                if not answer_line:
+                    break
+
+                line += 1
+
+                output_line = output.readline()
+                if answer_line != output_line:
+                    raise CompilerError(f'test_{i}.c wrong answer at line {line}\noutput_line =\n{output_line}\nanswer_line =\n{answer_line}\n')
+
+    def worker_settings(self):
+        # what a worker process needs to make a compiler like this one. see init_worker
+        return {'ml64_path': self.ml64_path, 'win_sdk_lib_path': self.win_sdk_lib_path, 'target': self.target,
+                'packrat': self.packrat.max_size if self.packrat is not None else None,
+                'compile_cache': self.compile_cache.max_bytes if self.compile_cache is not None else None,
+                'function_cache': self.function_cache.max_bytes if self.function_cache is not None else None,
+                'channels': dict(self.log.channels),
+                'source_dir': self.source_dir, 'output_dir': self.output_dir, 'cache_dir': self.cache_dir}
+
+    def run_tests_parallel(self, numbers, silent_test, jobs):
+        # each worker process has its own compiler and its own output folder. output/worker_{index}
+        # the log of a test is kept. it is printed when the test fails.
+        start = time.perf_counter()
+        timings = {}
+        failed = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers = jobs, initializer = init_worker,
+                                                    initargs = (self.worker_settings(), multiprocessing.Value('i', 0))) as pool:
+            futures = [pool.submit(run_test_worker, i, silent_test) for i in numbers]
+            for future in concurrent.futures.as_completed(futures):
+                i, error, log_text, seconds = future.result()
+                timings[i] = seconds
+                if error is None:
+                    self.dbg_ok(f'test_{i}.c test ok! {seconds:.2f}s')
                 else:
-                    output = io.StringIO(output)
+                    failed.append(i)
+                    print(log_text)
+                    self.dbg_fail(f'test_{i}.c {error} {seconds:.2f}s')
 
-                with open(f'../test_case/test_{i}.ans', 'r', encoding = 'utf8') as answer:
-                    line = 0
-                    while True:
-                        answer_line = answer.readline()
-                        if not answer_line:
-                            break
+        wall = time.perf_counter() - start
+        self.print_normal('tests = {} jobs = {} wall = {:.2f}s serial = {:.2f}s', len(timings), jobs, wall, sum(timings.values()))
+        for i in sorted(timings, key = timings.get, reverse = True)[:5]:
+            self.print_normal('    test_{}.c {:.2f}s', i, timings[i])
 
-                        line += 1
+        if failed:
+            raise CompilerError(f'run_tests failed. {", ".join(f"test_{i}.c" for i in sorted(failed))}')
 
-                        output_line = output.readline()
-                        if answer_line != output_line:
-                            raise CompilerError(f'test_{i}.c wrong answer at line {line}\noutput_line =\n{output_line}\nanswer_line =\n{answer_line}\n')
+        self.dbg_ok(f'run_tests ok')
 
-                self.dbg_ok(f'test_{i}.c test ok!')
 
-            self.dbg_ok(f'run_tests ok')
+# parallel run_tests and compile_files. the compiler of this worker process. made by init_worker.
+worker_compiler = None
+
+
+def init_worker(settings, counter):
+    # counter gives the workers of a pool the indexes 0 to jobs - 1. the folders are the same on every run
+    global worker_compiler
+    worker_compiler = Compiler(settings['ml64_path'], settings['win_sdk_lib_path'], settings['target'])
+    if settings['packrat'] is not None:
+        worker_compiler.set_packrat_on_off(True, settings['packrat'])
+
+    for channel, on_off in settings['channels'].items():
+        worker_compiler.set_log_channel_on_off(channel, on_off)
+
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    output_dir = os.path.join(settings['output_dir'], f'worker_{index}')
+    os.makedirs(output_dir, exist_ok = True)
+    worker_compiler.set_dirs(settings['source_dir'], output_dir, settings['cache_dir'])
+    if settings['compile_cache'] is not None:
+        worker_compiler.set_compile_cache_on_off(True, settings['compile_cache'])
+    if settings['function_cache'] is not None:
+        worker_compiler.set_function_cache_on_off(True, settings['function_cache'])
+
+
+def run_test_worker(i, silent_test):
+    # (i, error or None, log, seconds). the log is what the test printed.
+    start = time.perf_counter()
+    log = io.StringIO()
+    error = None
+    with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            ok, output = worker_compiler.compile_test(i, silent_test)
+            worker_compiler.check_answer(i, worker_compiler.test_output(i, ok, output))
+        except CompilerError as e:
+            error = e.msg
+        except Exception:
+            traceback.print_exc()
+            error = 'failed'
+
+    return i, error, log.getvalue(), time.perf_counter() - start
+
+
+def compile_object_worker(source_file_name, silent):
+    # (source file name, object path, error or None, log, seconds)
+    start = time.perf_counter()
+    log = io.StringIO()
+    obj = None
+    error = None
+    with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            obj = worker_compiler.compile_object(source_file_name, silent)
+        except (CompilerError, CodeError) as e:
+            error = e.msg
+        except Exception:
+            traceback.print_exc()
+            error = 'failed'
+
+    return source_file_name, obj, error, log.getvalue(), time.perf_counter() - start
@@ -1,17 +1,23 @@
-from compiler.tool import CompilerError, CodeError, PRINT_INDENT
+from compiler.tool import CompilerError, CodeError, Color, PRINT_INDENT
+from compiler.ir import I64, PTR
+from compiler.constfold import fold_binary
 import pprint
 import copy
 import functools
+import sys
 
-TEMP_REG_0 = 'r10'
-TEMP_REG_1 = 'r11'
-TEMP_REG_2 = 'r12'
-TEMP_REG_3 = 'r13'
-TEMP_REG_4 = 'r14'
-TEMP_REG_5 = 'r15'
+
+def fold_constant(op, a, b):
+    # fold_binary along a constant chain. None once one step can not be folded
+    if a is None or b is None:
+        return None
+
+    return fold_binary(op, a, b)
 
 
 class NoObject:
+    __slots__ = ('compiler',)
+
     print_on = True
 
     def __init__(self, compiler = None):
@@ -30,54 +36,45 @@ class NoObject:
     def __next__(self):
         return None
 
-    def gen_asm(self, result_offset):
-        raise CompilerError(f'NoObject gen_asm')
+    def gen_ir(self, *args, **kwargs):
+        raise CompilerError(f'NoObject gen_ir')
 
 
 class CComponent:
+    __slots__ = ('compiler', 'lineno')
+
     def __init__(self, compiler):
         self.compiler = compiler
         self.lineno = compiler.current_lineno
         
-    def print(self, text):
-        self.compiler.print_normal(text)
-
-    def print_red(self, text):
-        self.compiler.print_red(text)
+    # components log to the channel of the current stage. parser or codegen.
+    # text is a str.format template. args are formatted only when the channel is on.
 
-    def print_yellow(self, text):
-        self.compiler.print_yellow(text)
+    def log_on(self):
+        return self.compiler.log.enabled()
 
-    def print_green(self, text):
-        self.compiler.print_green(text)
+    def print(self, text, *args):
+        self.compiler.log.write(None, text, args)
 
-    def print_orange(self, text):
-        self.compiler.print_orange(text)
+    def print_red(self, text, *args):
+        self.compiler.log.write(None, text, args, Color.red)
 
-    def write_asm_data(self, code: str):
-        self.compiler.asm_data.write(code)
+    def print_yellow(self, text, *args):
+        self.compiler.log.write(None, text, args, Color.yellow)
 
-    def write_asm(self, code: str):
-        self.compiler.asm_code.write(code)
+    def print_green(self, text, *args):
+        self.compiler.log.write(None, text, args, Color.green)
 
-    def stack_alloc(self, size, comment):
-        self.write_asm(f'    sub rsp, {size} ; {comment}\n')
-        return self.compiler.add_function_stack_offset(size)
-        
-    def stack_free(self, size, comment):
-        self.write_asm(f'    add rsp, {size} ; {comment}\n')
-        return self.compiler.add_function_stack_offset(-size)
+    def print_orange(self, text, *args):
+        self.compiler.log.write(None, text, args, Color.orange)
 
-    def push_reg(self, reg, comment = ''):
-        self.write_asm(f'    push {reg} ; {comment}\n')
-        self.compiler.add_function_stack_offset(8)
-
-    def pop_reg(self, reg, comment = ''):
-        self.write_asm(f'    pop {reg} ; {comment}\n')
-        self.compiler.add_function_stack_offset(-8)
+    @property
+    def ir(self):
+        # IRBuilder of the current compile
+        return self.compiler.ir
 
     def print_current_scope(self, msg = ''):
-        self.print(f'{self.__class__.__name__} {msg} scope_level = {len(self.compiler.scopes)} scope = ')
+        self.print('{} {} scope_level = {} scope = ', self.__class__.__name__, msg, len(self.compiler.scopes))
         pprint.pprint(self.compiler.scopes[-1], indent = 4)
 
     def get_scope_item(self, name):
@@ -87,29 +84,62 @@ class CComponent:
 
         return item
 
-    def add_to_scope(self, item, add_to_variable_stack_size = True):
+    def get_operand(self, item, need_global_const):
+        # look through casts, parens and single item wrappers. no code is generated.
+        # keeps the python stack flat for deeply nested expressions.
+        while True:
+            if isinstance(item, ChainExpression) and item.data_count == 1:
+                item = item.data[0]
+            elif isinstance(item, CastExpression):
+                item = item.ue
+            elif isinstance(item, UnaryExpression) and item.pe:
+                item = item.pe
+            elif isinstance(item, PostfixExpression) and item.data_count == 0:
+                item = item.primary
+            elif isinstance(item, PrimaryExpression) and item.exp and len(item.exp.aes) == 1 and not need_global_const:
+                item = item.exp.aes[0]
+            elif isinstance(item, AssignmentExpression) and item.ce:
+                item = item.ce
+            elif isinstance(item, ConditionalExpression) and not item.exp:
+                item = item.loe
+            else:
+                return item
+
+    def gen_branch(self, true_block, false_block):
+        # evaluate as a condition. jump to true_block when it is not 0
+        self.ir.branch(self.rvalue(self.gen_ir()), true_block, false_block)
+
+    def gen_condition(self, exp, true_block, false_block):
+        # exp is the condition of a statement. in a comma expression only the last one is.
+        for ae in exp.aes[:-1]:
+            ae.gen_ir()
+
+        self.get_operand(exp.aes[-1], False).gen_branch(true_block, false_block)
+
+    def get_type_size(self, data_type):
+        # bytes of one object. 8 for all simple data types for now
+        if data_type in ['int']:
+            return 8
+
+        scope_item = self.get_scope_item(data_type)
+        if scope_item is None:
+            self.raise_code_error(f'[{data_type}] not defined')
+
+        return scope_item['size']
+
+    def add_to_scope(self, item):
         if item['name'] in self.compiler.scopes[-1].current:
             self.raise_code_error(f'[{item["name"]}] already defined')
 
         self.compiler.scopes[-1].current[item['name']] = item
 
-        if add_to_variable_stack_size:
-            if 'lv' in item or 'array_data' in item:
-                if 'global' not in item:
-                    self.compiler.scopes[-1].variable_stack_size += item['size']
-
     def enter_scope(self):
-        self.write_asm(f'    ; enter_scope\n')
         self.compiler.enter_scope()
+        self.ir.enter_scope()
 
-    def leave_scope(self, free_stack_variables = True):
-        self.write_asm(f'    ; leave_scope\n')
-        if free_stack_variables:
-            data_size = self.compiler.scopes[-1].variable_stack_size
-            if data_size > 0:
-                self.stack_free(data_size, f'leave_scope. free stack variables. size = {data_size}')
-
+    def leave_scope(self):
         self.compiler.leave_scope()
+        self.ir.leave_scope()
 
     def raise_code_error(self, msg = ''):
         raise CodeError(f'line {self.lineno}: {msg}')
@@ -117,7 +147,7 @@ class CComponent:
     def raise_compiler_error(self, msg = ''):
         raise CompilerError(f'line {self.lineno}: {msg}')
 
-    def gen_asm_helper(func):
+    def gen_ir_helper(func):
         @functools.wraps(func)
         def helper(self, *args, **kwargs):
             saved_lineno = self.compiler.current_lineno
@@ -130,32 +160,45 @@ class CComponent:
 
         return helper
 
+    # expression results are dicts with the type info of the expression and one of
+    #   'value'                     int known at compile time
+    #   'vreg'                      the value is in a vreg
+    #   'address' with 'lv'         an object in memory. an lvalue
+    #   'address' with array_data   an array. its value is the address
+
+    def rvalue(self, data):
+        # an int or a vreg with the value of an expression result
+        if 'vreg' in data:
+            return data['vreg']
+        elif 'array_data' in data:
+            return data['address']
+        elif 'function_data' in data:
+            return self.ir.global_addr(data['name'])
+        elif 'lv' in data:
+            return self.ir.load(data['address'], PTR if 'pointer_data' in data else I64)
+        elif 'value' in data:
+            return data['value']
+
+        self.raise_compiler_error(f'no value in [{data}]')
+
+    def value_data(self, data, value):
+        # result with the type of data and value. value is an int or a vreg
+        result = {key:data[key] for key in ['data_type', 'pointer_data'] if key in data}
+        if isinstance(value, int):
+            result['value'] = value
+        else:
+            result['vreg'] = value
+
+        return result
+
     def set_lv_value(self, left_data, right_data):
         if 'lv' not in left_data:
             self.raise_code_error(f'= needs lvalue')
 
-        # left value to TEMP_REG_3
-        if 'lv_address' in left_data:
-            self.write_asm(f'    mov {TEMP_REG_3}, [rbp - {left_data["offset"]}] ; lv_address to {TEMP_REG_3}\n')
-        else:
-            if 'global' in left_data:
-                self.write_asm(f'    lea {TEMP_REG_3}, {left_data["name"]} ; global left address to {TEMP_REG_3}\n')
-            else:
-                self.write_asm(f'    mov {TEMP_REG_3}, rbp ; rbp to {TEMP_REG_3}\n')
-                self.write_asm(f'    sub {TEMP_REG_3}, {left_data["offset"]} ; local left address to {TEMP_REG_3}\n')
-
-        # right value to TEMP_REG_4
-        if 'value' in right_data:
-            self.write_asm(f'    mov {TEMP_REG_4}, {right_data["value"]} ; right value to {TEMP_REG_4}\n')
-        else:
-            self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {right_data["offset"]}] ; right address {TEMP_REG_4}\n')
-
-            # if 'lv_address' in right_data:
-            #    self.write_asm(f'    mov {TEMP_REG_4}, [{TEMP_REG_4}] ; get right value\n')
+        value = self.rvalue(right_data)
+        self.ir.store(left_data['address'], value)
 
-        # TEMP_REG_3 = left runtime address
-        # TEMP_REG_4 = right value
-        self.write_asm(f'    mov [{TEMP_REG_3}], {TEMP_REG_4} ; right value to left address\n')
+        return value
 
 
 class TypeSpecifier(CComponent):
@@ -172,6 +215,8 @@ class TypeSpecifier(CComponent):
     # enum-specifier
     # typedef-name
 
+    __slots__ = ('type_data',)
+
     def __init__(self, compiler, type_data):
         super().__init__(compiler)
         self.type_data = type_data
@@ -188,6 +233,8 @@ class TypeSpecifier(CComponent):
 
 
 class Typedef(CComponent):
+    __slots__ = ('dss', 'dtr', 'name')
+
     def __init__(self, compiler, dss, dtr):
         super().__init__(compiler)
         self.dss = dss
@@ -222,6 +269,8 @@ class StructUnion(CComponent):
     # 2. disposable struct. use once.
     # 3. S2 must exist
 
+    __slots__ = ('tp', 'name', 'decls', 'size', 'members')
+
     def __init__(self, compiler, tp, name, decls):
         super().__init__(compiler)
         self.tp = tp  # 'struct' or 'union'
@@ -247,15 +296,16 @@ class StructUnion(CComponent):
         else:
             self.print(f'{" " * (indent + PRINT_INDENT)}NoObject()')
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self):
+    @CComponent.gen_ir_helper
+    def gen_ir(self):
         self.gen_struct_data()
 
     def gen_struct_data(self):
-        self.print(f'gen_struct_data type = {self.tp}')
+        self.print('gen_struct_data type = {}', self.tp)
 
         if self.tp == 'struct':
-            self.print_me()
+            if self.log_on():
+                self.print_me()
 
             if self.decls: # case 1 case 2
                 # gen data
@@ -282,7 +332,7 @@ class StructUnion(CComponent):
                                 if 'struct_data' not in struct:
                                     self.raise_code_error(f'[{item.type_data.name}] is not struct')
 
-                                self.print_red(f'item = {item}')
+                                self.print_red('item = {}', item)
 
                                 ts = struct
                             else:
@@ -302,7 +352,7 @@ class StructUnion(CComponent):
                             dim = item_def['array_data']['dim']
                             for rank_exp in item_def['array_data']['ranks']:
 
-                                result = rank_exp.gen_asm(None, set_result = False, need_global_const = True)
+                                result = rank_exp.gen_ir(need_global_const = True)
 
                                 if 'value' not in result:
                                     self.raise_code_error(f'array rank must be const')
@@ -319,6 +369,8 @@ class StructUnion(CComponent):
                         if ts in ['int']:
                             member_data = copy.deepcopy(item_def)
                             member_data['data_type'] = ts
+                            if 'array_data' in item_def:
+                                member_data['array_data'] = {'dim':dim, 'ranks':ranks}
 
                             if len(item[0][0]) > 0:
                                 member_data['pointer_data'] = copy.deepcopy(item[0][0])
@@ -347,6 +399,8 @@ class StructUnion(CComponent):
 
                             member_data = copy.deepcopy(item_def)
                             member_data['data_type'] = ts['name']
+                            if 'array_data' in item_def:
+                                member_data['array_data'] = {'dim':dim, 'ranks':ranks}
                             if len(item[0][0]) > 0:
                                 member_data['pointer_data'] = copy.deepcopy(item[0][0])
                             member_data['offset'] = offset
@@ -387,6 +441,9 @@ class StructUnion(CComponent):
 class AssignmentExpression(CComponent):
     # conditional-expression
     # unary-expression assignment-operator assignment-expression
+
+    __slots__ = ('ce', 'ue', 'opt', 'ae')
+
     def __init__(self, compiler, ce = NoObject(), ue = NoObject(), opt = NoObject(), ae = NoObject()):
         super().__init__(compiler)
         self.ce = ce
@@ -406,13 +463,15 @@ class AssignmentExpression(CComponent):
             self.print(f'{" " * (indent + PRINT_INDENT)}{self.opt}')
             self.ae.print_me(indent + PRINT_INDENT)
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self, my_result_offset = None, set_result = True, need_global_const = False, **kwargs):
+    @CComponent.gen_ir_helper
+    def gen_ir(self, need_global_const = False):
         if self.ce:
-            return self.ce.gen_asm(my_result_offset, set_result, need_global_const = need_global_const, **kwargs)
+            return self.ce.gen_ir(need_global_const = need_global_const)
         else:
-            self.write_asm(f'    ; AssignmentExpression get left_data\n')
-            left_data = self.ue.gen_asm(my_result_offset)
+            if need_global_const:
+                self.raise_code_error(f'AssignmentExpression need_global_const')
+
+            left_data = self.ue.gen_ir()
 
             if 'lv' in left_data:
                 # case 1: *p = 123;
@@ -421,26 +480,13 @@ class AssignmentExpression(CComponent):
                 # *a = *b = 1
 
                 if self.opt == '=':
-                    offset = self.stack_alloc(8, 'for AssignmentExpression')
-
-                    self.write_asm(f'    ; AssignmentExpression get right_data\n')
-                    right_data = self.ae.gen_asm(offset, fetch_lv_address_value = True)
+                    right_data = self.ae.gen_ir()
 
-                    self.print_red(f'left_data = {left_data}')
-                    self.print_red(f'right_data = {right_data}')
+                    self.print_red('left_data = {}', left_data)
+                    self.print_red('right_data = {}', right_data)
 
-                    self.set_lv_value(left_data, right_data)
-
-                    if set_result:
-                        if 'fetch_lv_address_value' in kwargs:
-                            # value must be in TEMP_REG_4
-                            self.write_asm(f'    mov [rbp - {my_result_offset}], {TEMP_REG_4} ; save value to dest\n')
-                        else:
-                            self.write_asm(f'    mov [rbp - {my_result_offset}], {TEMP_REG_3} ; save address to dest\n')
-
-                    self.stack_free(8, 'for AssignmentExpression')
-
-                    return left_data
+                    # the value of an assignment is the value stored
+                    return self.value_data(left_data, self.set_lv_value(left_data, right_data))
                 else:
                     self.raise_code_error(f'no support')
             else:
@@ -451,6 +497,8 @@ class Expression(CComponent):
     # assignment-expression
     # expression , assignment-expression
 
+    __slots__ = ('aes',)
+
     def __init__(self, compiler, aes: list[AssignmentExpression]):
         super().__init__(compiler)
         self.aes = aes
@@ -466,19 +514,19 @@ class Expression(CComponent):
             else:
                 self.print(f'{" " * (indent + PRINT_INDENT)}{ae}')
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self, my_result_offset = None, set_result = True, **kwargs):
+    @CComponent.gen_ir_helper
+    def gen_ir(self, need_global_const = False):
         result = None
 
         for ae in self.aes:
-            self.write_asm(f'\n    ; Expression start offset = {self.compiler.get_function_stack_offset()} my_result_offset = {my_result_offset}\n')
-            result = ae.gen_asm(my_result_offset, set_result)
-            self.write_asm(f'    ; Expression over offset = {self.compiler.get_function_stack_offset()}\n\n')
+            result = ae.gen_ir(need_global_const = need_global_const)
 
         return result
 
 
 class Constant(CComponent):
+    __slots__ = ('data_type', 'const')
+
     def __init__(self, compiler, data_type, const):
         super().__init__(compiler)
         self.data_type = data_type
@@ -495,9 +543,11 @@ class Constant(CComponent):
 
 
 class Identifier(CComponent):
+    __slots__ = ('name',)
+
     def __init__(self, compiler, name: str):
         super().__init__(compiler)
-        self.name = name
+        self.name = sys.intern(name) # one str per distinct name. the lexer interns source names
 
     def __repr__(self):
         return f'Identifier({self.name})'
@@ -515,6 +565,8 @@ class PrimaryExpression(CComponent):
     # string-literal
     # ( expression )
 
+    __slots__ = ('idf', 'const', 'string', 'exp')
+
     def __init__(self, compiler, idf: Identifier = NoObject(), const: Constant = NoObject(), string = NoObject(), exp: Expression = NoObject()):
         super().__init__(compiler)
         self.idf = idf
@@ -536,10 +588,8 @@ class PrimaryExpression(CComponent):
         else:
             self.print(f'{" " * (indent + PRINT_INDENT)}{self.exp}')
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self, result_offset = None, set_result = True, need_global_const = False):
-        self.write_asm(f'    ; PrimaryExpression gen_asm\n')
-
+    @CComponent.gen_ir_helper
+    def gen_ir(self, need_global_const = False):
         if need_global_const: # todo ( expression )
             if self.idf:
                 scope_item = self.get_scope_item(self.idf.name)
@@ -567,38 +617,21 @@ class PrimaryExpression(CComponent):
 
             self.print_red(scope_item)
 
-            if set_result:
-                if 'array_data' in scope_item:
-                    if 'global' in scope_item:
-                        self.write_asm(f'    lea {TEMP_REG_4}, {name} ; get array address [{name}]\n')
-                        self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; move array address to result_offset {result_offset}\n')
-                    else:
-                        self.write_asm(f'    mov {TEMP_REG_4}, rbp ; get array address 1 {name}\n')
-                        self.write_asm(f'    sub {TEMP_REG_4}, {scope_item["offset"]} ; get array address 2 {name}\n')
-                        self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; move array address {name} to result_offset {result_offset}\n')
-                elif 'function_data' in scope_item:
-                    # elif scope_item['type'] == 'function':
-                    self.write_asm(f'    lea {TEMP_REG_4}, {name}\n')
-                    self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; move function {name} address to result_offset {result_offset}\n')
-                elif True: # 'lv' in scope_item:
-                    if 'global' in scope_item:
-                        type_item = self.get_scope_item(scope_item['data_type']) # struct
-                        if type_item and 'struct_data' in type_item:
-                            pass
-                        else:
-                            self.write_asm(f'    mov {TEMP_REG_4}, {name} ; move global var {name}\n')
-                            self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; move global var {name} to result_offset {result_offset}\n')
-                    else:
-                        # todo: local struct
-                        self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {scope_item["offset"]}] ; move local var {name}\n')
-                        self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; move local var {name} to result_offset {result_offset}\n')
-                else:
-                    self.raise_compiler_error(f'unknown obj [{scope_item}]')
+            if 'function_data' in scope_item:
+                return scope_item
 
-            return scope_item
+            # a global keeps its initial value in scope. reading it is still a load.
+            data = {key:value for key, value in scope_item.items() if key not in ['value', 'slot']}
+
+            if 'global' in scope_item:
+                data['address'] = self.ir.global_addr(name)
+            elif 'slot' in scope_item:
+                data['address'] = self.ir.addr(scope_item['slot'])
+            else:
+                self.raise_compiler_error(f'unknown obj [{scope_item}]')
+
+            return data
         elif self.const:
-            if set_result:
-                self.write_asm(f'    mov qword ptr [rbp - {result_offset}], {self.const.const} ; mov const\n')
             return {'value':self.const.const, 'data_type':'int'}
         elif self.string:
             if len(self.string) == 0:
@@ -607,54 +640,12 @@ class PrimaryExpression(CComponent):
             # todo: very long string
 
             # put string in .data
-            string_var_name = f'string_{self.compiler.item_id}'
-
-            # escape \n
-            final_string = '' # use "" in asm
-            escape_again = False
-            in_normal_string = False # like "ashdba
-            i = 0
-            while i < len(self.string):
-                if self.string[i] != '\\':
-                    if in_normal_string:
-                        final_string += self.string[i] # just insert
-                    else:
-                        final_string += f'"{self.string[i]}' # start a ""
-                        in_normal_string = True
-
-                    i += 1
-                else: # self.string[i] == '\\':
-                    if i + 1 >= len(self.string):
-                        self.raise_code_error(f'string escape error')
-
-                    next_c = self.string[i + 1]
-
-                    if next_c == 'n':
-                        if in_normal_string:
-                            final_string += '", 10, ' # close a "" add newline
-                        else:
-                            final_string += '10, ' # add newline
-                    else:
-                        pass
-
-                    in_normal_string = False
-                    i += 2
+            string_var_name = self.ir.new_name('string')
+            self.ir.module.add_data('string', string_var_name, self.string)
 
-            if in_normal_string:
-                final_string += '", 0'  # close a "" add 0
-            else:
-                final_string += ' 0'  # add 0
-
-            self.write_asm_data(f'{string_var_name} byte {final_string}\n')
-            self.compiler.item_id += 1
-
-            if set_result:
-                self.write_asm(f'    lea {TEMP_REG_4}, {string_var_name} ; load string {string_var_name}\n')
-                self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; load string {string_var_name}\n')
-
-            return {'data_type':'string', 'name':string_var_name, 'global':1}
+            return {'data_type':'string', 'name':string_var_name, 'vreg':self.ir.global_addr(string_var_name)}
         else:
-            return self.exp.gen_asm(result_offset)
+            return self.exp.gen_ir()
 
 
 class PostfixExpression(CComponent):
@@ -666,6 +657,8 @@ class PostfixExpression(CComponent):
     # postfix-expression ++
     # postfix-expression --
 
+    __slots__ = ('primary', 'data', 'data_count')
+
     def __init__(self, compiler, primary: PrimaryExpression, data):
         super().__init__(compiler)
         self.primary = primary
@@ -680,12 +673,44 @@ class PostfixExpression(CComponent):
         self.primary.print_me(indent + PRINT_INDENT)
         self.print(f'{" " * (indent + PRINT_INDENT)}postfix data = {self.data}')
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self, result_offset, set_result = True, need_global_const = False, **kwargs):
-        self.write_asm(f'    ; PostfixExpression gen_asm\n')
+    def get_member(self, current_obj, member_name):
+        struct = self.get_scope_item(current_obj['data_type'])
+        if struct is None:
+            self.raise_code_error(f'[{current_obj["data_type"]}] not found')
+
+        # not struct
+        if 'struct_data' not in struct:
+            self.raise_code_error(f'. on non struct [{current_obj["data_type"]}]')
 
-        # if self.primary.idf:
-        primary_item = self.primary.gen_asm(result_offset, set_result = True, need_global_const = need_global_const)
+        # not member
+        member_data = struct['struct_data'].get(member_name, None)
+        if member_data is None:
+            self.raise_code_error(f'[{member_name}] is not a member of {current_obj["data_type"]}')
+
+        return member_data
+
+    def member_obj(self, member_data, struct_address):
+        # struct member at struct_address + member offset
+
+        address = struct_address
+        if member_data['offset'] > 0:
+            address = self.ir.binary('add', struct_address, member_data['offset'], PTR)
+
+        obj = {'data_type':member_data['data_type'], 'name':member_data['name'], 'address':address}
+
+        if 'array_data' in member_data:
+            obj['array_data'] = member_data['array_data']
+        else:
+            obj['lv'] = 1
+
+        if 'pointer_data' in member_data:
+            obj['pointer_data'] = copy.deepcopy(member_data['pointer_data'])
+
+        return obj
+
+    @CComponent.gen_ir_helper
+    def gen_ir(self, need_global_const = False):
+        primary_item = self.primary.gen_ir(need_global_const = need_global_const)
         self.print_red(primary_item)
 
         if need_global_const:
@@ -699,154 +724,32 @@ class PostfixExpression(CComponent):
                 if 'lv' not in current_obj:
                     self.raise_code_error(f'post {item} needs lvalue')
 
-                if result_offset is None:
-                    self.raise_compiler_error(f'post {item} must has result_offset')
-
-                # if current_obj['name'] != 'wtf':
-                #    raise
-
-                if 'lv_address' in current_obj:
-                    self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {result_offset}] ; get lv_address\n')
-                    self.write_asm(f'    mov {TEMP_REG_5}, {TEMP_REG_4} ; copy address\n')
-                    self.write_asm(f'    mov {TEMP_REG_4}, [{TEMP_REG_4}] ; get lvalue\n')
-                    self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; value to result\n')
-
-                    # update lvalue
-                    if item == '++':
-                        self.write_asm(f'    inc qword ptr [{TEMP_REG_5}] ; {current_obj["name"]}++\n')
-                    else:
-                        self.write_asm(f'    dec qword ptr [{TEMP_REG_5}] ; {current_obj["name"]}--\n')
-                else:
-                    # get original value as result
-                    # todo: global
-                    self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {current_obj["offset"]}]\n')
-                    self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4}\n')
-
-                    # current_obj = {'data_type':'int', 'offset':result_offset}
+                # the original value is the result
+                value = self.rvalue(current_obj)
+                self.ir.store(current_obj['address'], self.ir.binary('add' if item == '++' else 'sub', value, 1))
 
-                    # update lvalue
-                    if item == '++':
-                        self.write_asm(f'    inc qword ptr [rbp - {current_obj["offset"]}] ; {current_obj["name"]}++\n')
-                    else:
-                        self.write_asm(f'    dec qword ptr [rbp - {current_obj["offset"]}] ; {current_obj["name"]}--\n')
-
-                current_obj['offset'] = result_offset
-                current_obj.pop('lv')
-                current_obj.pop('lv_address', None)
+                current_obj = self.value_data(current_obj, value)
 
             elif item[0] == '.':
                 if 'lv' in current_obj:
-                    self.print_red(f'{current_obj = }')
-
-                    # get struct data
+                    self.print_red('current_obj = {!r}', current_obj)
 
                     # struct S1 s1;
                     # s1.a = 123;
-                    # current_obj = {'type': 'var', 'data_type': 'S1', 'name': 's1', 'offset': 24}
-                    struct = self.get_scope_item(current_obj['data_type'])
-                    if struct is None:
-                        self.raise_code_error(f'[{current_obj["data_type"]}] not found')
-
-                    # check struct
-                    if 'struct_data' not in struct:
-                        self.raise_code_error(f'. on non struct [{current_obj["data_type"]}]')
-
-                    # check member
-                    member_name = item[1].name
-                    member_data = struct['struct_data'].get(member_name, None)
-                    if member_data is None:
-                        self.raise_code_error(f'[{member_name}] is not a member of {current_obj["data_type"]}')
-                    member_data = copy.deepcopy(member_data) # avoid breaking original data
-
-                    # get runtime address
-                    if 'lv_address' in current_obj:
-                        self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {result_offset}] ; get struct address\n')
-                        self.write_asm(f'    add {TEMP_REG_4}, {member_data["offset"]} ; get struct member address\n')
-                    else:
-                        if 'global' in current_obj:
-                            self.write_asm(f'    lea {TEMP_REG_4}, {current_obj["name"]} ; get global struct address\n')
-                            self.write_asm(f'    add {TEMP_REG_4}, {member_data["offset"]} ; get struct member address\n')
-                        else:
-                            self.write_asm(f'    mov {TEMP_REG_4}, rbp ; get local struct address\n')
-                            self.write_asm(f'    sub {TEMP_REG_4}, {current_obj["offset"] - member_data["offset"]} ; get struct member address\n')
-
-                    # set runtime address to result_offset
-                    self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; struct member address to result_offset\n')
-
-                    # update to member
-                    current_obj['data_type'] = member_data['data_type']
-                    current_obj['offset'] = result_offset # member_data['offset']
-                    current_obj['name'] = member_data['name']
-
-                    if 'global' in current_obj: # force member to non-global
-                        current_obj.pop('global')
-
-                    if 'array_data' in member_data:
-                        current_obj['array_data'] = member_data['array_data']
-                        current_obj.pop('lv')
-                        current_obj.pop('lv_address', None)
-                    else:
-                        current_obj['lv_address'] = 1
-
-                    if 'pointer_data' in member_data:
-                        current_obj['pointer_data'] = member_data['pointer_data']
+                    member_data = self.get_member(current_obj, item[1].name)
+                    current_obj = self.member_obj(member_data, current_obj['address'])
                 else:
-                    self.raise_code_error(f'. on [{current_obj["type"]}]')
+                    self.raise_code_error(f'. on non-lvalue [{current_obj.get("name")}]')
 
             elif item[0] == '->':
                 if 'pointer_data' in current_obj:
-                    # S1 *p2
-                    # {'lv': 1, 'data_type': 'S1', 'name': 'p2', 'offset': 84880, 'size': 832, 'pointer_data': [[]]}
-
-                    # get struct data
-
                     # struct S1 *p;
                     # p->a = 123;
-                    # current_obj = {'type': 'pointer', 'data_type': 'S1', 'name': 'p', 'offset': 24}
-                    struct = self.get_scope_item(current_obj['data_type'])
-                    if struct is None:
-                        self.raise_code_error(f'[{current_obj["data_type"]}] not found')
-
-                    # not struct
-                    if 'struct_data' not in struct:
-                        self.raise_code_error(f'. on non struct [{current_obj["data_type"]}]')
-
-                    # not member
-                    member_name = item[1].name
-                    member_data = struct['struct_data'].get(member_name, None)
-                    if member_data is None:
-                        self.raise_code_error(f'[{member_name}] is not a member of {current_obj["data_type"]}')
-
-                    # get runtime address
-                    if 'global' in current_obj:
-                        self.write_asm(f'    mov {TEMP_REG_4}, {current_obj["name"]} ; get global pointer value\n')
-                    else:
-                        self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {current_obj["offset"]}]; get pointer value\n')
-
-                    self.write_asm(f'    add {TEMP_REG_4}, {member_data["offset"]} ; get member address\n')
-
-                    # set address to result_offset
-                    self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; struct member address to result_offset\n')
-
-                    # update to member
-                    current_obj['data_type'] = member_data['data_type']
-                    current_obj['offset'] = result_offset # member_data['offset']
-                    current_obj['name'] = member_data['name']
-
-                    if 'global' in current_obj:  # force member to non-global
-                        current_obj.pop('global')
-
-                    if 'array_data' in member_data:
-                        current_obj['array_data'] = member_data['array_data']
-                        current_obj.pop('lv')
-                        current_obj.pop('lv_address', None)
-                    else:
-                        current_obj['lv_address'] = 1
-
-                    if 'pointer_data' in member_data:
-                        current_obj['pointer_data'] = member_data['pointer_data']
+                    member_data = self.get_member(current_obj, item[1].name)
+                    current_obj = self.member_obj(member_data, self.rvalue(current_obj))
                 else:
-                    self.raise_code_error(f'. on [{current_obj["type"]}]')
+                    self.raise_code_error(f'-> on non-pointer [{current_obj.get("name")}]')
+
             elif item[0] == 'array index':
 
                 # stack layout
@@ -856,71 +759,53 @@ class PostfixExpression(CComponent):
                 # example
                 # int arrrrrrr[3][222]
                 # [[x, x, ...], [x, x, ...], [x, x, ...]]
-                # current_obj = {'type': 'array', 'data_type': 'int', 'name': 'arrrrrrr', 'offset': 5336, 'dim': 2, 'ranks': [3, 222]}
+                # current_obj = {'data_type': 'int', 'name': 'arrrrrrr', 'address': %1, 'array_data': {'dim': 2, 'ranks': [3, 222]}}
 
                 # arrrrrrr[exp]
                 # sub_elements_count = 222
-                # new_address = rbp - 5336 + exp * sub_elements_count
-                # -> {'type': 'de_array', 'data_type': 'int', 'name': 'arrrrrrr', 'offset': 5336, 'dim': 1, 'ranks': [222]}
-                # save new_address to result_offset
+                # new_address = address + exp * sub_elements_count * element_size
+                # -> {'data_type': 'int', 'name': 'arrrrrrr', 'address': %3, 'array_data': {'dim': 1, 'ranks': [222]}}
 
                 if 'array_data' not in current_obj and 'pointer_data' not in current_obj:
                     self.raise_code_error(f'indexing on wrong type [{current_obj}]')
 
-                if 'array_data' in current_obj:
-                    pass # address already in result_offset
-                elif 'pointer_data' in current_obj:
+                if 'array_data' not in current_obj:
                     self.raise_compiler_error(f'no support yet')
 
-                offset = self.stack_alloc(8, 'array index. for exp result')
-
-                exp_data = item[1].gen_asm(offset, fetch_lv_address_value = True)
+                exp_data = item[1].gen_ir()
                 self.print_red(exp_data)
 
                 # check exp_data
-                if exp_data['data_type'] not in ['int']:
-                    self.raise_code_error(f'wrong type {exp_data["data_type"]} as array index')
+                if exp_data.get('data_type') not in ['int']:
+                    self.raise_code_error(f'wrong type {exp_data.get("data_type")} as array index')
 
-                # get array[exp] address
                 # sub_elements_count is known at compile time by array declaration
                 sub_elements_count = 1
                 for rank in current_obj['array_data']['ranks'][1:]:
                     sub_elements_count *= rank
 
-                self.write_asm(f'    ; sub_elements_count = {sub_elements_count} is known at compile time by array declaration\n')
-
-                # new_address = current_address + exp * sub_elements_count * element_size
+                element_size = self.get_type_size(current_obj['data_type'])
 
-                element_size = 8 # 8 for all simple data types for now
+                # exp * sub_elements_count * element_size + current_address
+                stride = sub_elements_count * element_size
+                index = self.rvalue(exp_data)
 
-                data_type = current_obj['data_type']
-                if data_type in ['int']:
-                    pass
+                if isinstance(index, int):
+                    if index != 0:
+                        current_obj['address'] = self.ir.binary('add', current_obj['address'], index * stride, PTR)
                 else:
-                    scope_item = self.get_scope_item(data_type)
-                    if scope_item is None:
-                        self.raise_code_error(f'[{data_type}] not defined')
-
-                    element_size = scope_item['size']
-
-                # exp * sub_elements_count * element_size
-                self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {offset}] ; get exp result\n')
-                self.write_asm(f'    imul {TEMP_REG_4}, {sub_elements_count} ; exp * sub_elements_count\n')
-                self.write_asm(f'    imul {TEMP_REG_4}, {element_size} ; * element_size {element_size}\n')
-
-                # + current_address
-                self.write_asm(f'    add {TEMP_REG_4}, [rbp - {result_offset}] ; + current_address\n')
+                    if stride != 1:
+                        index = self.ir.binary('mul', index, stride)
 
-                # save address
-                # runtime value
-                self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; save address\n')
+                    current_obj['address'] = self.ir.binary('add', current_obj['address'], index, PTR)
 
                 # case 1: arrrrrrr[3][222] arrrrrrr[1]
                 # case 2: arrrrrrr[3]      arrrrrrr[1]
                 if len(current_obj['array_data']['ranks']) >= 1:
                     # still array
-                    current_obj['array_data']['ranks'] = current_obj['array_data']['ranks'][1:]
-                    current_obj['array_data']['dim'] -= 1
+                    # new dict. array_data may be shared with a struct member in scope
+                    array_data = current_obj['array_data']
+                    current_obj['array_data'] = dict(array_data, ranks = array_data['ranks'][1:], dim = array_data['dim'] - 1)
                 else:
                     self.raise_code_error(f'indexing on wrong data {current_obj}')
 
@@ -928,12 +813,6 @@ class PostfixExpression(CComponent):
                 if current_obj['array_data']['dim'] == 0:
                     current_obj.pop('array_data')
                     current_obj['lv'] = 1
-                    current_obj['lv_address'] = 1
-
-                current_obj['offset'] = result_offset
-
-                # free
-                self.stack_free(8, 'array index. for exp result')
 
             elif item[0] == 'function call':
                 # check args
@@ -942,8 +821,6 @@ class PostfixExpression(CComponent):
                 if 'function_data' not in current_obj:
                     self.raise_code_error(f'call non-function [{current_obj}]')
 
-                    self.print_red(current_obj)
-
                 variable_arg_list = False
                 def_args_count = len(current_obj['function_data']['args'])
                 if def_args_count > 0:
@@ -957,92 +834,20 @@ class PostfixExpression(CComponent):
                     if args_count != len(current_obj['function_data']['args']):
                         self.raise_code_error(f'function args not match [{current_obj["name"]}]')
 
-                # save args count to {TEMP_REG_5}
-
-                # stack
-                #   {TEMP_REG_5}
-                #   arg n
-                #   ...
-                #   arg 2
-                #   arg 1
-
-                self.write_asm(f'\n    ; start function call [{self.primary.idf.name}] offset = {self.compiler.get_function_stack_offset()}\n')
-
-                # abi shadow
-                # at lease 4
-                abi_storage_args_count = args_count
-                if abi_storage_args_count < 4:
-                    abi_storage_args_count = 4
-
-                # alignment
-                # 1 for {TEMP_REG_5}
-                align = ((1 + abi_storage_args_count) * 8 + self.compiler.get_function_stack_offset()) % 16
-                if align not in [0, 8]:
-                    self.raise_compiler_error(f'check alignment before call align = {align} not in [0, 8]')
-
-                if align != 0:
-                    self.stack_alloc(8, 'padding for function call')
-
-                self.push_reg(TEMP_REG_5)
-                self.write_asm(f'    mov {TEMP_REG_5}, {args_count}; {args_count = }\n')
-
-                # space for args
-                last_offset = self.stack_alloc(8 * abi_storage_args_count, 'alloc function call args')
-                self.write_asm(f'    ; last_offset = {last_offset}\n')
-
-                # gen_asm for each arg
+                args = []
                 for ae in item[1]:
-                    # self.print_red(f'arg = {ae}')
-                    ae.print_me(0)
-                    ae_data = ae.gen_asm(last_offset, fetch_lv_address_value = True)
-
-                    last_offset -= 8
+                    if self.log_on():
+                        ae.print_me(0)
 
-                # microsoft abi
-                # rcx rdx r8 r9 stack...
+                    args.append(self.rvalue(ae.gen_ir()))
 
-                last_offset = self.compiler.get_function_stack_offset()
-                for i in range(0, min(4, args_count)):
-                    if i == 0:
-                        self.write_asm(f'    mov rcx, [rbp - {last_offset}] ; arg {i}\n')
-                    elif i == 1:
-                        self.write_asm(f'    mov rdx, [rbp - {last_offset}] ; arg {i}\n')
-                    elif i == 2:
-                        self.write_asm(f'    mov r8, [rbp - {last_offset}] ; arg {i}\n')
-                    elif i == 3:
-                        self.write_asm(f'    mov r9, [rbp - {last_offset}] ; arg {i}\n')
-                    last_offset -= 8
+                value = self.ir.call(self.primary.idf.name, args)
 
-                self.write_asm(f'\n    call {self.primary.idf.name} ; {len(item[1])} args. offset = {self.compiler.get_function_stack_offset()}\n')
-                self.write_asm(f'    ; call return. offset = {self.compiler.get_function_stack_offset()}\n')
-
-                if set_result:
-                    self.write_asm(f'    mov [rbp - {result_offset}], rax ; save call result\n')
-
-                # clean
-                self.stack_free(8 * abi_storage_args_count, 'free function call args')
-                self.pop_reg(TEMP_REG_5)
-
-                if align != 0:
-                    self.stack_free(8, 'clean padding for function call')
-
-                self.write_asm(f'\n    ; function call over [{self.primary.idf.name}]\n\n')
-
-                current_obj['type'] = 'mem'
-                current_obj['offset'] = result_offset
+                current_obj = {'data_type':current_obj['function_data']['data_type'], 'vreg':value}
 
             else:
                 self.raise_compiler_error(f'unknown postfix data {item}')
 
-        if set_result:
-            pass
-
-        if 'fetch_lv_address_value' in kwargs:
-            if 'lv_address' in current_obj:
-                self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {result_offset}] ; get address\n')
-                self.write_asm(f'    mov {TEMP_REG_4}, [{TEMP_REG_4}] ; fetch_lv_address_value\n')
-                self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; save value\n')
-
         return current_obj
 
 
@@ -1054,6 +859,8 @@ class UnaryExpression(CComponent):
     # sizeof unary-expression
     # sizeof ( type-name )
 
+    __slots__ = ('pe', 'pp', 'ue', 'uo', 'cast', 'sizeof', 'tn')
+
     def __init__(self, compiler, pe: PostfixExpression = NoObject(), pp = NoObject(), ue = NoObject(), uo = NoObject(),
                  cast = NoObject(), sizeof = NoObject(), tn = NoObject()):
         super().__init__(compiler)
@@ -1084,21 +891,19 @@ class UnaryExpression(CComponent):
             if self.ue:
                 self.ue.print_me(indent + PRINT_INDENT)
             else:
-                self.tn.print_me(indent + PRINT_INDENT)
-
-    @CComponent.gen_asm_helper
-    def gen_asm(self, result_offset, set_result = True, need_global_const = False, **kwargs):
-        self.write_asm(f'    ; UnaryExpression gen_asm {self.uo}\n')
+                self.print(f'{" " * (indent + PRINT_INDENT)}{self.tn}')
 
+    @CComponent.gen_ir_helper
+    def gen_ir(self, need_global_const = False):
         if self.pe:
-            data = self.pe.gen_asm(result_offset, need_global_const = need_global_const, **kwargs)
+            data = self.pe.gen_ir(need_global_const = need_global_const)
             self.print_red(data)
             return data
         elif self.pp:
             if need_global_const:
                 self.raise_code_error(f'{self.pp} need_global_const')
 
-            data = self.ue.gen_asm(result_offset)
+            data = self.ue.gen_ir()
 
             if 'lv' not in data:
                 self.print_red(data)
@@ -1107,125 +912,145 @@ class UnaryExpression(CComponent):
             if 'pointer_data' in data or 'array_data' in data:
                 self.raise_code_error(f'no support yet')
 
-            if 'lv_address' in data:
-                self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {result_offset}] ; get lv_address\n')
-
-                # update lvalue
-                if self.pp == '++':
-                    self.write_asm(f'    inc qword ptr [{TEMP_REG_4}] ; ++{data["name"]}\n')
-                else:
-                    self.write_asm(f'    dec qword ptr [{TEMP_REG_4}] ; --{data["name"]}\n')
-
-                if set_result:
-                    if 'fetch_lv_address_value' in kwargs:
-                        self.write_asm(f'    mov {TEMP_REG_4}, [{TEMP_REG_4}]\n')
+            # the updated value is the result
+            value = self.ir.binary('add' if self.pp == '++' else 'sub', self.rvalue(data), 1)
+            self.ir.store(data['address'], value)
 
-                    self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4}\n')
-            else:
-                if self.pp == '++':
-                    self.write_asm(f'    inc qword ptr [rbp - {data["offset"]}] ; ++{data["name"]}\n')
-                else:
-                    self.write_asm(f'    dec qword ptr [rbp - {data["offset"]}] ; --{data["name"]}\n')
-
-                if set_result:
-                    self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {data["offset"]}]\n')
-                    self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4}\n')
-
-            data['offset'] = result_offset
-            data.pop('lv')
-            data.pop('lv_address', None)
-
-
-            return data
+            return self.value_data(data, value)
         elif self.uo:
-            if need_global_const:
+            if need_global_const and self.uo != '-':
                 self.raise_code_error(f'{self.uo} need_global_const')
 
             # ['&', '*', '+', '-', '~', '!']
             if self.uo == '-':
-                data = self.cast.gen_asm(result_offset)
-
-                # error
-                # if data['type'] not in ['const', 'var']:
-                #     self.raise_code_error(f"- on {data['type']}")
+                data = self.cast.gen_ir(need_global_const = need_global_const)
 
                 # c std 6.5.3.3
-                self.write_asm(f'    neg qword ptr [rbp - {result_offset}] ; negation\n')
-
                 if 'value' in data:
-                    data['value'] = -data['value']
-                    return data
+                    return {'value':-data['value'], 'data_type':data.get('data_type', 'int')}
 
-                return {'data_type':'int', 'offset':result_offset}
+                return {'data_type':'int', 'vreg':self.ir.neg(self.rvalue(data))}
             elif self.uo == '&':
                 # int arr2[100][100];
                 # arr2[1], &arr2[1], &arr2[1][0] same address
 
-                # get runtime address
-                data = self.cast.gen_asm(result_offset)
-
-                self.print_red(f'{data}')
-                name = data['name']
+                data = self.cast.gen_ir()
+                self.print_red('{}', data)
 
                 if 'lv' not in data:
                     self.raise_code_error(f'& needs lvalue')
 
-                # get runtime address
-                if 'lv_address' in data:
-                    pass # already ok
-                else:
-                    if 'global' in data:
-                        self.write_asm(f'    lea {TEMP_REG_4}, {name}\n')
-                    else:
-                        self.write_asm(f'    mov {TEMP_REG_4}, rbp\n')
-                        self.write_asm(f'    sub {TEMP_REG_4}, {data["offset"]}\n')
-
-                    self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4} ; save address\n')
-
-                # todo: pointer_data
                 # &a becomes a pointer
-                return {'data_type':'int', 'offset':result_offset, 'pointer_data':[[]], 'lv_address':1}
+                return {'data_type':data['data_type'], 'pointer_data':data.get('pointer_data', []) + [[]], 'vreg':data['address']}
 
             elif self.uo == '*':
                 # indirection. dereferencing.
 
-                data = self.cast.gen_asm(result_offset, set_result = False)
-                self.print_red(f'dereference. data = {data}')
-                # {'type': 'pointer', 'data_type': 'int', 'name': 'p', 'offset': 16, 'pointer_data': [[], []]}
+                data = self.cast.gen_ir()
+                self.print_red('dereference. data = {}', data)
+                # {'data_type': 'int', 'name': 'p', 'address': %1, 'lv': 1, 'pointer_data': [[], []]}
                 # int **p;
 
                 if 'pointer_data' not in data:
                     self.raise_code_error(f'* on non-pointer')
 
-                new_data = copy.deepcopy(data) # do not break original data
+                # the object pointed to. an lvalue at the pointer value
+                new_data = {'data_type':data['data_type'], 'lv':1, 'address':self.rvalue(data)}
+                if len(data['pointer_data']) > 1:
+                    new_data['pointer_data'] = copy.deepcopy(data['pointer_data'][:-1])
 
-                pointer_item = new_data['pointer_data'].pop()
-                if len(new_data['pointer_data']) == 0:
-                    new_data['lv'] = 1
-                    new_data['lv_address'] = 1
-                    new_data.pop('pointer_data')
+                return new_data
 
-                self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {new_data["offset"]}]; dereference. get pointer value\n')
+            else:
+                self.raise_compiler_error(f'unknown unary-operator')
+        elif self.sizeof:
+            # c std 6.5.3.4
+            # the operand is not evaluated. the result is a constant.
+            if self.ue:
+                with self.ir.unevaluated():
+                    data = self.ue.gen_ir()
 
-                if 'lv_address' in new_data and 'fetch_lv_address_value' in kwargs:
-                    self.write_asm(f'    mov {TEMP_REG_4}, [{TEMP_REG_4}]\n')
+                size = self.get_data_size(data)
+            else:
+                size = self.get_type_name_size()
 
-                self.write_asm(f'    mov [rbp - {result_offset}], {TEMP_REG_4}; dereference. address to temp\n')
+            return {'value':size, 'data_type':'int'}
 
-                new_data['offset'] = result_offset
+        self.raise_compiler_error(f'UnaryExpression.gen_ir failed')
 
-                return new_data
+    def get_data_size(self, data):
+        # size of an expression result
+        if 'function_data' in data:
+            self.raise_code_error(f'sizeof on function')
 
-            else:
-                self.raise_compiler_error(f'unknown unary-operator')
+        if data.get('data_type') == 'string':
+            self.raise_code_error(f'no support yet')
+
+        element_size = 8 if 'pointer_data' in data else self.get_type_size(data.get('data_type', 'int'))
+
+        if 'array_data' in data:
+            for rank in data['array_data']['ranks']:
+                element_size *= rank
 
-        self.raise_compiler_error(f'UnaryExpression.gen_asm failed')
+        return element_size
+
+    def get_type_name_size(self):
+        # specifier-qualifier-list abstract-declarator?
+        # (int) (int *) (struct S1) (int *[3])
+        sql, ad = self.tn
+
+        type_data = [item for item in sql if isinstance(item, TypeSpecifier)][0].type_data
+        pointer = False
+        ranks = []
+
+        if ad:
+            ptr, dad = ad
+            if ptr:
+                pointer = True
+
+            if dad:
+                if dad[0]:
+                    self.raise_code_error(f'no support yet')
+
+                for kind, ce in dad[1]:
+                    if kind != 'ce' or not ce:
+                        self.raise_code_error(f'no support yet')
+
+                    result = ce.gen_ir(need_global_const = True)
+                    if 'value' not in result:
+                        self.raise_code_error(f'array rank must be const')
+
+                    ranks.append(result['value'])
+
+        while isinstance(type_data, Typedef):
+            if 'name' not in type_data.dtr[1] or len(type_data.dtr[1]) > 1:
+                self.raise_code_error(f'no support yet')
+
+            if len(type_data.dtr[0]) > 0:
+                pointer = True
+
+            type_data = type_data.dss['type_specifier'].type_data
+
+        if pointer:
+            size = 8
+        elif isinstance(type_data, StructUnion):
+            type_data.gen_struct_data()
+            size = type_data.size
+        else:
+            size = self.get_type_size(type_data)
+
+        for rank in ranks:
+            size *= rank
+
+        return size
 
 
 class CastExpression(CComponent):
     # unary-expression
     # ( type-name ) cast-expression
 
+    __slots__ = ('casts', 'ue', 'opt')
+
     def __init__(self, compiler, casts, ue: UnaryExpression):
         super().__init__(compiler)
         self.casts = casts
@@ -1243,32 +1068,25 @@ class CastExpression(CComponent):
         self.print(f'{" " * (indent + PRINT_INDENT)}casts = {self.casts}')
         self.ue.print_me(indent + PRINT_INDENT)
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self, result_offset, set_result = True, need_global_const = False, **kwargs):
-        return self.ue.gen_asm(result_offset, set_result, need_global_const = need_global_const, **kwargs)
+    @CComponent.gen_ir_helper
+    def gen_ir(self, need_global_const = False):
+        return self.ue.gen_ir(need_global_const = need_global_const)
 
 
-'''
-caller makes space at my_result_offset
+class ChainExpression(CComponent):
+    # item opt item opt item ...
+    # left to right. every item is evaluated. known results are folded.
 
-gen_asm(self, my_result_offset):
-    choose a reg like {TEMP_REG_0}
-    push {TEMP_REG_0}
-    make slots for subitems results
-    gen_asm(slot) for each subitem
-    calc results, may use {TEMP_REG_0}.
-    save final result in my_result_offset
-    free space
-    pop {TEMP_REG_0}
-'''
+    __slots__ = ('data', 'data_count', 'gen_ir_results', 'opt')
 
+    # ir op for each operator
+    ops = {}
 
-class ChainExpression(CComponent):
     def __init__(self, compiler, data):
         super().__init__(compiler)
         self.data = data
         self.data_count = len(data)
-        self.gen_asm_results = []
+        self.gen_ir_results = []
         self.opt = None
 
     def print_me(self, indent):
@@ -1279,75 +1097,53 @@ class ChainExpression(CComponent):
     def set_opt(self, opt):
         self.opt = opt
 
-    def get_const_result(self):
-        return None
+    def first(self, binary, value):
+        return value
 
-    def sub_items_gen_asm(self, result_offset, final_result_offset, set_result = True):
-        pass
+    def combine(self, binary, left, right, index):
+        return binary(self.ops[self.data[index].opt], left, right)
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self, final_result_offset, set_result = True, need_global_const = False, **kwargs):
-        if self.data_count == 1:
-            return self.data[0].gen_asm(final_result_offset, set_result, need_global_const = need_global_const, **kwargs)
+    def finish(self, binary, value):
+        return value
 
-        offset = None
-        temp_result_offset = None
-        if not need_global_const:
-            self.print_red(self.data)
-            self.push_reg(TEMP_REG_0, 'ChainExpression save')
+    def compute(self, binary, operand):
+        # binary(op, a, b) is ir.binary for code and fold_constant for a constant chain. the same ops either way
+        # operand(result) is asked for in order. a load comes right before its use
+        value = self.first(binary, operand(self.gen_ir_results[0]))
+        for index in range(1, self.data_count):
+            value = self.combine(binary, value, operand(self.gen_ir_results[index]), index)
 
-            # space for exp results
-            offset = self.compiler.get_function_stack_offset() + 8
-            self.stack_alloc(8 * self.data_count, 'ChainExpression for exp result')
+        return self.finish(binary, value)
 
-            temp_result_offset = offset # for final result
+    @CComponent.gen_ir_helper
+    def gen_ir(self, need_global_const = False):
+        if self.data_count == 1:
+            return self.data[0].gen_ir(need_global_const = need_global_const)
 
-        # check const
-        # if some items are const, we can make some results at compile time?
-        all_known_value = True
+        self.gen_ir_results = []
 
-        # gen_asm for each
         for item in self.data:
-            result = item.gen_asm(offset, need_global_const = need_global_const, fetch_lv_address_value = True)
-
-            if 'value' not in result:
-                all_known_value = False
-                if need_global_const:
-                    self.raise_code_error(f'{self.__class__.__name__} need_global_const')
-
-            self.print_red(result)
+            result = self.get_operand(item, need_global_const).gen_ir(need_global_const = need_global_const)
 
-            self.gen_asm_results.append(result)
+            if need_global_const and 'value' not in result:
+                self.raise_code_error(f'{self.__class__.__name__} need_global_const')
 
-            if not need_global_const:
-                offset += 8
+            self.gen_ir_results.append(result)
 
-        self.print_red(f'gen_asm_results = {self.gen_asm_results}')
+        self.print_red('gen_ir_results = {}', self.gen_ir_results)
 
-        if all_known_value:
+        if all('value' in result for result in self.gen_ir_results):
+            value = self.compute(fold_constant, lambda result: result['value'])
+            if value is not None:
+                return {'value':value, 'data_type':'int'}
 
-            result = self.get_const_result()
-
-            if not need_global_const:
-                if set_result:
-                    self.write_asm(f'    mov qword ptr [rbp - {final_result_offset}], {result} ; ChainExpression set result\n')
-
-                # free
-                self.stack_free(8 * self.data_count, 'ChainExpression for exp result')
-                self.pop_reg(TEMP_REG_0, 'ChainExpression recover')
-
-            return {'value':result, 'data_type':'int'}
-
-        self.sub_items_gen_asm(temp_result_offset, final_result_offset, set_result)
-
-        # free
-        self.stack_free(8 * self.data_count, 'ChainExpression for exp result')
-        self.pop_reg(TEMP_REG_0, 'ChainExpression recover')
+            # a division fault. it is left to run time
+            if need_global_const:
+                self.raise_code_error(f'{self.__class__.__name__} can not be folded')
 
-        if self.data_count == 1:
-            return self.gen_asm_results[0]
+        value = self.compute(self.ir.binary, self.rvalue)
 
-        return {'data_type':'int', 'offset':final_result_offset}
+        return {'data_type':'int', 'vreg':value}
 
 
 class MultiplicativeExpression(ChainExpression):
@@ -1356,154 +1152,49 @@ class MultiplicativeExpression(ChainExpression):
     # multiplicative-expression / cast-expression
     # multiplicative-expression % cast-expression
 
+    __slots__ = ()
+
+    # / and % are 32-bit. edx:eax / divisor
+    ops = {'*':'mul', '/':'div', '%':'mod'}
+
     def __init__(self, compiler, data: list[CastExpression]):
         super().__init__(compiler, data)
 
     def __repr__(self):
         return f'MultiplicativeExpression {self.data}'
 
-    def get_const_result(self):
-        # todo? not consistent with c
-        result = self.gen_asm_results[0]['value']
-        for index in range(1, self.data_count):
-            if self.data[index].opt == '*':
-                result *= self.gen_asm_results[index]['value']
-            elif self.data[index].opt == '/':
-                result = result // self.gen_asm_results[index]['value']
-            elif self.data[index].opt == '%':
-                result = result % self.gen_asm_results[index]['value']
-
-        return result
-
-    def sub_items_gen_asm(self, result_offset, final_result_offset, set_result = True):
-        # first to {TEMP_REG_0}
-        self.write_asm(f'    mov {TEMP_REG_0}, [rbp - {result_offset}] ; get first result\n')
-
-        for index in range(1, self.data_count):
-            result_offset += 8
-
-            if self.data[index].opt == '*':
-                if 'value' in self.gen_asm_results[index]:
-                    self.write_asm(f'    imul {TEMP_REG_0}, {self.gen_asm_results[index]["value"]}\n')
-                else:
-                    self.write_asm(f'    imul {TEMP_REG_0}, [rbp - {result_offset}]\n')
-            elif self.data[index].opt == '/':
-                # 32-bit int
-                # edx:eax / dword ptr [rbp - {result_offset}]
-                # quotient in eax, remainder in edx.
-
-                # todo: corner case?
-                self.write_asm(f'    push rdx\n')
-                self.write_asm(f'    push rax\n')
-                self.write_asm(f'    mov rdx, {TEMP_REG_0} ; set edx\n')
-                self.write_asm(f'    shr rdx, 32\n')
-                self.write_asm(f'    mov rax, {TEMP_REG_0} ; set eax\n')
-                self.write_asm(f'    and rax, right_32f\n')  # 0xffffffff
-                self.write_asm(f'    div dword ptr [rbp - {result_offset}]\n')
-                self.write_asm(f'    mov {TEMP_REG_0}, rax\n')  # save result to {TEMP_REG_0}
-                self.write_asm(f'    pop rax\n')
-                self.write_asm(f'    pop rdx\n')
-            elif self.data[index].opt == '%':
-                # todo: corner case?
-                self.write_asm(f'    push rdx\n')
-                self.write_asm(f'    push rax\n')
-                self.write_asm(f'    mov rdx, {TEMP_REG_0} ; set edx\n')
-                self.write_asm(f'    shr rdx, 32\n')
-                self.write_asm(f'    mov rax, {TEMP_REG_0} ; set eax\n')
-                self.write_asm(f'    and rax, right_32f\n')  # 0xffffffff
-                self.write_asm(f'    div dword ptr [rbp - {result_offset}]\n')
-                self.write_asm(f'    mov {TEMP_REG_0}, rdx\n')  # save result to {TEMP_REG_0}
-                self.write_asm(f'    pop rax\n')
-                self.write_asm(f'    pop rdx\n')
-
-        if set_result:
-            self.write_asm(f'    mov [rbp - {final_result_offset}], {TEMP_REG_0} ; MultiplicativeExpression set result\n')
-
 
 class AdditiveExpression(ChainExpression):
     # multiplicative-expression
     # additive-expression + multiplicative-expression
     # additive-expression - multiplicative-expression
 
+    __slots__ = ()
+
+    ops = {'+':'add', '-':'sub'}
+
     def __init__(self, compiler, data: list[MultiplicativeExpression]):
         super().__init__(compiler, data)
 
     def __repr__(self):
         return f'AdditiveExpression {self.data}'
 
-    def get_const_result(self):
-        # todo? not consistent with c
-        result = self.gen_asm_results[0]['value']
-        for index in range(1, self.data_count):
-            if self.data[index].opt == '+':
-                result += self.gen_asm_results[index]['value']
-            elif self.data[index].opt == '-':
-                result -= self.gen_asm_results[index]['value']
-
-        return result
-
-    def sub_items_gen_asm(self, result_offset, final_result_offset, set_result = True):
-        # first to {TEMP_REG_0}
-        self.write_asm(f'    mov {TEMP_REG_0}, [rbp - {result_offset}] ; get first result\n')
-
-        for index in range(1, self.data_count):
-            result_offset += 8
-
-            if self.data[index].opt == '+':
-                self.write_asm(f'    add {TEMP_REG_0}, [rbp - {result_offset}]\n')
-            elif self.data[index].opt == '-':
-                self.write_asm(f'    sub {TEMP_REG_0}, [rbp - {result_offset}]\n')
-            else:
-                self.raise_compiler_error(f'wtf')
-
-        if set_result:
-            self.write_asm(f'    mov [rbp - {final_result_offset}], {TEMP_REG_0} ; AdditiveExpression set result\n')
-
 
 class ShiftExpression(ChainExpression):
     # additive-expression
     # shift-expression << additive-expression
     # shift-expression >> additive-expression
 
+    __slots__ = ()
+
+    ops = {'<<':'shl', '>>':'shr'}
+
     def __init__(self, compiler, data: list[AdditiveExpression]):
         super().__init__(compiler, data)
 
     def __repr__(self):
         return f'ShiftExpression {self.data}'
 
-    def get_const_result(self):
-        # todo? not consistent with c
-        result = self.gen_asm_results[0]['value']
-        for index in range(1, self.data_count):
-            if self.data[index].opt == '<<':
-                result <<= self.gen_asm_results[index]['value']
-            elif self.data[index].opt == '>>':
-                result >>= self.gen_asm_results[index]['value']
-
-        return result
-
-    def sub_items_gen_asm(self, result_offset, final_result_offset, set_result = True):
-        # first to {TEMP_REG_0}
-        self.write_asm(f'    mov {TEMP_REG_0}, [rbp - {result_offset}] ; get first result\n')
-
-        for index in range(1, self.data_count):
-            result_offset += 8
-
-            # shift at most 8bit?
-
-            self.write_asm(f'    push rcx\n')
-            self.write_asm(f'    mov rcx, [rbp - {result_offset}]\n')
-            if self.data[index].opt == '<<':
-                self.write_asm(f'    shl {TEMP_REG_0}, cl\n')
-            elif self.data[index].opt == '>>':
-                self.write_asm(f'    shr {TEMP_REG_0}, cl\n')
-            else:
-                self.raise_compiler_error(f'wtf')
-            self.write_asm(f'    pop rcx\n')
-
-        if set_result:
-            self.write_asm(f'    mov [rbp - {final_result_offset}], {TEMP_REG_0} ; ShiftExpression set result\n')
-
 
 class RelationalExpression(ChainExpression):
     # shift-expression
@@ -1512,354 +1203,156 @@ class RelationalExpression(ChainExpression):
     # relational-expression <= shift-expression
     # relational-expression >= shift-expression
 
+    __slots__ = ()
+
+    ops = {'<':'lt', '>':'gt', '<=':'le', '>=':'ge'}
+
     def __init__(self, compiler, data: list[ShiftExpression]):
         super().__init__(compiler, data)
 
     def __repr__(self):
         return f'RelationalExpression {self.data}'
 
-    def get_const_result(self):
-        # todo? not consistent with c
-        result = self.gen_asm_results[0]['value']
-        for index in range(1, self.data_count):
-            if self.data[index].opt == '<':
-                if result < self.gen_asm_results[index]['value']:
-                    result = 1
-                else:
-                    result = 0
-            elif self.data[index].opt == '>':
-                if result > self.gen_asm_results[index]['value']:
-                    result = 1
-                else:
-                    result = 0
-            elif self.data[index].opt == '<=':
-                if result <= self.gen_asm_results[index]['value']:
-                    result = 1
-                else:
-                    result = 0
-            elif self.data[index].opt == '>=':
-                if result >= self.gen_asm_results[index]['value']:
-                    result = 1
-                else:
-                    result = 0
-
-        return result
-
-    def sub_items_gen_asm(self, result_offset, final_result_offset, set_result = True):
-        # first to {TEMP_REG_0}
-        self.write_asm(f'    mov {TEMP_REG_0}, [rbp - {result_offset}] ; get first result\n')
-
-        for index in range(1, self.data_count):
-            result_offset += 8
-
-            label_1_name = f'cmp_label_{self.compiler.item_id}'
-            self.compiler.item_id += 1
-            label_2_name = f'cmp_label_{self.compiler.item_id}'
-            self.compiler.item_id += 1
-
-            if self.data[index].opt == '<':
-                '''
-                cmp {TEMP_REG_0}, xxx
-                jl label_1
-                mov {TEMP_REG_0}, 0
-                jmp label_2
-                label_1:
-                    mov {TEMP_REG_0}, 1
-                label_2:
-                '''
-
-                self.write_asm(f'    cmp {TEMP_REG_0}, [rbp - {result_offset}]\n    jl {label_1_name}\n    mov {TEMP_REG_0}, 0\n    jmp {label_2_name}\n    {label_1_name}:\n        mov {TEMP_REG_0}, 1\n    {label_2_name}:\n')
-            elif self.data[index].opt == '>':
-                self.write_asm(f'    cmp {TEMP_REG_0}, [rbp - {result_offset}]\n    jg {label_1_name}\n    mov {TEMP_REG_0}, 0\n    jmp {label_2_name}\n    {label_1_name}:\n        mov {TEMP_REG_0}, 1\n    {label_2_name}:\n')
-            elif self.data[index].opt == '<=':
-                self.write_asm(f'    cmp {TEMP_REG_0}, [rbp - {result_offset}]\n    jle {label_1_name}\n    mov {TEMP_REG_0}, 0\n    jmp {label_2_name}\n    {label_1_name}:\n        mov {TEMP_REG_0}, 1\n    {label_2_name}:\n')
-            elif self.data[index].opt == '>=':
-                self.write_asm(f'    cmp {TEMP_REG_0}, [rbp - {result_offset}]\n    jge {label_1_name}\n    mov {TEMP_REG_0}, 0\n    jmp {label_2_name}\n    {label_1_name}:\n        mov {TEMP_REG_0}, 1\n    {label_2_name}:\n')
-            else:
-                self.raise_compiler_error(f'wtf')
-
-        if set_result:
-            self.write_asm(f'    mov [rbp - {final_result_offset}], {TEMP_REG_0} ; RelationalExpression set result\n')
-
 
 class EqualityExpression(ChainExpression):
     # relational-expression
     # equality-expression == relational-expression
     # equality-expression != relational-expression
 
+    __slots__ = ()
+
+    ops = {'==':'eq', '!=':'ne'}
+
     def __init__(self, compiler, data: list[RelationalExpression]):
         super().__init__(compiler, data)
 
     def __repr__(self):
         return f'EqualityExpression {self.data}'
 
-    def get_const_result(self):
-        # todo? not consistent with c
-        result = self.gen_asm_results[0]['value']
-        for index in range(1, self.data_count):
-            if self.data[index].opt == '==':
-                if result < self.gen_asm_results[index]['value']:
-                    result = 1
-                else:
-                    result = 0
-            elif self.data[index].opt == '!=':
-                if result > self.gen_asm_results[index]['value']:
-                    result = 1
-                else:
-                    result = 0
-
-        return result
-
-    def sub_items_gen_asm(self, result_offset, final_result_offset, set_result = True):
-        # first to {TEMP_REG_0}
-        self.write_asm(f'    mov {TEMP_REG_0}, [rbp - {result_offset}] ; get first result\n')
-
-        for index in range(1, self.data_count):
-            result_offset += 8
-
-            label_1_name = f'cmp_label_{self.compiler.item_id}'
-            self.compiler.item_id += 1
-            label_2_name = f'cmp_label_{self.compiler.item_id}'
-            self.compiler.item_id += 1
-
-            if self.data[index].opt == '==':
-                '''
-                cmp {TEMP_REG_0}, xxx
-                je label_1
-                mov {TEMP_REG_0}, 0
-                jmp label_2
-                label_1:
-                    mov {TEMP_REG_0}, 1
-                label_2:
-                '''
-
-                self.write_asm(f'    cmp {TEMP_REG_0}, [rbp - {result_offset}]\n    je {label_1_name}\n    mov {TEMP_REG_0}, 0\n    jmp {label_2_name}\n    {label_1_name}:\n        mov {TEMP_REG_0}, 1\n    {label_2_name}:\n')
-            elif self.data[index].opt == '!=':
-                self.write_asm(f'    cmp {TEMP_REG_0}, [rbp - {result_offset}]\n    jne {label_1_name}\n    mov {TEMP_REG_0}, 0\n    jmp {label_2_name}\n    {label_1_name}:\n        mov {TEMP_REG_0}, 1\n    {label_2_name}:\n')
-            else:
-                self.raise_compiler_error(f'wtf')
-
-        if set_result:
-            self.write_asm(f'    mov [rbp - {final_result_offset}], {TEMP_REG_0} ; EqualityExpression set result\n')
-
 
 class AndExpression(ChainExpression):
     # equality-expression
     # and-expression & equality-expression
 
+    __slots__ = ()
+
     def __init__(self, compiler, data: list[EqualityExpression]):
         super().__init__(compiler, data)
 
     def __repr__(self):
         return f'AndExpression {self.data}'
 
-    def get_const_result(self):
-        # todo? not consistent with c
-        result = self.gen_asm_results[0]['value']
-        for index in range(1, self.data_count):
-            result &= self.gen_asm_results[index]['value']
-
-        return result
-
-    def sub_items_gen_asm(self, result_offset, final_result_offset, set_result = True):
-        # first to {TEMP_REG_0}
-        self.write_asm(f'    mov {TEMP_REG_0}, [rbp - {result_offset}] ; get first result\n')
-
-        for index in range(1, self.data_count):
-            result_offset += 8
-
-            '''
-            and {TEMP_REG_0}, xxx
-            '''
-            self.write_asm(f'    and {TEMP_REG_0}, [rbp - {result_offset}]\n')
-
-        if set_result:
-            self.write_asm(f'    mov [rbp - {final_result_offset}], {TEMP_REG_0} ; set result\n')
+    def combine(self, binary, left, right, index):
+        return binary('and', left, right)
 
 
 class ExclusiveOrExpression(ChainExpression):
     # and-expression
     # exclusive-or-expression ^ and-expression
 
+    __slots__ = ()
+
     def __init__(self, compiler, data: list[AndExpression]):
         super().__init__(compiler, data)
 
     def __repr__(self):
         return f'ExclusiveOrExpression {self.data}'
 
-    def get_const_result(self):
-        # todo? not consistent with c
-        result = self.gen_asm_results[0]['value']
-        for index in range(1, self.data_count):
-            result ^= self.gen_asm_results[index]['value']
-
-        return result
-
-    def sub_items_gen_asm(self, result_offset, final_result_offset, set_result = True):
-        # first to {TEMP_REG_0}
-        self.write_asm(f'    mov {TEMP_REG_0}, [rbp - {result_offset}] ; get first result\n')
-
-        for index in range(1, self.data_count):
-            result_offset += 8
-            '''
-            and {TEMP_REG_0}, xxx
-            '''
-            self.write_asm(f'    xor {TEMP_REG_0}, [rbp - {result_offset}]\n')
-
-        if set_result:
-            self.write_asm(f'    mov [rbp - {final_result_offset}], {TEMP_REG_0} ; ExclusiveOrExpression set result\n')
+    def combine(self, binary, left, right, index):
+        return binary('xor', left, right)
 
 
 class InclusiveOrExpression(ChainExpression):
     # exclusive-or-expression
     # inclusive-or-expression | exclusive-or-expression
 
+    __slots__ = ()
+
     def __init__(self, compiler, data: list[ExclusiveOrExpression]):
         super().__init__(compiler, data)
 
     def __repr__(self):
         return f'InclusiveOrExpression {self.data}'
 
-    def get_const_result(self):
-        # todo? not consistent with c
-        result = self.gen_asm_results[0]['value']
-        for index in range(1, self.data_count):
-            result |= self.gen_asm_results[index]['value']
-
-        return result
-
-    def sub_items_gen_asm(self, result_offset, final_result_offset, set_result = True):
-        # first to {TEMP_REG_0}
-        self.write_asm(f'    mov {TEMP_REG_0}, [rbp - {result_offset}] ; get first result\n')
-
-        for index in range(1, self.data_count):
-            result_offset += 8
-
-            '''
-            and {TEMP_REG_0}, xxx
-            '''
-            self.write_asm(f'    or {TEMP_REG_0}, [rbp - {result_offset}]\n')
-
-        if set_result:
-            self.write_asm(f'    mov [rbp - {final_result_offset}], {TEMP_REG_0} ; InclusiveOrExpression set result\n')
+    def combine(self, binary, left, right, index):
+        return binary('or', left, right)
 
 
 class LogicalAndExpression(ChainExpression):
     # inclusive-or-expression
     # logical-and-expression && inclusive-or-expression
 
+    __slots__ = ()
+
     def __init__(self, compiler, data: list[InclusiveOrExpression]):
         super().__init__(compiler, data)
 
     def __repr__(self):
         return f'LogicalAndExpression {self.data}'
 
-    def get_const_result(self):
-        # todo? not consistent with c
-        for index in range(self.data_count):
-            if 0 == self.gen_asm_results[index]['value']:
-                return 0
-
-        return 1
-
-    def sub_items_gen_asm(self, result_offset, final_result_offset, set_result = True):
-        # todo use loop in asm
-        """
-            cmp v1 0
-            je cmp_and_fail
-
-            cmp v2 0
-            je cmp_and_fail
-
-            ...
+    # todo: short circuit as a value. every item is evaluated for now. see gen_branch for conditions.
 
-            cmp vx 0
-            je cmp_and_fail
+    def first(self, binary, value):
+        return binary('ne', value, 0)
 
-            mov {TEMP_REG_0}, 1
-            jmp cmp_done
+    def combine(self, binary, left, right, index):
+        return binary('and', left, binary('ne', right, 0))
 
-            cmp_and_fail:
-                mov {TEMP_REG_0}, 0
-            cmp_done:
-        """
+    @CComponent.gen_ir_helper
+    def gen_branch(self, true_block, false_block):
+        # a && b
+        #     br a, and_next, false
+        # and_next:
+        #     br b, true, false
+        for item in self.data[:-1]:
+            next_block = self.ir.new_block('and_next')
+            self.get_operand(item, False).gen_branch(next_block, false_block)
+            self.ir.place(next_block)
 
-        # first to {TEMP_REG_0}
-        self.write_asm(f'    mov {TEMP_REG_0}, [rbp - {result_offset}] ; get first result\n')
-
-        label_1_name = f'cmp_and_fail_{self.compiler.item_id}'
-        self.compiler.item_id += 1
-        label_2_name = f'cmp_done_{self.compiler.item_id}'
-        self.compiler.item_id += 1
-
-        for index in range(0, self.data_count):
-            self.write_asm(f'    cmp qword ptr [rbp - {result_offset}], 0\n    je {label_1_name}\n')
-            result_offset += 8
-
-        # set result
-        if set_result:
-            self.write_asm(f'    mov qword ptr [rbp - {final_result_offset}], 1\n    jmp {label_2_name}\n    {label_1_name}:\n')
-            self.write_asm(f'        mov qword ptr [rbp - {final_result_offset}], 0\n    {label_2_name}:\n')
+        self.get_operand(self.data[-1], False).gen_branch(true_block, false_block)
 
 
 class LogicalOrExpression(ChainExpression):
     # logical-and-expression
     # logical-or-expression || logical-and-expression
 
+    __slots__ = ()
+
     def __init__(self, compiler, data: list[LogicalAndExpression]):
         super().__init__(compiler, data)
 
     def __repr__(self):
         return f'LogicalOrExpression {self.data}'
 
-    def get_const_result(self):
-        # todo? not consistent with c
-        for index in range(self.data_count):
-            if 1 == self.gen_asm_results[index]['value']:
-                return 1
-
-        return 0
-
-    def sub_items_gen_asm(self, result_offset, final_result_offset, set_result = True):
-        # todo use loop in asm
-        """
-            cmp v1 0
-            jne cmp_or_ok
+    # todo: short circuit as a value. every item is evaluated for now. see gen_branch for conditions.
+    # a || b || c == (a | b | c) != 0
 
-            cmp v2 0
-            jne cmp_or_ok
+    def combine(self, binary, left, right, index):
+        return binary('or', left, right)
 
-            ...
+    def finish(self, binary, value):
+        return binary('ne', value, 0)
 
-            cmp vx 0
-            jne cmp_or_ok
+    @CComponent.gen_ir_helper
+    def gen_branch(self, true_block, false_block):
+        # a || b
+        #     br a, true, or_next
+        # or_next:
+        #     br b, true, false
+        for item in self.data[:-1]:
+            next_block = self.ir.new_block('or_next')
+            self.get_operand(item, False).gen_branch(true_block, next_block)
+            self.ir.place(next_block)
 
-            mov {TEMP_REG_0}, 0
-            jmp cmp_done
-
-            cmp_or_ok:
-                mov {TEMP_REG_0}, 1
-            cmp_done:
-        """
-
-        label_1_name = f'cmp_or_ok_{self.compiler.item_id}'
-        self.compiler.item_id += 1
-        label_2_name = f'cmp_done_{self.compiler.item_id}'
-        self.compiler.item_id += 1
-
-        for index in range(0, self.data_count):
-            self.write_asm(f'    cmp qword ptr [rbp - {result_offset}], 0\n    jne {label_1_name}\n')
-            result_offset += 8
-
-        if set_result:
-            self.write_asm(f'    mov qword ptr [rbp - {final_result_offset}], 0\n    jmp {label_2_name}\n    {label_1_name}:\n')
-            self.write_asm(f'        mov qword ptr [rbp - {final_result_offset}], 1\n    {label_2_name}:\n')
+        self.get_operand(self.data[-1], False).gen_branch(true_block, false_block)
 
 
 class ConditionalExpression(CComponent):
     # logical-or-expression
     # logical-or-expression ? expression : conditional-expression
 
+    __slots__ = ('loe', 'exp', 'ce')
+
     def __init__(self, compiler, loe: LogicalOrExpression, exp: Expression, ce):
         super().__init__(compiler)
         self.loe = loe
@@ -1875,21 +1368,19 @@ class ConditionalExpression(CComponent):
         self.exp.print_me(indent + PRINT_INDENT)
         self.ce.print_me(indent + PRINT_INDENT)
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self, my_result_offset, set_result = True, need_global_const = False, **kwargs):
+    @CComponent.gen_ir_helper
+    def gen_ir(self, need_global_const = False):
         if not self.exp:
-            return self.loe.gen_asm(my_result_offset, set_result, need_global_const = need_global_const, **kwargs)
+            return self.loe.gen_ir(need_global_const = need_global_const)
         else:
             self.raise_compiler_error(f'no support yes')
-            self.loe.gen_asm(my_result_offset)
-            self.write_asm(f'    ; ConditionalExpression test le result\n')
-            self.exp.gen_asm()
-            self.ce.gen_asm()
 
 
 class ExpressionStatement(CComponent):
     # expression? ;
 
+    __slots__ = ('exp',)
+
     def __init__(self, compiler, exp: Expression):
         super().__init__(compiler)
         self.exp = exp
@@ -1901,16 +1392,10 @@ class ExpressionStatement(CComponent):
         self.print(f'{" " * indent}ExpressionStatement')
         self.exp.print_me(indent + PRINT_INDENT)
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self):
+    @CComponent.gen_ir_helper
+    def gen_ir(self):
         if self.exp:
-            result_offset = self.stack_alloc(8, 'ExpressionStatement alloc for exp result')
-
-            result = self.exp.gen_asm(result_offset)
-
-            self.stack_free(8, 'ExpressionStatement free exp result')
-
-            return result
+            return self.exp.gen_ir()
 
         self.raise_compiler_error(f'wtf ExpressionStatement')
 
@@ -1920,6 +1405,8 @@ class SelectionStatement(CComponent):
     # if ( expression ) statement else statement
     # switch ( expression ) statement
 
+    __slots__ = ('switch', 'exp', 'stmt_1', 'stmt_2')
+
     def __init__(self, compiler, switch = NoObject(), exp: Expression = NoObject(), stmt_1 = NoObject(), stmt_2 = NoObject()):
         super().__init__(compiler)
         self.switch = switch
@@ -1936,42 +1423,103 @@ class SelectionStatement(CComponent):
         self.print(f'{" " * indent}{self.stmt_1}')
         self.print(f'{" " * indent}{self.stmt_2}')
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self):
+    @CComponent.gen_ir_helper
+    def gen_ir(self):
         if not self.switch:
-            result_offset = self.stack_alloc(8, 'SelectionStatement for exp result')
-
-            self.exp.gen_asm(result_offset)
-
-            label_1_name = f'if_not_{self.compiler.item_id}'
-            self.compiler.item_id += 1
-
-            label_2_name = f'if_over_{self.compiler.item_id}'
-            self.compiler.item_id += 1
-
             '''
-            cmp exp, 0
-            je if_not
-            stmt_1
-            jmp if_over
+            br exp, if_then, if_not
+            if_then:
+                stmt_1
+                jmp if_over
             if_not:
                 stmt_2
             if_over:
             '''
 
-            self.write_asm(f'    cmp qword ptr [rbp - {result_offset}], 0\n    je {label_1_name}\n')
-            self.stmt_1.gen_asm()
-            self.write_asm(f'    jmp {label_2_name}\n')
-            self.write_asm(f'    {label_1_name}:\n')
+            then_block = self.ir.new_block('if_then')
+            not_block = self.ir.new_block('if_not')
+            over_block = self.ir.new_block('if_over')
+
+            self.gen_condition(self.exp, then_block, not_block)
+
+            self.ir.place(then_block)
+            self.stmt_1.gen_ir()
+            self.ir.jump(over_block)
+
+            self.ir.place(not_block)
             if self.stmt_2:
-                self.stmt_2.gen_asm()
-            self.write_asm(f'    {label_2_name}:\n')
+                self.stmt_2.gen_ir()
 
-            self.stack_free(8, 'SelectionStatement for exp result')
+            self.ir.place(over_block)
 
             return
+        else:
+            '''
+            switch exp, switch_default, [value: switch_case, ...]
+            switch_case:
+                ...
+            switch_default:
+                ...
+            switch_over:
+            '''
+
+            value = self.rvalue(self.exp.gen_ir())
+
+            labels = self.collect_labels()
+            over_block = self.ir.new_block('switch_over')
+
+            cases = [(case_value, block) for case_value, block in labels.values() if case_value != 'default']
+            default_block = over_block
+            for case_value, block in labels.values():
+                if case_value == 'default':
+                    default_block = block
+
+            self.ir.switch(value, default_block, cases)
+
+            # the code of a case is placed by its LabeledStatement. break goes to switch_over.
+            self.ir.jump_contexts.append({'kind':'switch', 'break':over_block, 'labels':labels})
+            self.stmt_1.gen_ir()
+            self.ir.jump_contexts.pop()
 
-        self.raise_compiler_error(f'wtf SelectionStatement')
+            self.ir.place(over_block)
+
+    def collect_labels(self):
+        # the case and default labels of this switch. not the ones of a switch inside it.
+        # LabeledStatement -> (value or 'default', block)
+        labels = {}
+        values = set()
+
+        stack = [self.stmt_1]
+        while stack:
+            stmt = stack.pop()
+
+            if isinstance(stmt, CompoundStatement):
+                stack += reversed(stmt.bil)
+            elif isinstance(stmt, LabeledStatement):
+                if stmt.data[0] == 'case':
+                    result = stmt.data[1].gen_ir(need_global_const = True)
+                    if 'value' not in result:
+                        stmt.raise_code_error(f'case must be const')
+
+                    if result['value'] in values:
+                        stmt.raise_code_error(f'duplicate case value {result["value"]}')
+
+                    values.add(result['value'])
+                    labels[stmt] = (result['value'], self.ir.new_block('switch_case'))
+                elif stmt.data[0] == 'default':
+                    if 'default' in values:
+                        stmt.raise_code_error(f'multiple default labels')
+
+                    values.add('default')
+                    labels[stmt] = ('default', self.ir.new_block('switch_default'))
+
+                stack.append(stmt.data[-1])
+            elif isinstance(stmt, SelectionStatement) and not stmt.switch:
+                stack += [item for item in [stmt.stmt_2, stmt.stmt_1] if item]
+            elif isinstance(stmt, IterationStatement):
+                stack.append(stmt.stmt)
+
+        return labels
 
 
 class IterationStatement(CComponent):
@@ -1980,6 +1528,8 @@ class IterationStatement(CComponent):
     # for ( expression? ; expression? ; expression? ) statement
     # for ( declaration expression? ; expression? ) statement
 
+    __slots__ = ('loop_type', 'declaration', 'exp_1', 'exp_2', 'exp_3', 'stmt')
+
     def __init__(self, compiler, loop_type: int, declaration = NoObject(), exp_1: Expression = NoObject(), exp_2: Expression = NoObject(), exp_3: Expression = NoObject(), stmt = NoObject()):
         super().__init__(compiler)
         self.loop_type = loop_type
@@ -2000,118 +1550,94 @@ class IterationStatement(CComponent):
         self.exp_3.print_me(indent + PRINT_INDENT)
         self.stmt.print_me(indent + PRINT_INDENT)
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self):
-        self.write_asm(f'\n    ; IterationStatement gen_asm\n')
-
+    @CComponent.gen_ir_helper
+    def gen_ir(self):
         self.enter_scope()
 
+        start_block = self.ir.new_block('loop_start')
+        body_block = self.ir.new_block('loop_body')
+        next_block = self.ir.new_block('loop_next')
+        over_block = self.ir.new_block('loop_over')
+
+        # break goes to loop_over. continue to where the next round starts
+        continue_block = start_block if self.loop_type == 0 else next_block
+        self.ir.jump_contexts.append({'kind':'loop', 'break':over_block, 'continue':continue_block})
+
         if self.loop_type == 0: # while
             '''
             loop_start:
-            exp
-            cmp exp, 0
-            je loop_over
-            stmt
-            jmp loop_start
-            
+                br exp, loop_body, loop_over
+            loop_body:
+                stmt
+                jmp loop_start
             loop_over:
             '''
 
-            result_offset = self.stack_alloc(8, 'IterationStatement for exp result')
+            self.ir.place(start_block)
+            self.gen_condition(self.exp_1, body_block, over_block)
 
-            label_1_name = f'loop_start_{self.compiler.item_id}'
-            self.compiler.item_id += 1
+            self.ir.place(body_block)
+            self.stmt.gen_ir()
+            self.ir.jump(start_block)
 
-            label_2_name = f'loop_over_{self.compiler.item_id}'
-            self.compiler.item_id += 1
-
-            self.write_asm(f'    {label_1_name}:\n')
-            self.exp_1.gen_asm(result_offset)
-            self.write_asm(f'    cmp qword ptr [rbp - {result_offset}], 0\n    je {label_2_name}\n')
-            self.stmt.gen_asm()
-            self.write_asm(f'    jmp {label_1_name}\n')
-            self.write_asm(f'    {label_2_name}:\n')
-
-            self.stack_free(8, 'IterationStatement for exp result')
+            self.ir.place(over_block)
         elif self.loop_type == 1: # do while
             '''
             loop_start:
-            stmt
-            exp
-            cmp exp, 0
-            je loop_over
-            jmp loop_start
-            
+                stmt
+            loop_next:
+                br exp, loop_start, loop_over
             loop_over:
             '''
 
-            result_offset = self.stack_alloc(8, 'IterationStatement for exp result')
-
-            label_1_name = f'loop_start_{self.compiler.item_id}'
-            self.compiler.item_id += 1
-
-            label_2_name = f'loop_over_{self.compiler.item_id}'
-            self.compiler.item_id += 1
+            self.ir.place(start_block)
+            self.stmt.gen_ir()
 
-            self.write_asm(f'    {label_1_name}:\n')
-            self.stmt.gen_asm()
-            self.exp_1.gen_asm(result_offset)
-            self.write_asm(f'    cmp qword ptr [rbp - {result_offset}], 0\n    je {label_2_name}\n')
-            self.write_asm(f'    jmp {label_1_name}\n')
-            self.write_asm(f'    {label_2_name}:\n')
+            self.ir.place(next_block)
+            self.gen_condition(self.exp_1, start_block, over_block)
 
-            self.stack_free(8, 'IterationStatement for exp result')
+            self.ir.place(over_block)
         elif self.loop_type == 2: # for loop
             '''
             declaration or exp_1
-            
             loop_start:
-            exp_2
-            cmp exp_2, 0
-            je loop_over
-            stmt
-            exp_3
-            jmp loop_start
-            
+                br exp_2, loop_body, loop_over
+            loop_body:
+                stmt
+            loop_next:
+                exp_3
+                jmp loop_start
             loop_over:
             '''
 
             if self.declaration:
-                self.declaration.gen_asm()
+                self.declaration.gen_ir()
             elif self.exp_1:
-                self.exp_1.gen_asm()
-
-            result_offset = self.stack_alloc(8, 'IterationStatement alloc for exp result')
-
-            label_1_name = f'loop_start_{self.compiler.item_id}'
-            self.compiler.item_id += 1
-
-            label_2_name = f'loop_over_{self.compiler.item_id}'
-            self.compiler.item_id += 1
+                self.exp_1.gen_ir()
 
-            self.write_asm(f'    {label_1_name}:\n')
+            self.ir.place(start_block)
 
             if self.exp_2:
-                self.exp_2.gen_asm(result_offset)
-                self.write_asm(f'    cmp qword ptr [rbp - {result_offset}], 0 ; for loop compare\n    je {label_2_name}\n')
+                self.gen_condition(self.exp_2, body_block, over_block)
             else:
                 # forever
                 pass
 
-            self.stmt.gen_asm()
+            self.ir.place(body_block)
+            self.stmt.gen_ir()
 
+            self.ir.place(next_block)
             if self.exp_3:
-                self.exp_3.gen_asm(result_offset)
+                self.exp_3.gen_ir()
 
-            self.write_asm(f'    jmp {label_1_name}\n')
-            self.write_asm(f'    {label_2_name}:\n')
-
-            self.stack_free(8, 'IterationStatement free exp result')
+            self.ir.jump(start_block)
+            self.ir.place(over_block)
         else:
             raise
 
-        self.leave_scope(free_stack_variables = True)
+        self.ir.jump_contexts.pop()
+
+        self.leave_scope()
 
 
 class JumpStatement(CComponent):
@@ -2120,6 +1646,8 @@ class JumpStatement(CComponent):
     # break ;
     # return expression? ;
 
+    __slots__ = ('cmd', 'idf', 'exp')
+
     def __init__(self, compiler, cmd, idf: Identifier = NoObject(), exp: Expression = NoObject()):
         super().__init__(compiler)
         self.cmd = cmd
@@ -2138,32 +1666,30 @@ class JumpStatement(CComponent):
         else:
             self.print(f'{" " * (indent + PRINT_INDENT)}{self.cmd}')
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self, my_result_offset = None):
+    @CComponent.gen_ir_helper
+    def gen_ir(self):
         if self.cmd == 'goto':
             # label must in current function
-            self.write_asm(f'    jmp {self.idf.name}\n')
+            self.ir.jump(self.ir.user_label(self.idf.name))
         elif self.cmd == 'continue':
-            self.write_asm(f'    ;continue\n')
+            # the innermost loop. a switch is not one
+            for context in reversed(self.ir.jump_contexts):
+                if context['kind'] == 'loop':
+                    self.ir.jump(context['continue'])
+                    break
+            else:
+                self.raise_code_error(f'continue not in loop')
         elif self.cmd == 'break':
-            self.write_asm(f'    ;break\n')
+            # the innermost loop or switch
+            if not self.ir.jump_contexts:
+                self.raise_code_error(f'break not in loop or switch')
+
+            self.ir.jump(self.ir.jump_contexts[-1]['break'])
         elif self.cmd == 'return':
             if self.exp:
-                # set return value
-                result_offset = self.stack_alloc(8, 'JumpStatement for exp result')
-                data = self.exp.gen_asm(result_offset) # todo: add result_reg?
-
-                if 'lv_address' in data:
-                    self.write_asm(f'    mov {TEMP_REG_4}, [rbp - {result_offset}] ; get lv_address\n')
-                    self.write_asm(f'    mov rax, [{TEMP_REG_4}] ; set return value\n')
-                else:
-                    self.write_asm(f'    mov rax, [rbp - {result_offset}] ; set return value\n')
-
-                self.stack_free(8, 'JumpStatement for exp result')
+                self.ir.ret(self.rvalue(self.exp.gen_ir()))
             else:
-                self.write_asm(f'    xor rax, rax ; set return value = 0\n')
-
-            self.write_asm(f'\n    leave\n    ret\n')
+                self.ir.ret()
         else:
             self.raise_compiler_error(f'JumpStatement unknow {self.cmd}')
 
@@ -2176,6 +1702,8 @@ class Statement(CComponent):
     # iteration-statement
     # jump-statement
 
+    __slots__ = ('bil',)
+
     def __init__(self, compiler, bil: list):
         super().__init__(compiler)
         self.bil = bil
@@ -2197,6 +1725,8 @@ class LabeledStatement(CComponent):
     # case constant-expression : statement
     # default : statement
 
+    __slots__ = ('data', 'data_count')
+
     def __init__(self, compiler, data: list):
         super().__init__(compiler)
         self.data = data
@@ -2213,16 +1743,33 @@ class LabeledStatement(CComponent):
             else:
                 self.print(f'{" " * (indent + PRINT_INDENT)}{item}')
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self):
+    @CComponent.gen_ir_helper
+    def gen_ir(self):
         if self.data[0] not in ['case', 'default']:
-            self.write_asm(f'    {self.data[0].name}:\n')
+            self.ir.place(self.ir.user_label(self.data[0].name))
+        else:
+            # the block the innermost switch made for this label
+            block = None
+            for context in reversed(self.ir.jump_contexts):
+                if context['kind'] == 'switch':
+                    if self in context['labels']:
+                        block = context['labels'][self][1]
+                    break
+
+            if block is None:
+                self.raise_code_error(f'{self.data[0]} not in switch')
+
+            self.ir.place(block)
+
+        self.data[-1].gen_ir()
 
 
 class InitDeclarator(CComponent):
     # declarator
     # declarator = initializer
 
+    __slots__ = ('dtr', 'init')
+
     def __init__(self, compiler, dtr, init):
         super().__init__(compiler)
         self.dtr = dtr
@@ -2246,6 +1793,8 @@ class Declaration(CComponent):
     # struct S3              s1, s2                ;
     # struct {int a, b;}     s1, s2                ;
 
+    __slots__ = ('dss', 'idl', 'global_scope')
+
     def __init__(self, compiler, dss, idl: list[InitDeclarator], global_scope = False):
         super().__init__(compiler)
         self.dss = dss
@@ -2270,8 +1819,23 @@ class Declaration(CComponent):
         else:
             self.print(f'{" " * (indent + 8)}NoObject()')
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self, global_scope = False):
+    def replace_extern(self, name, extern):
+        # a global may be declared extern and defined later in the same unit. the definition takes the place of the extern.
+        # True when this declaration adds nothing. an extern after the definition
+        scope = self.compiler.scopes[-1].current
+        item = scope.get(name)
+        if item is None or 'global' not in item:
+            return False
+
+        if 'extern' not in item:
+            return extern
+
+        del scope[name]
+        self.ir.module.data = [data for data in self.ir.module.data if not (data.kind == 'extern_data' and data.name == name)]
+        return False
+
+    @CComponent.gen_ir_helper
+    def gen_ir(self, global_scope = False):
         # if typedef
         if self.dss['storage_class_specifier'] == 'typedef':
             for idtr in self.idl:
@@ -2298,11 +1862,13 @@ class Declaration(CComponent):
                 dss = copy.deepcopy(self.dss)
                 dtr = copy.deepcopy(idtr.dtr)
 
-                self.print_me()
+                if self.log_on():
+                    self.print_me()
 
                 if isinstance(dss['type_specifier'].type_data, Typedef):
                     # if Typedef of Typedef. merge
-                    dss['type_specifier'].type_data.print_me()
+                    if self.log_on():
+                        dss['type_specifier'].type_data.print_me()
                     type_name = dss['type_specifier'].type_data.name
 
                     scope_item = self.get_scope_item(type_name)
@@ -2314,7 +1880,8 @@ class Declaration(CComponent):
                         self.raise_code_error(f'[{type_name}] unknown')
 
                     self.print_red(scope_item)
-                    scope_item['data'].print_me()
+                    if self.log_on():
+                        scope_item['data'].print_me()
 
                     new_scope_item = copy.deepcopy(scope_item)
 
@@ -2340,8 +1907,9 @@ class Declaration(CComponent):
         # if Typedef, merge Typedef to current. like expand the Typedef data.
         if isinstance(data_type, Typedef):
             self.print_red(data_type)
-            data_type.print_me()
-            self.print_me()
+            if self.log_on():
+                data_type.print_me()
+                self.print_me()
 
             scope_typedef = self.get_scope_item(data_type.name)
             if scope_typedef is None:
@@ -2352,7 +1920,7 @@ class Declaration(CComponent):
 
             typedef = scope_typedef['data']
 
-            self.print_red(f'{typedef = }')
+            self.print_red('typedef = {!r}', typedef)
 
             self.dss['type_qualifier'].update(typedef.dss['type_qualifier'])
             self.dss['type_specifier'] = typedef.dss['type_specifier']
@@ -2373,14 +1941,23 @@ class Declaration(CComponent):
         #
         # todo: make new name
 
+        # extern int a; is defined in another translation unit. no storage here
+        extern = global_scope and self.dss['storage_class_specifier'] == 'extern'
+
         if self.idl:
             for item in self.idl:
-                self.print_red(f'item = {item}')
+                self.print_red('item = {}', item)
                 self.print_red(item.dtr[1])
 
                 dtr = item.dtr[1]
                 name = dtr['name']
 
+                if extern and 'function_data' not in dtr and isinstance(item.init, AssignmentExpression):
+                    self.raise_code_error(f'[{name}] extern with an initializer')
+
+                if global_scope and 'function_data' not in dtr and self.replace_extern(name, extern):
+                    continue
+
                 if 'array_data' not in dtr and 'function_data' not in dtr:
                     scope_item = {'lv':1, 'name':name, 'data_type':data_type}
 
@@ -2400,15 +1977,17 @@ class Declaration(CComponent):
                     if global_scope:
                         scope_item['global'] = 1
                     else:
-                        # alloc for variable
-                        offset = self.compiler.add_function_stack_offset(data_size)
-                        self.write_asm(f'    sub rsp, {data_size} ; Declaration var {data_type} {name} offset = {offset}\n')
-                        scope_item['offset'] = offset
+                        # a slot in the function frame
+                        scope_item['slot'] = self.ir.new_slot(name, data_size)
 
-                    if global_scope:
+                    if extern:
+                        scope_item['extern'] = 1
+                        self.add_to_scope(scope_item)
+                        self.ir.module.add_data('extern_data', name)
+                    elif global_scope:
                         if isinstance(item.init, AssignmentExpression):
                             # todo: global function pointer ...
-                            init_data = item.init.gen_asm(None, need_global_const = True)
+                            init_data = item.init.gen_ir(need_global_const = True)
                             self.print_red(init_data)
                             if 'value' in init_data:
                                 scope_item['value'] = init_data['value']
@@ -2419,28 +1998,23 @@ class Declaration(CComponent):
                             value = 0
                             if 'value' in scope_item:
                                 value = scope_item["value"]
-                            self.write_asm_data(f'{name} qword {value}\n')
+                            self.ir.module.add_data('qword', name, value, const = 'const' in scope_item and 'pointer_data' not in scope_item)
                         else:
                             # struct
-                            self.write_asm_data(f'{name} byte {data_size} dup (0)\n')
+                            self.ir.module.add_data('bytes', name, data_size)
                     else:
                         self.add_to_scope(scope_item)
 
                         if isinstance(item.init, AssignmentExpression):
-                            item.init.gen_asm(scope_item['offset'])
+                            self.ir.store(self.ir.addr(scope_item['slot']), self.rvalue(item.init.gen_ir()))
                 elif 'array_data' in dtr:
-                    self.write_asm(f'    ; Declaration array {data_type} {name}\n')
 
                     array_size = 1
                     ranks = []
                     dim = dtr['array_data']['dim']
 
                     for rank_exp in dtr['array_data']['ranks']:
-                        # result_offset = self.stack_alloc(8, f'Declaration array {data_type} {name} for exp')
-
-                        result = rank_exp.gen_asm(None, set_result = False, need_global_const = True)
-
-                        # self.stack_free(8, f'Declaration array {data_type} {name} for exp')
+                        result = rank_exp.gen_ir(need_global_const = True)
 
                         if 'value' not in result:
                             self.raise_code_error(f'array rank must be const')
@@ -2450,22 +2024,27 @@ class Declaration(CComponent):
 
                     if global_scope:
                         scope_item = {'data_type':data_type, 'size':data_size * array_size, 'name':name, 'global':1, 'array_data':{'dim':dim, 'ranks':ranks}}
+                        if extern:
+                            scope_item['extern'] = 1
+
                         self.add_to_scope(scope_item)
 
-                        # a byte 10000 dup (0)
-                        self.write_asm_data(f'{name} byte {data_size * array_size} dup (0) ; global {data_type} array. {data_size} * {array_size}\n')
+                        if extern:
+                            self.ir.module.add_data('extern_data', name)
+                        else:
+                            # a byte 10000 dup (0)
+                            self.ir.module.add_data('bytes', name, data_size * array_size, f'global {data_type} array. {data_size} * {array_size}')
                     else:
                         # array on stack
-                        offset = self.compiler.add_function_stack_offset(data_size * array_size)
-                        self.write_asm(f'    sub rsp, {data_size * array_size} ; Declaration local array {data_type} {name} offset = {offset}\n')
+                        slot = self.ir.new_slot(name, data_size * array_size)
 
-                        scope_item = {'data_type':data_type, 'size':data_size * array_size, 'name':name, 'offset':offset, 'array_data':{'dim':dim, 'ranks':ranks}}
+                        scope_item = {'data_type':data_type, 'size':data_size * array_size, 'name':name, 'slot':slot, 'array_data':{'dim':dim, 'ranks':ranks}}
                         self.add_to_scope(scope_item)
                 elif 'function_data' in dtr:  # function declaration
-                    self.write_asm_data(f'extern {name}:proc\n')
+                    self.ir.module.add_data('extern', name)
 
                     # ([], {'name': 'print', 'function_data': ([((TypeSpecifier char, []), ([[]], {'name': 's'}))], None)})
-                    self.print_red(f'{item = }')
+                    self.print_red('item = {!r}', item)
 
                     args_data = []
                     if len(dtr['function_data']) > 0:
@@ -2480,7 +2059,7 @@ class Declaration(CComponent):
                             args_data.append('...')
 
                     function_data = {'data_type':self.dss['type_specifier'].type_data, 'args':args_data}
-                    self.add_to_scope({'name':name, 'function_data':function_data})
+                    self.add_to_scope({'name':name, 'function_data':function_data, 'prototype':1})
 
         return
 
@@ -2488,6 +2067,8 @@ class Declaration(CComponent):
 class CompoundStatement(CComponent):
     # { block-item-list }
 
+    __slots__ = ('bil',)
+
     def __init__(self, compiler, bil: list[Declaration | Statement]):
         super().__init__(compiler)
         self.bil = bil
@@ -2503,15 +2084,15 @@ class CompoundStatement(CComponent):
             else:
                 self.print(f'{" " * (indent + PRINT_INDENT)}{bi}')
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self):
+    @CComponent.gen_ir_helper
+    def gen_ir(self):
         self.enter_scope()
 
         for bi in self.bil:
             # Declaration or statement
-            bi.gen_asm()
+            bi.gen_ir()
 
-        self.leave_scope(free_stack_variables = True)
+        self.leave_scope()
 
 
 class FunctionDefinition(CComponent):
@@ -2520,6 +2101,8 @@ class FunctionDefinition(CComponent):
     # declaration-list? is unusual, replace with
     # declaration-specifiers declarator compound-statement
 
+    __slots__ = ('dss', 'declarator', 'cs', 'name', 'global_scope')
+
     def __init__(self, compiler, dss, declarator, cs: CompoundStatement, global_scope = False):
         super().__init__(compiler)
         self.dss = dss
@@ -2531,11 +2114,6 @@ class FunctionDefinition(CComponent):
 
         self.global_scope = global_scope
 
-        # use offset to trace function stack usage
-        # can be used as variable location at compile time
-        # can be used to evaluate stack alignment
-        self.offset = 0
-
     def __repr__(self):
         return f'\nFunctionDefinition {self.dss} {self.declarator} {self.cs}'
 
@@ -2552,8 +2130,8 @@ class FunctionDefinition(CComponent):
         # self.print(f'{" " * (indent + PRINT_INDENT)}{self.dl}')
         self.cs.print_me(indent + PRINT_INDENT)
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self, global_scope = False):
+    @CComponent.gen_ir_helper
+    def gen_ir(self, global_scope = False):
         '''
         int f(int g, int * wtf, const int yyy)
 
@@ -2584,7 +2162,7 @@ class FunctionDefinition(CComponent):
         )
         '''
 
-        self.print_red(f'self.declarator = {pprint.pformat(self.declarator)}')
+        self.print_red(lambda: f'self.declarator = {pprint.pformat(self.declarator)}')
 
         # stack after call
 
@@ -2596,16 +2174,14 @@ class FunctionDefinition(CComponent):
         #  0             old rbp           <- rsp = rbp
 
         # make function_data
-        offset = -16 # - is up
         args_data = []
         if len(self.declarator[1]['function_data']) > 0:
             for arg in self.declarator[1]['function_data'][0]:
-                arg_info = {'lv':1, 'offset':offset, 'data_type':arg[0]['type_specifier'].type_data, 'name':arg[1][1]['name']}
+                arg_info = {'lv':1, 'data_type':arg[0]['type_specifier'].type_data, 'name':arg[1][1]['name']}
                 if len(arg[1][0]) > 0:
                     arg_info['pointer_data'] = arg[1][0]
 
                 args_data.append(arg_info)
-                offset -= 8
 
             if self.declarator[1]['function_data'][1] == '...':
                 args_data.append('...')
@@ -2616,6 +2192,7 @@ class FunctionDefinition(CComponent):
 
         # enter function
         self.compiler.current_function = self
+        self.ir.start_function(self.name)
 
         # make new scope
         self.enter_scope()
@@ -2624,39 +2201,32 @@ class FunctionDefinition(CComponent):
         scope_item = {'name':self.name, 'function_data':function_data}
 
         self.add_to_scope(copy.deepcopy(scope_item))
-        for arg in args_data:
-            self.add_to_scope(copy.deepcopy(arg), add_to_variable_stack_size = False)
-
-        self.write_asm(f'{self.name} proc ; FunctionDefinition\n')
+        for index, arg in enumerate(args_data):
+            if arg == '...':
+                continue
 
-        # Standard Entry Sequence
-        self.write_asm(f'    push rbp ; Standard Entry Sequence\n    mov rbp, rsp ; Standard Entry Sequence\n')
+            arg = copy.deepcopy(arg)
+            arg['slot'] = self.ir.new_param(arg['name'], index)
+            self.add_to_scope(arg)
 
-        # microsoft abi.
-        # 16-aligned before call.
-        # 16-aligned after push rbp.
+        self.cs.gen_ir()
 
-        # 16 aligned -----
-        #     8 bytes return address
-        #     8 bytes rbp              <- rsp = rbp (self.offset = 0)
+        # falls off the end. return 0
+        self.ir.end_function()
 
-        # self.offset = 0 by default
-        # use self.offset to trace function stack usage
+        self.leave_scope()
 
-        self.cs.gen_asm()
+        # add to scope. it takes the place of its prototype
+        prototype = self.compiler.scopes[-1].current.get(self.name)
+        if prototype is not None and 'prototype' in prototype:
+            del self.compiler.scopes[-1].current[self.name]
 
-        # force return
-        self.write_asm(f'\n    leave ; force return\n    ret 0; force return\n')
-
-        self.write_asm(f'{self.name} endp\n\n')
-
-        self.leave_scope(free_stack_variables = False) # function will free stack automatically
-
-        # add to scope
         self.add_to_scope(copy.deepcopy(scope_item))
 
 
 class TranslationUnit(CComponent):
+    __slots__ = ('eds',)
+
     def __init__(self, compiler, eds: list[Declaration | FunctionDefinition]):
         self.eds = eds
         super().__init__(compiler)
@@ -2675,11 +2245,7 @@ class TranslationUnit(CComponent):
         for ed in self.eds:
             ed.print_me(indent + PRINT_INDENT)
 
-    @CComponent.gen_asm_helper
-    def gen_asm(self):
-        self.write_asm(f'\n    .code\n\n')
-
+    @CComponent.gen_ir_helper
+    def gen_ir(self):
         for ed in self.eds:
-            ed.gen_asm(global_scope = True)
-
-        self.write_asm(f'end')
\ No newline at end of file
+            ed.gen_ir(global_scope = True)
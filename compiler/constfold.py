@@ -0,0 +1,306 @@
+# cranks c compiler
+# constant folding and propagation over the ir of a whole function.
+
+# known values flow through vregs and through local slots whose address never escapes.
+# a slot is tracked when every addr of it is only used as a load or store address.
+# a forward dataflow over the executable edges gives the slot values at each load.
+# const int globals that are never written or have their address taken are known too.
+
+# results match what the lowered code computes. 64-bit wrap around,
+# div and mod on edx:eax by a 32-bit divisor, logical shr.
+
+from compiler.ir import VReg, BINARY_OPS
+
+
+BOTTOM = 'bottom' # not a constant
+
+
+def wrap64(value):
+    return (value + 2 ** 63) % 2 ** 64 - 2 ** 63
+
+
+def fold_binary(op, a, b):
+    # None when it can not be folded. a division fault is left to run time.
+    a = wrap64(a)
+    b = wrap64(b)
+
+    if op == 'add':
+        return wrap64(a + b)
+    elif op == 'sub':
+        return wrap64(a - b)
+    elif op == 'mul':
+        return wrap64(a * b)
+    elif op in ['div', 'mod']:
+        dividend = a % 2 ** 64
+        divisor = b % 2 ** 32
+        if divisor == 0 or dividend // divisor >= 2 ** 32:
+            return None
+
+        return dividend // divisor if op == 'div' else dividend % divisor
+    elif op == 'shl':
+        return wrap64(a << (b & 63))
+    elif op == 'shr':
+        return wrap64((a % 2 ** 64) >> (b & 63))
+    elif op == 'and':
+        return a & b
+    elif op == 'or':
+        return a | b
+    elif op == 'xor':
+        return a ^ b
+    elif op == 'lt':
+        return int(a < b)
+    elif op == 'gt':
+        return int(a > b)
+    elif op == 'le':
+        return int(a <= b)
+    elif op == 'ge':
+        return int(a >= b)
+    elif op == 'eq':
+        return int(a == b)
+    elif op == 'ne':
+        return int(a != b)
+
+    return None
+
+
+def find_tracked_slots(function):
+    # addr vreg -> Slot. for the slots whose address never escapes.
+    # only a load or store of such a slot can read or change it.
+    addrs = {}
+    escaped = set()
+
+    for block in function.blocks:
+        for instr in block.instrs:
+            if instr.op == 'addr':
+                addrs[instr.dst] = instr.data
+
+            for index, arg in enumerate(instr.args):
+                if arg in addrs and (index > 0 or instr.op not in ['load', 'store']):
+                    escaped.add(addrs[arg])
+
+    return {vreg: slot for vreg, slot in addrs.items() if slot not in escaped}
+
+
+def meet(a, b):
+    if a == b:
+        return a
+
+    return BOTTOM
+
+
+class FunctionFolding:
+    def __init__(self, function, const_globals, stats):
+        self.function = function
+        self.const_globals = const_globals
+        self.stats = stats
+        self.values = {} # vreg -> int
+        self.slot_of = {} # addr vreg of a tracked slot -> Slot
+        self.global_of = {} # global vreg of a const global -> name
+
+    def run(self):
+        self.find_tracked()
+        self.propagate()
+        self.remove_unreached()
+        self.rewrite()
+        self.remove_dead_slots()
+
+    def find_tracked(self):
+        self.slot_of = find_tracked_slots(self.function)
+
+        for block in self.function.blocks:
+            for instr in block.instrs:
+                if instr.op == 'global' and instr.data in self.const_globals:
+                    self.global_of[instr.dst] = instr.data
+
+    def value(self, arg):
+        # int or None
+        if isinstance(arg, int):
+            return arg
+
+        return self.values.get(arg, None)
+
+    def transfer(self, block, state):
+        # walk block with the slot values at its start. returns the executable successors.
+        for instr in block.instrs:
+            op = instr.op
+
+            if op == 'const':
+                self.values[instr.dst] = wrap64(instr.data)
+            elif op == 'copy':
+                value = self.value(instr.args[0])
+                if value is not None:
+                    self.values[instr.dst] = value
+            elif op == 'neg':
+                value = self.value(instr.args[0])
+                if value is not None:
+                    self.values[instr.dst] = wrap64(-value)
+            elif op == 'load':
+                address = instr.args[0]
+                if address in self.slot_of:
+                    value = state.get(self.slot_of[address], BOTTOM)
+                    if value != BOTTOM:
+                        self.values[instr.dst] = value
+                elif address in self.global_of:
+                    self.values[instr.dst] = wrap64(self.const_globals[self.global_of[address]])
+            elif op == 'store':
+                address = instr.args[0]
+                if address in self.slot_of:
+                    value = self.value(instr.args[1])
+                    state[self.slot_of[address]] = BOTTOM if value is None else value
+            elif op == 'br':
+                cond = self.value(instr.args[0])
+                if cond is not None:
+                    return [instr.data[0] if cond else instr.data[1]]
+            elif op == 'switch':
+                value = self.value(instr.args[0])
+                if value is not None:
+                    return [dict(instr.data[1]).get(value, instr.data[0])]
+            elif op in BINARY_OPS:
+                a = self.value(instr.args[0])
+                b = self.value(instr.args[1])
+                if a is not None and b is not None:
+                    value = fold_binary(op, a, b)
+                    if value is not None:
+                        self.values[instr.dst] = value
+
+        return block.successors()
+
+    def propagate(self):
+        # blocks in layout order. a vreg is always defined before it is used in that order.
+        # slot values only go down the lattice so this ends.
+        blocks = self.function.blocks
+        slots = set(self.slot_of.values())
+        in_states = {blocks[0].label: {slot: BOTTOM for slot in slots}} # missing label = not reached yet
+
+        changed = True
+        while changed:
+            changed = False
+            self.values = {}
+
+            for block in blocks:
+                if block.label not in in_states:
+                    continue
+
+                state = dict(in_states[block.label])
+                for successor in self.transfer(block, state):
+                    if successor not in in_states:
+                        in_states[successor] = state
+                        changed = True
+                        continue
+
+                    old = in_states[successor]
+                    new = {slot: meet(old[slot], state[slot]) for slot in slots}
+                    if new != old:
+                        in_states[successor] = new
+                        changed = True
+
+        self.reached = set(in_states)
+
+    def remove_unreached(self):
+        # blocks behind a folded branch. and the dead ones after a jmp or ret
+        blocks = [block for block in self.function.blocks if block.label in self.reached]
+        self.stats['blocks'] += len(self.function.blocks) - len(blocks)
+        self.function.blocks = blocks
+
+    def rewrite(self):
+        for block in self.function.blocks:
+            instrs = []
+
+            for instr in block.instrs:
+                if instr.dst is not None and instr.dst in self.values and instr.op != 'call':
+                    # every use gets the int
+                    if instr.op != 'const':
+                        self.stats['folded'] += 1
+                    if instr.op == 'load':
+                        self.stats['loads'] += 1
+
+                    continue
+
+                for index, arg in enumerate(instr.args):
+                    if index == 0 and instr.op in ['load', 'store']:
+                        continue # an address stays a vreg
+
+                    if isinstance(arg, VReg) and arg in self.values:
+                        instr.args[index] = self.values[arg]
+
+                if instr.op == 'br' and isinstance(instr.args[0], int):
+                    self.stats['branches'] += 1
+                    instr.data = instr.data[0] if instr.args[0] else instr.data[1]
+                    instr.op = 'jmp'
+                    instr.args = []
+                elif instr.op == 'switch' and isinstance(instr.args[0], int):
+                    self.stats['branches'] += 1
+                    instr.data = dict(instr.data[1]).get(instr.args[0], instr.data[0])
+                    instr.op = 'jmp'
+                    instr.args = []
+
+                instrs.append(instr)
+
+            block.instrs = instrs
+
+    def remove_dead_slots(self):
+        # a tracked slot whose loads are all folded is never read. drop its stores and the slot.
+        loaded = set()
+        for block in self.function.blocks:
+            for instr in block.instrs:
+                if instr.op == 'load' and instr.args[0] in self.slot_of:
+                    loaded.add(self.slot_of[instr.args[0]])
+
+        dead = set(self.slot_of.values()) - loaded
+
+        used = set()
+        for block in self.function.blocks:
+            instrs = []
+            for instr in block.instrs:
+                if instr.op == 'store' and self.slot_of.get(instr.args[0]) in dead:
+                    self.stats['stores'] += 1
+                    continue
+
+                instrs.append(instr)
+                used.update(instr.uses())
+
+            block.instrs = instrs
+
+        # addresses and constants nobody uses any more
+        for block in self.function.blocks:
+            block.instrs = [instr for instr in block.instrs
+                            if instr.op not in ['addr', 'global', 'const'] or instr.dst in used]
+
+        referenced = {instr.data for block in self.function.blocks for instr in block.instrs if instr.op == 'addr'}
+        slots = [slot for slot in self.function.slots if slot in referenced]
+        self.stats['slots'] += len(self.function.slots) - len(slots)
+        self.function.slots = slots
+
+
+class ConstantFolding:
+    def __init__(self, module):
+        self.module = module
+        self.stats = {'folded':0, 'loads':0, 'branches':0, 'blocks':0, 'stores':0, 'slots':0}
+
+    def find_const_globals(self):
+        const_globals = {item.name: item.value for item in self.module.data if item.kind == 'qword' and item.const}
+
+        # written or address taken somewhere. not a constant after all
+        for function in self.module.functions:
+            globals_of = {}
+            for block in function.blocks:
+                for instr in block.instrs:
+                    if instr.op == 'global':
+                        globals_of[instr.dst] = instr.data
+
+                    for index, arg in enumerate(instr.args):
+                        if arg in globals_of and (instr.op != 'load' or index > 0):
+                            const_globals.pop(globals_of[arg], None)
+
+        return const_globals
+
+    def run(self):
+        const_globals = self.find_const_globals()
+
+        for function in self.module.functions:
+            FunctionFolding(function, const_globals, self.stats).run()
+
+        return self.stats
+
+    def report(self):
+        return f'folded = {self.stats["folded"]} loads = {self.stats["loads"]} branches = {self.stats["branches"]} dead blocks = {self.stats["blocks"]} dead stores = {self.stats["stores"]} dead slots = {self.stats["slots"]}'
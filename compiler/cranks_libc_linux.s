@@ -0,0 +1,384 @@
+# cranks_libc_linux.s
+# some c library and helper functions for linux x86-64
+# no libc. write and exit are system calls. system v abi.
+
+    .intel_syntax noprefix
+
+    .data
+
+printf_buffer: .zero 1024 # for printf
+printf_buffer_end:
+printf_digits: .zero 24 # a number or a char. backwards from the end
+printf_digits_end:
+printf_count: .quad 0 # bytes written by this printf
+printf_lower: .ascii "0123456789abcdef"
+printf_upper: .ascii "0123456789ABCDEF"
+printf_null: .asciz "(null)"
+
+    .text
+
+# process entry. main(argc, argv). its return value is the exit code
+    .globl _start
+_start:
+    xor rbp, rbp
+    mov rdi, qword ptr [rsp] # argc
+    lea rsi, [rsp + 8] # argv
+    call main
+
+    mov edi, eax
+    mov eax, 60 # exit
+    syscall
+
+# rsi = bytes, rdx = count. to stdout. keeps every register but rax rcx r11
+write_out:
+    push rdi
+    push rsi
+    push rdx
+
+    write_out_loop:
+        test rdx, rdx
+        jle write_out_over
+        mov edi, 1 # stdout
+        mov eax, 1 # write
+        syscall
+        test rax, rax
+        jle write_out_over # error. nothing more to do
+        add rsi, rax
+        sub rdx, rax
+        jmp write_out_loop
+    write_out_over:
+
+    pop rdx
+    pop rsi
+    pop rdi
+    ret
+
+# string in rdi. 0-terminated. returns the length
+    .globl print
+print:
+    mov rsi, rdi
+
+    xor rdx, rdx
+    print_loop_1:
+        cmp byte ptr [rdi + rdx], 0
+        je print_loop_1_over
+        inc rdx
+        jmp print_loop_1
+    print_loop_1_over:
+
+    push rdx
+    call write_out
+    pop rax
+    ret
+
+# printf(format, ...)
+# like wsprintfA in the windows build. %d %i %u %x %X %c %s %%. flags - and 0, a width.
+# l and h are read and do nothing. a number is the low 32 bits of its arg.
+
+# registers in printf
+#   rbx    end of the text in printf_buffer
+#   r12    format
+#   r13    index of the next arg
+#   r14    width
+#   r15    flags. 1 = left aligned. 2 = pad with 0
+# args 1 to 5 are saved at [rbp - 40]. the rest are the caller's stack args at [rbp + 16].
+
+    .globl printf
+printf:
+    push rbp
+    mov rbp, rsp
+    sub rsp, 48
+    mov qword ptr [rbp - 40], rsi
+    mov qword ptr [rbp - 32], rdx
+    mov qword ptr [rbp - 24], rcx
+    mov qword ptr [rbp - 16], r8
+    mov qword ptr [rbp - 8], r9
+    push rbx
+    push r12
+    push r13
+    push r14
+    push r15
+    sub rsp, 8 # alignment
+
+    mov r12, rdi
+    xor r13, r13
+    lea rbx, [rip + printf_buffer]
+    mov qword ptr [rip + printf_count], 0
+
+    printf_loop:
+        movzx eax, byte ptr [r12]
+        inc r12
+        test al, al
+        jz printf_over
+        cmp al, 37 # %
+        je printf_spec
+        call printf_put
+        jmp printf_loop
+
+    printf_spec:
+        xor r14, r14
+        xor r15, r15
+
+    printf_flags:
+        movzx eax, byte ptr [r12]
+        cmp al, 45 # -
+        jne printf_flags_zero
+        or r15, 1
+        inc r12
+        jmp printf_flags
+    printf_flags_zero:
+        cmp al, 48 # 0
+        jne printf_width
+        or r15, 2
+        inc r12
+        jmp printf_flags
+
+    printf_width:
+        movzx eax, byte ptr [r12]
+        cmp al, 48 # 0
+        jb printf_length
+        cmp al, 57 # 9
+        ja printf_length
+        imul r14, r14, 10
+        sub eax, 48
+        add r14, rax
+        inc r12
+        jmp printf_width
+
+    printf_length:
+        movzx eax, byte ptr [r12]
+        cmp al, 108 # l
+        je printf_length_next
+        cmp al, 104 # h
+        jne printf_conversion
+    printf_length_next:
+        inc r12
+        jmp printf_length
+
+    printf_conversion:
+        test al, al
+        jz printf_over # % at the end
+        inc r12
+        cmp al, 100 # d
+        je printf_signed
+        cmp al, 105 # i
+        je printf_signed
+        cmp al, 117 # u
+        je printf_unsigned
+        cmp al, 120 # x
+        je printf_hex
+        cmp al, 88 # X
+        je printf_hex_upper
+        cmp al, 99 # c
+        je printf_char
+        cmp al, 115 # s
+        je printf_string
+        call printf_put # %% and the unknown ones print as they are
+        jmp printf_loop
+
+    printf_signed:
+        call printf_arg
+        movsxd rax, eax
+        xor r8, r8
+        test rax, rax
+        jns printf_signed_positive
+        neg rax
+        mov r8, 45 # -
+    printf_signed_positive:
+        mov ecx, 10
+        lea rsi, [rip + printf_lower]
+        call printf_number
+        jmp printf_loop
+
+    printf_unsigned:
+        call printf_arg
+        mov eax, eax
+        xor r8, r8
+        mov ecx, 10
+        lea rsi, [rip + printf_lower]
+        call printf_number
+        jmp printf_loop
+
+    printf_hex:
+        call printf_arg
+        mov eax, eax
+        xor r8, r8
+        mov ecx, 16
+        lea rsi, [rip + printf_lower]
+        call printf_number
+        jmp printf_loop
+
+    printf_hex_upper:
+        call printf_arg
+        mov eax, eax
+        xor r8, r8
+        mov ecx, 16
+        lea rsi, [rip + printf_upper]
+        call printf_number
+        jmp printf_loop
+
+    printf_char:
+        call printf_arg
+        lea r9, [rip + printf_digits]
+        mov byte ptr [r9], al
+        mov r10, 1
+        xor r8, r8
+        call printf_field
+        jmp printf_loop
+
+    printf_string:
+        call printf_arg
+        test rax, rax
+        jnz printf_string_not_null
+        lea rax, [rip + printf_null]
+    printf_string_not_null:
+        mov r9, rax
+        xor r10, r10
+        printf_string_length:
+            cmp byte ptr [r9 + r10], 0
+            je printf_string_length_over
+            inc r10
+            jmp printf_string_length
+        printf_string_length_over:
+        xor r8, r8
+        call printf_field
+        jmp printf_loop
+
+    printf_over:
+    call printf_flush
+    mov rax, qword ptr [rip + printf_count]
+
+    add rsp, 8
+    pop r15
+    pop r14
+    pop r13
+    pop r12
+    pop rbx
+    leave
+    ret
+
+# the next arg of printf in rax. uses the frame of printf
+printf_arg:
+    cmp r13, 5
+    jae printf_arg_stack
+    mov rax, qword ptr [rbp + r13 * 8 - 40]
+    inc r13
+    ret
+printf_arg_stack:
+    mov rax, qword ptr [rbp + r13 * 8 - 24] # arg 6 is at [rbp + 16]
+    inc r13
+    ret
+
+# rax = value, rcx = base, rsi = digit chars, r8 = sign char or 0
+printf_number:
+    lea r9, [rip + printf_digits_end]
+    printf_number_loop:
+        xor edx, edx
+        div rcx
+        mov dl, byte ptr [rsi + rdx]
+        dec r9
+        mov byte ptr [r9], dl
+        test rax, rax
+        jnz printf_number_loop
+
+    lea r10, [rip + printf_digits_end]
+    sub r10, r9
+    jmp printf_field
+
+# r9 = text, r10 = length, r8 = sign char or 0. padded to the width in r14
+printf_field:
+    lea rcx, [r9 + r10] # end of the text
+    mov rdx, r14
+    sub rdx, r10
+    test r8, r8
+    jz printf_field_no_sign
+    dec rdx
+    printf_field_no_sign:
+
+    test r15, 1
+    jnz printf_field_left
+    test r15, 2
+    jz printf_field_spaces
+
+    call printf_sign # 0 padding goes after the sign
+    mov r11, 48 # 0
+    call printf_pad
+    jmp printf_text
+
+    printf_field_spaces:
+    mov r11, 32 # space
+    call printf_pad
+    call printf_sign
+    jmp printf_text
+
+    printf_field_left:
+    call printf_sign
+    call printf_text
+    mov r11, 32 # space
+    jmp printf_pad
+
+# r8 = sign char or 0
+printf_sign:
+    test r8, r8
+    jz printf_sign_over
+    mov eax, r8d
+    call printf_put
+    printf_sign_over:
+    ret
+
+# r11 = char, rdx = count. may be 0 or less
+printf_pad:
+    test rdx, rdx
+    jle printf_pad_over
+    mov eax, r11d
+    call printf_put
+    dec rdx
+    jmp printf_pad
+    printf_pad_over:
+    ret
+
+# text from r9 to rcx
+printf_text:
+    cmp r9, rcx
+    jae printf_text_over
+    movzx eax, byte ptr [r9]
+    call printf_put
+    inc r9
+    jmp printf_text
+    printf_text_over:
+    ret
+
+# al = char. into printf_buffer. flushed when full. keeps every register but rax
+printf_put:
+    mov byte ptr [rbx], al
+    inc rbx
+    lea rax, [rip + printf_buffer_end]
+    cmp rbx, rax
+    jb printf_put_over
+    call printf_flush
+    printf_put_over:
+    ret
+
+# printf_buffer up to rbx to stdout. rbx back to the start. keeps every other register
+printf_flush:
+    push rax
+    push rcx
+    push rsi
+    push rdx
+    push r11
+
+    lea rsi, [rip + printf_buffer]
+    mov rdx, rbx
+    sub rdx, rsi
+    add qword ptr [rip + printf_count], rdx
+    call write_out
+    lea rbx, [rip + printf_buffer]
+
+    pop r11
+    pop rdx
+    pop rsi
+    pop rcx
+    pop rax
+    ret
+
+    .section .note.GNU-stack,"",@progbits
@@ -0,0 +1,196 @@
+# cranks c compiler
+# dead code elimination over the ir of the whole module.
+
+# functions main never gets to. by a call or by taking the address. a module without main keeps all,
+# and so does one translation unit of many. the others may call them.
+# blocks the entry never gets to. stores to tracked slots nobody loads before the next store.
+# pure instructions and loads whose value nobody uses. slots nobody takes the address of.
+# strings only the removed code used.
+
+# bytes saved are an estimate. about what lowering makes of each op.
+
+from compiler.ir import BINARY_OPS
+from compiler.constfold import find_tracked_slots
+
+
+PURE_OPS = {'const', 'copy', 'neg', 'addr', 'global', 'load'} | BINARY_OPS
+
+# rough x86-64 code bytes of a lowered op. a mov with [rbp - offset] is 4 to 7.
+OP_BYTES = {'const': 7, 'copy': 3, 'neg': 3, 'addr': 4, 'global': 7, 'load': 7, 'store': 7,
+            'div': 12, 'mod': 12, 'call': 16, 'jmp': 2, 'br': 8, 'switch': 24, 'ret': 5}
+BINARY_BYTES = 7
+FUNCTION_BYTES = 16 # prologue and epilogue
+
+
+def instr_bytes(instr):
+    return OP_BYTES.get(instr.op, BINARY_BYTES)
+
+
+def function_bytes(function):
+    return FUNCTION_BYTES + sum(instr_bytes(instr) for block in function.blocks for instr in block.instrs)
+
+
+class FunctionElimination:
+    def __init__(self, function, stats):
+        self.function = function
+        self.stats = stats
+
+    def run(self):
+        self.remove_unreachable()
+        self.remove_dead_stores()
+        self.remove_dead_instrs()
+        self.remove_dead_slots()
+
+    def remove_unreachable(self):
+        blocks = {block.label: block for block in self.function.blocks}
+        reached = set()
+        stack = [self.function.blocks[0].label]
+        while stack:
+            label = stack.pop()
+            if label not in reached:
+                reached.add(label)
+                stack += blocks[label].successors()
+
+        for block in self.function.blocks:
+            if block.label not in reached:
+                self.stats['blocks'] += 1
+                self.stats['bytes'] += sum(instr_bytes(instr) for instr in block.instrs)
+
+        self.function.blocks = [block for block in self.function.blocks if block.label in reached]
+
+    def remove_dead_stores(self):
+        # backward liveness of the tracked slots. a load makes a slot live, a store ends it.
+        # nothing is live after a ret. a call can not read a tracked slot.
+        tracked = find_tracked_slots(self.function)
+        blocks = self.function.blocks
+        live_in = {block.label: set() for block in blocks}
+
+        changed = True
+        while changed:
+            changed = False
+            for block in reversed(blocks):
+                live = set()
+                for successor in block.successors():
+                    live |= live_in[successor]
+
+                for instr in reversed(block.instrs):
+                    if instr.op == 'load' and instr.args[0] in tracked:
+                        live.add(tracked[instr.args[0]])
+                    elif instr.op == 'store' and instr.args[0] in tracked:
+                        live.discard(tracked[instr.args[0]])
+
+                if live != live_in[block.label]:
+                    live_in[block.label] = live
+                    changed = True
+
+        for block in blocks:
+            live = set()
+            for successor in block.successors():
+                live |= live_in[successor]
+
+            instrs = []
+            for instr in reversed(block.instrs):
+                if instr.op == 'load' and instr.args[0] in tracked:
+                    live.add(tracked[instr.args[0]])
+                elif instr.op == 'store' and instr.args[0] in tracked:
+                    slot = tracked[instr.args[0]]
+                    if slot not in live:
+                        self.stats['stores'] += 1
+                        self.stats['bytes'] += instr_bytes(instr)
+                        continue
+
+                    live.discard(slot)
+
+                instrs.append(instr)
+
+            block.instrs = instrs[::-1]
+
+    def remove_dead_instrs(self):
+        # one removal may leave the args of the instruction unused. go again.
+        changed = True
+        while changed:
+            used = {arg for block in self.function.blocks for instr in block.instrs for arg in instr.uses()}
+
+            changed = False
+            for block in self.function.blocks:
+                instrs = []
+                for instr in block.instrs:
+                    if instr.dst is not None and instr.dst not in used and instr.op in PURE_OPS:
+                        self.stats['instrs'] += 1
+                        self.stats['bytes'] += instr_bytes(instr)
+                        changed = True
+                        continue
+
+                    instrs.append(instr)
+
+                block.instrs = instrs
+
+    def remove_dead_slots(self):
+        referenced = {instr.data for block in self.function.blocks for instr in block.instrs if instr.op == 'addr'}
+
+        for slot in self.function.slots:
+            if slot not in referenced:
+                self.stats['slots'] += 1
+                self.stats['frame bytes'] += slot.size
+
+        self.function.slots = [slot for slot in self.function.slots if slot in referenced]
+
+
+class DeadCodeElimination:
+    def __init__(self, module, whole_program = True):
+        self.module = module
+        self.whole_program = whole_program
+        self.stats = {'functions':0, 'blocks':0, 'stores':0, 'instrs':0, 'slots':0, 'strings':0, 'bytes':0, 'frame bytes':0}
+
+    def remove_functions(self):
+        functions = {function.name: function for function in self.module.functions}
+        if 'main' not in functions or not self.whole_program:
+            return
+
+        reached = set()
+        stack = ['main']
+        while stack:
+            name = stack.pop()
+            if name in reached or name not in functions:
+                continue
+
+            reached.add(name)
+            for block in functions[name].blocks:
+                for instr in block.instrs:
+                    if instr.op in ['call', 'global']:
+                        stack.append(instr.data)
+
+        for function in self.module.functions:
+            if function.name not in reached:
+                self.stats['functions'] += 1
+                self.stats['bytes'] += function_bytes(function)
+
+        self.module.functions = [function for function in self.module.functions if function.name in reached]
+
+    def remove_strings(self):
+        used = {instr.data for function in self.module.functions for block in function.blocks for instr in block.instrs
+                if instr.op == 'global'}
+
+        data = []
+        for item in self.module.data:
+            if item.kind == 'string' and item.name not in used:
+                self.stats['strings'] += 1
+                self.stats['bytes'] += len(item.value) + 1
+                continue
+
+            data.append(item)
+
+        self.module.data = data
+
+    def run(self):
+        self.remove_functions()
+
+        for function in self.module.functions:
+            FunctionElimination(function, self.stats).run()
+
+        self.remove_strings()
+
+        return self.stats
+
+    def report(self):
+        return ' '.join(f'{name} = {count}' for name, count in self.stats.items())
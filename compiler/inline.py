@@ -0,0 +1,142 @@
+# cranks c compiler
+# inlining of small leaf functions over the ir of the whole module.
+
+# a leaf makes no calls. its copy never needs inlining again and it can not recurse.
+# the call becomes stores of the args to new slots, a copy of the callee blocks and a load of the result.
+# a ret stores its value to the result slot and jumps to the code after the call.
+# runs before constant folding. a constant arg flows on into the copied body.
+
+# the callee stays as it is. other modules may still call it.
+
+from compiler.ir import Instr, BasicBlock, VReg, PTR
+from compiler.loopopt import find_loops
+
+
+INLINE_MAX_SIZE = 24 # instructions of the callee
+INLINE_LOOP_MAX_SIZE = 48 # for a call inside a loop
+
+
+class Inlining:
+    def __init__(self, module):
+        self.module = module
+        self.stats = {} # callee name -> inlined call sites
+        self.count = 0 # call sites
+        self.site = 0 # call sites in the current function. for label names
+
+    def find_leaves(self):
+        # name -> IRFunction
+        return {function.name: function for function in self.module.functions
+                if not any(instr.op == 'call' for block in function.blocks for instr in block.instrs)}
+
+    def should_inline(self, call, callee, in_loop):
+        if callee is None or len(call.args) != len(callee.params):
+            return False
+
+        # addresses fold into memory operands and most jmps fall through. they cost nothing.
+        size = sum(1 for block in callee.blocks for instr in block.instrs if instr.op not in ['addr', 'global', 'jmp'])
+        return size <= (INLINE_LOOP_MAX_SIZE if in_loop else INLINE_MAX_SIZE)
+
+    def run(self):
+        leaves = self.find_leaves()
+
+        for function in self.module.functions:
+            if function.name in leaves:
+                continue
+
+            self.site = 0
+            loop_blocks = set()
+            for loop in find_loops(function):
+                loop_blocks |= loop.blocks
+
+            # the blocks after a call site are split off. look at them again.
+            index = 0
+            while index < len(function.blocks):
+                block = function.blocks[index]
+                for position, instr in enumerate(block.instrs):
+                    if instr.op == 'call' and self.should_inline(instr, leaves.get(instr.data), block.label in loop_blocks):
+                        over = self.inline(function, index, position, leaves[instr.data])
+                        if block.label in loop_blocks:
+                            loop_blocks.add(over.label)
+
+                        break
+
+                index += 1
+
+        return self.stats
+
+    def inline(self, function, index, position, callee):
+        # returns the block with the code after the call
+        block = function.blocks[index]
+        call = block.instrs[position]
+        self.count += 1
+        self.site += 1
+        self.stats[callee.name] = self.stats.get(callee.name, 0) + 1
+
+        # labels have the name of the caller. each function counts its own call sites.
+        over = BasicBlock(f'{function.name}_inline_{self.site}_over')
+        over.instrs = block.instrs[position + 1:]
+        block.instrs = block.instrs[:position]
+
+        slots = {}
+        for param, arg in zip(callee.params, call.args):
+            slots[param] = function.new_slot(f'{callee.name}_{param.name}', 8)
+            address = function.new_vreg(PTR)
+            block.instrs += [Instr('addr', address, data = slots[param]), Instr('store', None, (address, arg))]
+
+        for slot in callee.slots:
+            slots[slot] = function.new_slot(f'{callee.name}_{slot.name}', slot.size)
+
+        result = function.new_slot(f'{callee.name}_result', 8)
+        labels = {callee_block.label: f'{function.name}_inline_{self.site}_{callee_block.label}' for callee_block in callee.blocks}
+
+        vregs = {}
+        def copy(arg):
+            if not isinstance(arg, VReg):
+                return arg
+
+            if arg not in vregs:
+                vregs[arg] = function.new_vreg(arg.type)
+
+            return vregs[arg]
+
+        blocks = []
+        for callee_block in callee.blocks:
+            new_block = BasicBlock(labels[callee_block.label])
+            for instr in callee_block.instrs:
+                if instr.op == 'ret':
+                    if instr.args:
+                        address = function.new_vreg(PTR)
+                        new_block.instrs += [Instr('addr', address, data = result), Instr('store', None, (address, copy(instr.args[0])))]
+
+                    new_block.instrs.append(Instr('jmp', data = over.label))
+                    continue
+
+                data = instr.data
+                if instr.op == 'addr':
+                    data = slots[data]
+                elif instr.op == 'jmp':
+                    data = labels[data]
+                elif instr.op == 'br':
+                    data = tuple(labels[label] for label in data)
+                elif instr.op == 'switch':
+                    data = (labels[data[0]], [(value, labels[label]) for value, label in data[1]])
+
+                new_block.instrs.append(Instr(instr.op, copy(instr.dst), [copy(arg) for arg in instr.args], data))
+
+            blocks.append(new_block)
+
+        block.instrs.append(Instr('jmp', data = blocks[0].label))
+
+        # the uses of the call result keep their vreg
+        address = function.new_vreg(PTR)
+        over.instrs[0:0] = [Instr('addr', address, data = result), Instr('load', call.dst, (address,))]
+
+        function.blocks[index + 1:index + 1] = blocks + [over]
+
+        return over
+
+    def report(self):
+        if not self.stats:
+            return 'no call sites'
+
+        return f'call sites = {self.count} ' + ' '.join(f'[{name}] = {count}' for name, count in self.stats.items())
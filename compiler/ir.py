@@ -0,0 +1,375 @@
+# cranks c compiler
+# three-address ir between the ast and the asm.
+
+# a module has data items and functions. a function has frame slots and basic blocks.
+# instructions read and write virtual registers. memory is only touched by explicit load and store.
+# every value is 8 bytes for now. the type of a vreg tells ints from pointers.
+
+import contextlib
+
+I64 = 'i64'
+PTR = 'ptr'
+
+# dst = a op b
+# div and mod are 32-bit unsigned. edx:eax / 32-bit divisor, like the old codegen.
+# shr is a logical shift. compares are signed and give 0 or 1.
+BINARY_OPS = {'add', 'sub', 'mul', 'div', 'mod', 'shl', 'shr', 'and', 'or', 'xor',
+              'lt', 'gt', 'le', 'ge', 'eq', 'ne'}
+COMMUTATIVE_OPS = {'add', 'mul', 'and', 'or', 'xor', 'eq', 'ne'}
+COMPARE_OPS = {'lt', 'gt', 'le', 'ge', 'eq', 'ne'}
+TERMINATORS = {'jmp', 'br', 'switch', 'ret'}
+
+
+class VReg:
+    __slots__ = ('id', 'type')
+
+    def __init__(self, id, type):
+        self.id = id
+        self.type = type
+
+    def __repr__(self):
+        return f'%{self.id}'
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class Slot:
+    # a memory object in the stack frame. a variable, an array or a struct.
+    # parameters are in the caller's argument area at [rbp + 16 + 8 * param_index].
+    # scope is the path of the block it is declared in. (0, 2) is the third block in the first one.
+
+    __slots__ = ('id', 'name', 'size', 'param_index', 'scope')
+
+    def __init__(self, id, name, size, param_index = None, scope = ()):
+        self.id = id
+        self.name = name
+        self.size = size
+        self.param_index = param_index
+        self.scope = scope
+
+    def __repr__(self):
+        return f'${self.name}.{self.id}'
+
+    def __deepcopy__(self, memo):
+        # scope items are deep copied. they must keep pointing at the same slot.
+        return self
+
+
+class Instr:
+    # dst = op args
+    # an arg is a VReg or an int constant.
+    # data is the extra operand of some ops:
+    #   const    value
+    #   addr     Slot
+    #   global   symbol name
+    #   call     function name
+    #   jmp      label
+    #   br       (true label, false label)
+    #   switch   (default label, [(case value, label), ...])
+
+    __slots__ = ('op', 'dst', 'args', 'data')
+
+    def __init__(self, op, dst = None, args = (), data = None):
+        self.op = op
+        self.dst = dst
+        self.args = list(args)
+        self.data = data
+
+    def uses(self):
+        return [arg for arg in self.args if isinstance(arg, VReg)]
+
+    def __repr__(self):
+        args = ', '.join(str(arg) for arg in self.args)
+
+        if self.op == 'const':
+            text = f'const {self.data}'
+        elif self.op in ['addr', 'global']:
+            text = f'{self.op} {self.data}'
+        elif self.op == 'call':
+            text = f'call {self.data}({args})'
+        elif self.op == 'jmp':
+            text = f'jmp {self.data}'
+        elif self.op == 'br':
+            text = f'br {args}, {self.data[0]}, {self.data[1]}'
+        elif self.op == 'switch':
+            cases = ', '.join(f'{value}: {label}' for value, label in self.data[1])
+            text = f'switch {args}, {self.data[0]}, [{cases}]'
+        else:
+            text = f'{self.op} {args}'.rstrip()
+
+        if self.dst is not None:
+            return f'{self.dst}:{self.dst.type} = {text}'
+
+        return text
+
+
+class BasicBlock:
+    __slots__ = ('label', 'instrs')
+
+    def __init__(self, label):
+        self.label = label
+        self.instrs = []
+
+    def __repr__(self):
+        return f'BasicBlock {self.label}'
+
+    def terminator(self):
+        if self.instrs and self.instrs[-1].op in TERMINATORS:
+            return self.instrs[-1]
+
+        return None
+
+    def successors(self):
+        # labels
+        last = self.terminator()
+        if last is None or last.op == 'ret':
+            return []
+
+        if last.op == 'jmp':
+            return [last.data]
+
+        if last.op == 'switch':
+            return [last.data[0]] + [label for value, label in last.data[1]]
+
+        return list(last.data)
+
+
+class IRFunction:
+    __slots__ = ('name', 'params', 'slots', 'blocks', 'vreg_count')
+
+    def __init__(self, name):
+        self.name = name
+        self.params = []
+        self.slots = [] # locals. in declaration order
+        self.blocks = []
+        self.vreg_count = 0
+
+    def __repr__(self):
+        return f'IRFunction {self.name}'
+
+    def new_vreg(self, type = I64):
+        vreg = VReg(self.vreg_count, type)
+        self.vreg_count += 1
+        return vreg
+
+    def new_slot(self, name, size, param_index = None, scope = ()):
+        slot = Slot(len(self.params) + len(self.slots), name, size, param_index, scope)
+
+        if param_index is None:
+            self.slots.append(slot)
+        else:
+            self.params.append(slot)
+
+        return slot
+
+    def dump(self):
+        lines = [f'function {self.name}({", ".join(str(slot) for slot in self.params)})']
+
+        for slot in self.slots:
+            lines.append(f'    slot {slot} size = {slot.size} scope = {".".join(str(i) for i in slot.scope)}')
+
+        for block in self.blocks:
+            lines.append(f'  {block.label}:')
+            for instr in block.instrs:
+                lines.append(f'    {instr}')
+
+        return '\n'.join(lines)
+
+
+class DataItem:
+    # kind
+    #   qword          name = value
+    #   bytes          name = size bytes of 0
+    #   string         name = c string text. escapes not expanded
+    #   extern         name is a function defined elsewhere
+    #   extern_data    name is a global defined in another translation unit
+    #   table          name = qword labels. made by lowering for a switch
+
+    # const is set on a const qword. its value is known to every function.
+
+    __slots__ = ('kind', 'name', 'value', 'comment', 'const')
+
+    def __init__(self, kind, name, value = None, comment = '', const = False):
+        self.kind = kind
+        self.name = name
+        self.value = value
+        self.comment = comment
+        self.const = const
+
+    def __repr__(self):
+        return f'{self.kind} {"const " if self.const else ""}{self.name} {self.value!r}'
+
+
+class IRModule:
+    def __init__(self, name = ''):
+        self.name = name
+        self.data = []
+        self.functions = []
+
+    def add_data(self, kind, name, value = None, comment = '', const = False):
+        item = DataItem(kind, name, value, comment, const)
+        self.data.append(item)
+        return item
+
+    def dump(self):
+        lines = [f'; {self.name}.ir']
+        for item in self.data:
+            lines.append(f'data {item}')
+
+        for function in self.functions:
+            lines.append('')
+            lines.append(function.dump())
+
+        return '\n'.join(lines) + '\n'
+
+
+class IRBuilder:
+    # appends instructions to the current block of the current function.
+    # code after a jmp, br or ret goes to a new unreachable block.
+
+    def __init__(self, module):
+        self.module = module
+        self.function = None
+        self.block = None
+        self.item_id = 0 # for data names outside functions
+        self.function_item_id = 0 # for label and data names in the current function
+        self.user_labels = {}
+        self.scope = () # path of the current block. see Slot
+        self.scope_count = {} # path -> blocks in it so far
+        self.jump_contexts = [] # innermost last. the loops and switches break and continue jump out of
+
+    def new_name(self, prefix):
+        # names in a function have its name and count from 0. a change to one function leaves the names in the others.
+        if self.function is not None:
+            name = f'{self.function.name}_{prefix}_{self.function_item_id}'
+            self.function_item_id += 1
+            return name
+
+        name = f'{prefix}_{self.item_id}'
+        self.item_id += 1
+        return name
+
+    def start_function(self, name):
+        self.function = IRFunction(name)
+        self.module.functions.append(self.function)
+        self.function_item_id = 0
+        self.user_labels = {}
+        self.scope_count = {}
+        self.place(BasicBlock(f'{name}_entry'))
+
+        return self.function
+
+    def end_function(self):
+        if self.block.terminator() is None:
+            self.ret()
+
+        function = self.function
+        self.function = None
+        self.block = None
+
+        return function
+
+    def new_block(self, prefix):
+        return BasicBlock(self.new_name(prefix))
+
+    def user_label(self, name):
+        # goto may come before the label. the function name keeps it apart from the same label in other functions
+        if name not in self.user_labels:
+            self.user_labels[name] = BasicBlock(f'{self.function.name}_label_{name}')
+
+        return self.user_labels[name]
+
+    def place(self, block):
+        # block follows the current one. falls through to it
+        if self.block is not None and self.block.terminator() is None:
+            self.block.instrs.append(Instr('jmp', data = block.label))
+
+        self.function.blocks.append(block)
+        self.block = block
+
+    def emit(self, op, type = None, args = (), data = None):
+        if self.block.terminator() is not None:
+            self.place(self.new_block('dead'))
+
+        dst = None
+        if type is not None:
+            dst = self.function.new_vreg(type)
+
+        self.block.instrs.append(Instr(op, dst, args, data))
+
+        return dst
+
+    @contextlib.contextmanager
+    def unevaluated(self):
+        # code of an operand that never runs. like the one of sizeof. it goes nowhere.
+        saved = self.function, self.block
+        self.function = IRFunction('unevaluated')
+        self.block = BasicBlock('unevaluated')
+
+        try:
+            yield
+        finally:
+            self.function, self.block = saved
+
+    def enter_scope(self):
+        count = self.scope_count.get(self.scope, 0)
+        self.scope_count[self.scope] = count + 1
+        self.scope = self.scope + (count,)
+
+    def leave_scope(self):
+        self.scope = self.scope[:-1]
+
+    def new_slot(self, name, size):
+        return self.function.new_slot(name, size, scope = self.scope)
+
+    def new_param(self, name, index):
+        return self.function.new_slot(name, 8, index)
+
+    def const(self, value):
+        return self.emit('const', I64, data = value)
+
+    def binary(self, op, a, b, type = I64):
+        return self.emit(op, type, (a, b))
+
+    def neg(self, a):
+        return self.emit('neg', I64, (a,))
+
+    def addr(self, slot):
+        return self.emit('addr', PTR, data = slot)
+
+    def global_addr(self, name):
+        return self.emit('global', PTR, data = name)
+
+    def load(self, address, type = I64):
+        return self.emit('load', type, (address,))
+
+    def store(self, address, value):
+        self.emit('store', None, (address, value))
+
+    def call(self, name, args):
+        return self.emit('call', I64, args, name)
+
+    def jump(self, block):
+        self.emit('jmp', data = block.label)
+
+    def branch(self, cond, true_block, false_block):
+        if isinstance(cond, int):
+            self.jump(true_block if cond else false_block)
+        else:
+            self.emit('br', args = (cond,), data = (true_block.label, false_block.label))
+
+    def switch(self, value, default_block, cases):
+        # cases are (int, block)
+        if isinstance(value, int):
+            for case_value, block in cases:
+                if case_value == value:
+                    self.jump(block)
+                    return
+
+            self.jump(default_block)
+        else:
+            self.emit('switch', args = (value,), data = (default_block.label, [(case_value, block.label) for case_value, block in cases]))
+
+    def ret(self, value = None):
+        self.emit('ret', args = () if value is None else (value,))
@@ -0,0 +1,106 @@
+# cranks c compiler
+# lexer. scan the source buffer once into a token array.
+# the parser moves a token index instead of re-reading characters on every backtrack.
+
+import re
+import sys
+
+from compiler.tool import CodeError
+
+
+IDENTIFIER = 'identifier'
+INTEGER_CONSTANT = 'integer_constant'
+FLOATING_CONSTANT = 'floating_constant'
+STRING_LITERAL = 'string_literal'
+PUNCTUATOR = 'punctuator'
+EOF = 'eof'
+
+# longest first. maximal munch.
+PUNCTUATORS = ['...', '<<=', '>>=',
+               '->', '++', '--', '<<', '>>', '<=', '>=', '==', '!=', '&&', '||',
+               '*=', '/=', '%=', '+=', '-=', '&=', '^=', '|=',
+               '[', ']', '(', ')', '{', '}', '.', '&', '*', '+', '-', '~', '!',
+               '/', '%', '<', '>', '^', '|', '?', ':', ';', '=', ',', '#']
+
+TOKEN_RE = re.compile('|'.join([
+    r'(?P<newline>\n)',
+    r'(?P<white>[ \t\r\f\v]+)',
+    r'(?P<floating>(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?[fFlL]?|[0-9]+[eE][+-]?[0-9]+[fFlL]?)',
+    r'(?P<hexadecimal>0[xX][0-9a-fA-F]+)[uUlL]*',
+    r'(?P<octal>0[0-7]*)[uUlL]*(?![0-9])',
+    r'(?P<decimal>[1-9][0-9]*)[uUlL]*',
+    r'(?P<identifier>[A-Za-z_][A-Za-z_0-9]*)',
+    r'"(?P<string>(?:\\.|[^"\\\n])*)"',
+    '(?P<punctuator>' + '|'.join(re.escape(p) for p in PUNCTUATORS) + ')',
+]))
+
+
+class Token:
+    __slots__ = ('kind', 'value', 'line', 'column')
+
+    def __init__(self, kind, value, line, column):
+        self.kind = kind
+        self.value = value # identifier name, int value, raw string or punctuator text
+        self.line = line
+        self.column = column
+
+    def __repr__(self):
+        return f'Token({self.kind}, {self.value!r}, {self.line}:{self.column})'
+
+    def __deepcopy__(self, memo):
+        # tokens never change after tokenize. share them.
+        return self
+
+
+class Lexer:
+    def __init__(self, source_file_buffer, log = None):
+        self.source_file_buffer = source_file_buffer
+        self.log = log # tool.DebugLog. tokens go to the lexer channel
+
+    def tokenize(self):
+        # returns a list of tokens that always ends with an EOF token
+
+        tokens = []
+        buffer = self.source_file_buffer
+        buffer_len = len(buffer)
+        index = 0
+        line = 1
+        line_start = 0
+
+        while index < buffer_len:
+            m = TOKEN_RE.match(buffer, index)
+            if m is None:
+                raise CodeError(f'line {line}: unknown character {buffer[index]!r}')
+
+            kind = m.lastgroup
+            column = index - line_start + 1
+
+            if kind == 'newline':
+                line += 1
+                line_start = m.end()
+            elif kind == 'white':
+                pass
+            elif kind == 'identifier':
+                tokens.append(Token(IDENTIFIER, sys.intern(m.group(kind)), line, column))
+            elif kind == 'decimal':
+                tokens.append(Token(INTEGER_CONSTANT, int(m.group(kind), 10), line, column))
+            elif kind == 'hexadecimal':
+                tokens.append(Token(INTEGER_CONSTANT, int(m.group(kind), 16), line, column))
+            elif kind == 'octal':
+                tokens.append(Token(INTEGER_CONSTANT, int(m.group(kind), 8), line, column))
+            elif kind == 'floating':
+                tokens.append(Token(FLOATING_CONSTANT, m.group(kind), line, column))
+            elif kind == 'string':
+                tokens.append(Token(STRING_LITERAL, m.group(kind), line, column))
+            else:
+                tokens.append(Token(PUNCTUATOR, m.group(kind), line, column))
+
+            index = m.end()
+
+        tokens.append(Token(EOF, None, line, index - line_start + 1))
+
+        if self.log is not None and self.log.enabled('lexer'):
+            for token in tokens:
+                self.log.write('lexer', '{}', (token,))
+
+        return tokens
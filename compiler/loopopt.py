@@ -0,0 +1,327 @@
+# cranks c compiler
+# loop invariant code motion and strength reduction over the ir of a whole function.
+
+# loops are natural loops. a back edge goes to a block that dominates where it comes from.
+# every loop gets a preheader right before its header. the edges from outside go through it.
+# inner loops go first. what they hoist lands in a preheader inside the outer loop and may move on up.
+
+# hoisted is what has the same value in every round. pure ops on values from outside the loop,
+# addresses, and loads of a tracked slot the loop never stores to.
+# div and mod stay. they could fault in a round that never runs them.
+
+# strength reduction is for array indexing. base + i * stride, with i going up by a constant
+# once a round, becomes a pointer slot. it starts at base + i * stride in the preheader and
+# goes up by step * stride right where i is stored. the loads and muls of i left behind go in dce.
+
+from compiler.ir import Instr, BasicBlock, VReg, I64, PTR
+from compiler.constfold import find_tracked_slots, wrap64
+
+
+PURE_OPS = {'const', 'copy', 'neg', 'addr', 'global', 'add', 'sub', 'mul', 'shl', 'shr', 'and', 'or', 'xor',
+            'lt', 'gt', 'le', 'ge', 'eq', 'ne'}
+
+
+def retarget(instr, old, new):
+    # a terminator going to label old goes to new
+    if instr.op == 'jmp':
+        if instr.data == old:
+            instr.data = new
+    elif instr.op == 'br':
+        instr.data = tuple(new if label == old else label for label in instr.data)
+    elif instr.op == 'switch':
+        default, cases = instr.data
+        instr.data = (new if default == old else default, [(value, new if label == old else label) for value, label in cases])
+
+
+class Loop:
+    __slots__ = ('header', 'blocks')
+
+    def __init__(self, header, blocks):
+        self.header = header # label
+        self.blocks = blocks # labels. the header too
+
+    def __repr__(self):
+        return f'Loop {self.header} blocks = {len(self.blocks)}'
+
+
+def find_loops(function):
+    # natural loops in layout order of their headers
+    blocks = function.blocks
+    labels = [block.label for block in blocks]
+    successors = {block.label: block.successors() for block in blocks}
+    predecessors = {label: [] for label in labels}
+    for label in labels:
+        for successor in successors[label]:
+            predecessors[successor].append(label)
+
+    dominators = {label: set(labels) for label in labels}
+    dominators[labels[0]] = {labels[0]}
+
+    changed = True
+    while changed:
+        changed = False
+        for label in labels[1:]:
+            new = {label}
+            if predecessors[label]:
+                new |= set.intersection(*(dominators[predecessor] for predecessor in predecessors[label]))
+
+            if new != dominators[label]:
+                dominators[label] = new
+                changed = True
+
+    # back edges with the same header make one loop
+    loops = {}
+    for label in labels:
+        for successor in successors[label]:
+            if successor in dominators[label]:
+                body = loops.setdefault(successor, {successor})
+                stack = [label]
+                while stack:
+                    node = stack.pop()
+                    if node not in body:
+                        body.add(node)
+                        stack += predecessors[node]
+
+    return [Loop(label, loops[label]) for label in labels if label in loops]
+
+
+class FunctionLoops:
+    def __init__(self, function, stats):
+        self.function = function
+        self.stats = stats
+
+    def run(self):
+        # a preheader changes the loops around it. find them again after each one.
+        done = set()
+        while True:
+            loops = [loop for loop in find_loops(self.function) if loop.header not in done]
+            if not loops:
+                break
+
+            loop = min(loops, key = lambda loop: len(loop.blocks)) # an innermost one
+            done.add(loop.header)
+            self.stats['loops'] += 1
+
+            preheader = self.make_preheader(loop)
+            self.hoist(loop, preheader)
+            self.reduce(loop, preheader)
+
+    def make_preheader(self, loop):
+        preheader = BasicBlock(f'{loop.header}_pre')
+        preheader.instrs.append(Instr('jmp', data = loop.header))
+
+        for block in self.function.blocks:
+            if block.label not in loop.blocks and block.terminator() is not None:
+                retarget(block.terminator(), loop.header, preheader.label)
+
+        blocks = self.function.blocks
+        index = [block.label for block in blocks].index(loop.header)
+        self.function.blocks = blocks[:index] + [preheader] + blocks[index:]
+
+        return preheader
+
+    def loop_blocks(self, loop):
+        return [block for block in self.function.blocks if block.label in loop.blocks]
+
+    def hoist(self, loop, preheader):
+        blocks = self.loop_blocks(loop)
+        tracked = find_tracked_slots(self.function)
+        defined = {instr.dst for block in blocks for instr in block.instrs if instr.dst is not None}
+        stored = {tracked[instr.args[0]] for block in blocks for instr in block.instrs
+                  if instr.op == 'store' and instr.args[0] in tracked}
+
+        # an address stays where it is. it is made again in the preheader when something there needs it.
+        # lowering folds most of them into the memory operand anyway.
+        addresses = {instr.dst: instr for block in blocks for instr in block.instrs if instr.op in ['addr', 'global']}
+
+        invariant = {} # vreg -> Instr. in an order where args come first
+        changed = True
+        while changed:
+            changed = False
+            for block in blocks:
+                for instr in block.instrs:
+                    if instr.dst is None or instr.dst in invariant or instr.op in ['addr', 'global']:
+                        continue
+
+                    if instr.op == 'load':
+                        if instr.args[0] not in tracked or tracked[instr.args[0]] in stored:
+                            continue
+                    elif instr.op not in PURE_OPS:
+                        continue
+
+                    if all(arg not in defined or arg in invariant or arg in addresses for arg in instr.uses()):
+                        invariant[instr.dst] = instr
+                        changed = True
+
+        if not invariant:
+            return
+
+        for block in blocks:
+            block.instrs = [instr for instr in block.instrs if instr.dst not in invariant]
+
+        hoisted = []
+        copies = {} # address vreg in the loop -> the one in the preheader
+        for instr in invariant.values():
+            for index, arg in enumerate(instr.args):
+                if arg in addresses:
+                    if arg not in copies:
+                        copies[arg] = self.function.new_vreg(arg.type)
+                        hoisted.append(Instr(addresses[arg].op, copies[arg], data = addresses[arg].data))
+
+                    instr.args[index] = copies[arg]
+
+            hoisted.append(instr)
+
+        preheader.instrs[-1:-1] = hoisted
+        self.stats['hoisted'] += len(invariant)
+
+    def find_step(self, block, store, slot, tracked):
+        # i = i + step in one block. None when the store is anything else.
+        index_of = {instr: index for index, instr in enumerate(block.instrs)}
+        defs = {instr.dst: instr for instr in block.instrs[:index_of[store]] if instr.dst is not None}
+
+        value = defs.get(store.args[1])
+        if value is None or value.op not in ['add', 'sub']:
+            return None
+
+        a, b = value.args
+        if value.op == 'add' and isinstance(a, int):
+            a, b = b, a
+        if not isinstance(b, int):
+            return None
+
+        load = defs.get(a)
+        if load is None or load.op != 'load' or tracked.get(load.args[0]) is not slot:
+            return None
+
+        return b if value.op == 'add' else -b
+
+    def find_inductions(self, blocks, tracked):
+        # slot -> (block, store, step). for the slots stored once in the loop. by i = i + step.
+        stores = {}
+        for block in blocks:
+            for instr in block.instrs:
+                if instr.op == 'store' and instr.args[0] in tracked:
+                    stores.setdefault(tracked[instr.args[0]], []).append((block, instr))
+
+        inductions = {}
+        for slot, found in stores.items():
+            if len(found) == 1:
+                block, store = found[0]
+                step = self.find_step(block, store, slot, tracked)
+                if step is not None:
+                    inductions[slot] = (block, store, step)
+
+        return inductions
+
+    def find_scaled(self, block, add, base, scaled, invariant, tracked, inductions):
+        # (slot, stride) when add is base + i * stride. all in one block. i not stored in between.
+        if not isinstance(base, VReg) or not invariant(base) or not isinstance(scaled, VReg):
+            return None
+
+        index_of = {instr: index for index, instr in enumerate(block.instrs)}
+        defs = {instr.dst: instr for instr in block.instrs if instr.dst is not None}
+
+        mul = defs.get(scaled)
+        if mul is None or mul.op != 'mul':
+            return None
+
+        value, stride = mul.args
+        if isinstance(value, int):
+            value, stride = stride, value
+        if not isinstance(stride, int):
+            return None
+
+        load = defs.get(value)
+        if load is None or load.op != 'load' or tracked.get(load.args[0]) not in inductions:
+            return None
+
+        slot = tracked[load.args[0]]
+        store_block, store, step = inductions[slot]
+        if store_block is block and index_of[load] < index_of[store] < index_of[add]:
+            return None
+
+        return slot, stride
+
+    def reduce(self, loop, preheader):
+        blocks = self.loop_blocks(loop)
+        tracked = find_tracked_slots(self.function)
+        defined = {instr.dst for block in blocks for instr in block.instrs if instr.dst is not None}
+        addresses = {instr.dst: instr for block in blocks for instr in block.instrs if instr.op in ['addr', 'global']}
+        invariant = lambda vreg: vreg not in defined or vreg in addresses
+        inductions = self.find_inductions(blocks, tracked)
+        if not inductions:
+            return
+
+        groups = {} # (slot, stride, base) -> [(block, add)]. an address base is (op, data)
+        for block in blocks:
+            for instr in block.instrs:
+                if instr.op != 'add' or instr.dst.type != PTR:
+                    continue
+
+                for base, scaled in [instr.args, instr.args[::-1]]:
+                    found = self.find_scaled(block, instr, base, scaled, invariant, tracked, inductions)
+                    if found is not None:
+                        slot, stride = found
+                        if base in addresses:
+                            base = (addresses[base].op, addresses[base].data)
+
+                        groups.setdefault((slot, stride, base), []).append((block, instr))
+                        break
+
+        function = self.function
+        for (slot, stride, base), uses in groups.items():
+            pointer = function.new_slot(f'{slot.name}_ptr', 8)
+
+            # pointer = base + i * stride before the loop
+            init = []
+            if isinstance(base, tuple):
+                op, data = base
+                base = function.new_vreg(PTR)
+                init.append(Instr(op, base, data = data))
+
+            address, value, scaled, start, pointer_address = [function.new_vreg(type) for type in [PTR, I64, I64, PTR, PTR]]
+            init += [
+                Instr('addr', address, data = slot),
+                Instr('load', value, (address,)),
+                Instr('mul', scaled, (value, stride)),
+                Instr('add', start, (base, scaled)),
+                Instr('addr', pointer_address, data = pointer),
+                Instr('store', None, (pointer_address, start)),
+            ]
+            preheader.instrs[-1:-1] = init
+
+            # pointer = pointer + step * stride where i is stored
+            store_block, store, step = inductions[slot]
+            pointer_address, old, new = [function.new_vreg(PTR) for _ in range(3)]
+            index = store_block.instrs.index(store) + 1
+            store_block.instrs[index:index] = [
+                Instr('addr', pointer_address, data = pointer),
+                Instr('load', old, (pointer_address,)),
+                Instr('add', new, (old, wrap64(step * stride))),
+                Instr('store', None, (pointer_address, new)),
+            ]
+
+            # every base + i * stride is a load of the pointer
+            for block, add in uses:
+                pointer_address = function.new_vreg(PTR)
+                block.instrs.insert(block.instrs.index(add), Instr('addr', pointer_address, data = pointer))
+                add.op = 'load'
+                add.args = [pointer_address]
+
+            self.stats['reduced'] += len(uses)
+
+
+class LoopOptimization:
+    def __init__(self, module):
+        self.module = module
+        self.stats = {'loops':0, 'hoisted':0, 'reduced':0}
+
+    def run(self):
+        for function in self.module.functions:
+            FunctionLoops(function, self.stats).run()
+
+        return self.stats
+
+    def report(self):
+        return f'loops = {self.stats["loops"]} hoisted = {self.stats["hoisted"]} reduced = {self.stats["reduced"]}'
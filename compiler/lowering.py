@@ -0,0 +1,707 @@
+# cranks c compiler
+# lowering. ir module to masm text.
+
+# frame of a function
+#   [rbp + 16 + 8 * i]    parameter i. in the caller's argument area
+#   [rbp + 8]             return address
+#   [rbp]                 old rbp
+#   [rbp - ...]           slots, then spilled vregs, then registers saved over calls
+#   [rsp + 8 * i]         argument area. big enough for the call with the most args
+# the frame is allocated once in the prologue. rsp does not move in the body.
+
+# registers
+#   EXPRESSION_REGS       vregs. see regalloc
+#   SCRATCH_REG_0 1       scratch inside a single instruction
+#   ARGS_COUNT_REG        args count of a call. cranks_libc printf reads it
+#   rax rcx rdx r8 r9     calls, div and shifts
+
+from compiler.ir import VReg, DataItem, COMMUTATIVE_OPS, COMPARE_OPS
+from compiler.regalloc import LinearScan, Interval, BYTE_REGS
+from compiler.tool import CompilerError, Color
+
+EXPRESSION_REGS = ['r10', 'r11', 'r12', 'rbx', 'rsi', 'rdi']
+SCRATCH_REG_0 = 'r13'
+SCRATCH_REG_1 = 'r14'
+ARGS_COUNT_REG = 'r15'
+ARG_REGS = ['rcx', 'rdx', 'r8', 'r9']
+
+# switch dispatch by the cases it has
+#   linear    a cmp and je for each case. up to SWITCH_LINEAR_MAX cases
+#   table     jmp through a table of labels in .data. the range of the values is at most
+#             SWITCH_TABLE_DENSITY times the number of cases and SWITCH_TABLE_MAX
+#   tree      binary search. linear at the leaves
+SWITCH_LINEAR_MAX = 3
+SWITCH_TABLE_DENSITY = 3
+SWITCH_TABLE_MAX = 1024
+
+ARITH_CMDS = {'add':'add', 'sub':'sub', 'mul':'imul', 'and':'and', 'or':'or', 'xor':'xor'}
+SET_CMDS = {'lt':'setl', 'gt':'setg', 'le':'setle', 'ge':'setge', 'eq':'sete', 'ne':'setne'}
+JUMP_CMDS = {'lt':'jl', 'gt':'jg', 'le':'jle', 'ge':'jge', 'eq':'je', 'ne':'jne'}
+INVERSE_OPS = {'lt':'ge', 'gt':'le', 'le':'gt', 'ge':'lt', 'eq':'ne', 'ne':'eq'}
+
+
+def is_immediate(operand):
+    return operand.lstrip('-').isdigit()
+
+
+def is_imm32(value):
+    # most instructions only take a sign-extended 32-bit immediate
+    return -2 ** 31 <= value < 2 ** 31
+
+
+def is_memory(operand):
+    return 'ptr' in operand
+
+
+def masm_string(text):
+    # c string text to masm byte data. only \n is supported. other escapes are dropped.
+
+    final_string = '' # use "" in asm
+    in_normal_string = False # like "ashdba
+    i = 0
+    while i < len(text):
+        if text[i] != '\\':
+            if in_normal_string:
+                final_string += text[i] # just insert
+            else:
+                final_string += f'"{text[i]}' # start a ""
+                in_normal_string = True
+
+            i += 1
+        else:
+            if i + 1 >= len(text):
+                raise CompilerError(f'string escape error')
+
+            if text[i + 1] == 'n':
+                if in_normal_string:
+                    final_string += '", 10, ' # close a "" add newline
+                else:
+                    final_string += '10, ' # add newline
+
+            in_normal_string = False
+            i += 2
+
+    if in_normal_string:
+        final_string += '", 0'  # close a "" add 0
+    else:
+        final_string += ' 0'  # add 0
+
+    return final_string
+
+
+class FunctionLowering:
+    def __init__(self, function, log = None):
+        self.function = function
+        self.log = log
+        self.lines = []
+        self.folded = {} # vreg -> addr or global instr. used only as a load or store address
+        self.fused = {} # vreg -> compare instr. only used by the br right after it
+        self.intervals = {} # vreg -> Interval
+        self.locations = {} # vreg -> register or spill slot operand
+        self.slot_addresses = {} # Slot -> [rbp - offset]
+        self.save_addresses = {} # register -> where a call saves it
+        self.frame_size = 0
+        self.regs = LinearScan(EXPRESSION_REGS)
+        self.data = [] # DataItem. switch tables
+        self.public_labels = set() # labels a switch table points to
+        self.label_count = 0
+
+    def write(self, code):
+        self.lines.append(f'    {code}')
+
+    def lower(self):
+        self.fold_addresses()
+        self.fuse_compares()
+        self.find_table_labels()
+        self.build_intervals()
+        spilled = self.regs.allocate(list(self.intervals.values()))
+        self.layout_frame(spilled)
+
+        if self.log is not None:
+            self.log.write('codegen', 'regalloc [{}] {}', (self.function.name, self.regs.report()), Color.orange)
+
+        blocks = self.function.blocks
+        position = 0
+        for index, block in enumerate(blocks):
+            next_label = blocks[index + 1].label if index + 1 < len(blocks) else None
+
+            if block.label in self.public_labels:
+                self.lines.append(f'    {block.label}::') # seen from .data
+            else:
+                self.lines.append(f'    {block.label}:')
+
+            for instr in block.instrs:
+                self.lower_instr(instr, position, next_label)
+                position += 1
+
+        self.lines = self.function_head() + self.lines + self.function_foot()
+
+        return self.lines
+
+    def function_head(self):
+        lines = [f'{self.function.name} proc ; FunctionDefinition',
+                 '    push rbp ; Standard Entry Sequence',
+                 '    mov rbp, rsp ; Standard Entry Sequence']
+        if self.frame_size > 0:
+            lines.append(f'    sub rsp, {self.frame_size} ; frame')
+
+        return lines
+
+    def function_foot(self):
+        return [f'{self.function.name} endp', '']
+
+    def fold_addresses(self):
+        # an address that is only loaded from or stored to needs no register.
+        # [rbp - offset] or the global name goes right into the memory operand.
+        candidates = {}
+        other_uses = set()
+
+        for block in self.function.blocks:
+            for instr in block.instrs:
+                if instr.op in ['addr', 'global']:
+                    candidates[instr.dst] = instr
+
+                for index, arg in enumerate(instr.args):
+                    if isinstance(arg, VReg):
+                        if index > 0 or instr.op not in ['load', 'store']:
+                            other_uses.add(arg)
+
+        self.folded = {vreg: instr for vreg, instr in candidates.items() if vreg not in other_uses}
+
+    def fuse_compares(self):
+        # cmp then jcc. the flags are the condition. no 0 or 1 is made.
+        use_count = {}
+        for block in self.function.blocks:
+            for instr in block.instrs:
+                for arg in instr.uses():
+                    use_count[arg] = use_count.get(arg, 0) + 1
+
+        for block in self.function.blocks:
+            if len(block.instrs) >= 2:
+                compare, last = block.instrs[-2:]
+                if last.op == 'br' and compare.op in COMPARE_OPS and last.args[0] is compare.dst and use_count[compare.dst] == 1:
+                    self.fused[compare.dst] = compare
+
+    def switch_strategy(self, instr):
+        cases = instr.data[1]
+        if len(cases) <= SWITCH_LINEAR_MAX:
+            return 'linear'
+
+        values = [value for value, label in cases]
+        span = max(values) - min(values) + 1
+        if span <= SWITCH_TABLE_DENSITY * len(cases) and span <= SWITCH_TABLE_MAX:
+            return 'table'
+
+        return 'tree'
+
+    def find_table_labels(self):
+        for block in self.function.blocks:
+            last = block.terminator()
+            if last is not None and last.op == 'switch' and self.switch_strategy(last) == 'table':
+                self.public_labels.update(block.successors())
+
+    def new_label(self, prefix):
+        # a label inside the lowered code of one ir instruction
+        self.label_count += 1
+        return f'{self.function.name}_{prefix}_{self.label_count}'
+
+    def build_intervals(self):
+        # liveness over the blocks in layout order. one interval per vreg from
+        # its first to its last live position.
+
+        blocks = self.function.blocks
+        block_map = {block.label: block for block in blocks}
+        first = {}
+        last = {}
+        uses = {}
+        defs = {}
+        points = {}
+
+        position = 0
+        for block in blocks:
+            first[block.label] = position
+            block_uses = set()
+            block_defs = set()
+
+            for instr in block.instrs:
+                for arg in instr.uses():
+                    if arg in self.folded or arg in self.fused:
+                        continue
+
+                    if arg not in block_defs:
+                        block_uses.add(arg)
+
+                    points.setdefault(arg, []).append(position)
+
+                if instr.dst is not None and instr.dst not in self.folded and instr.dst not in self.fused:
+                    block_defs.add(instr.dst)
+                    points.setdefault(instr.dst, []).append(position)
+
+                position += 1
+
+            last[block.label] = position - 1
+            uses[block.label] = block_uses
+            defs[block.label] = block_defs
+
+        live_in = {block.label: set() for block in blocks}
+        live_out = {block.label: set() for block in blocks}
+
+        changed = True
+        while changed:
+            changed = False
+            for block in reversed(blocks):
+                label = block.label
+                out = set()
+                for successor in block.successors():
+                    if successor in block_map:
+                        out |= live_in[successor]
+
+                new_in = uses[label] | (out - defs[label])
+                if out != live_out[label] or new_in != live_in[label]:
+                    live_out[label] = out
+                    live_in[label] = new_in
+                    changed = True
+
+        for block in blocks:
+            for vreg in live_in[block.label]:
+                points[vreg].append(first[block.label])
+            for vreg in live_out[block.label]:
+                points[vreg].append(last[block.label])
+
+        self.intervals = {vreg: Interval(vreg, min(p), max(p)) for vreg, p in points.items()}
+
+    def layout_slots(self):
+        # a scope's slots go after the ones of its outer scopes.
+        # sibling scopes are never live at the same time. they share the same place.
+        # returns the size of the slot area
+        scopes = {}
+        children = {}
+        for slot in self.function.slots:
+            scopes.setdefault(slot.scope, []).append(slot)
+
+            scope = slot.scope
+            while scope:
+                children.setdefault(scope[:-1], set()).add(scope)
+                scope = scope[:-1]
+
+        size = 0
+        stack = [((), 0)]
+        while stack:
+            scope, offset = stack.pop()
+
+            for slot in scopes.get(scope, []):
+                offset += slot.size
+                self.slot_addresses[slot] = f'[rbp - {offset}]'
+
+            size = max(size, offset)
+            stack += [(child, offset) for child in children.get(scope, [])]
+
+        return size
+
+    def layout_params(self, offset):
+        # all args are in the caller's argument area. returns the new offset
+        for slot in self.function.params:
+            self.slot_addresses[slot] = f'[rbp + {16 + 8 * slot.param_index}]'
+
+        return offset
+
+    def layout_callee_saved(self, offset):
+        # nothing. main is the only function called from outside and it never returns to c code
+        return offset
+
+    def args_area_size(self, args_count):
+        # shadow space for 4 args at least
+        return 8 * max(4, args_count)
+
+    def layout_frame(self, spilled):
+        offset = self.layout_params(self.layout_slots())
+
+        for interval in spilled:
+            offset += 8
+            self.locations[interval.vreg] = f'qword ptr [rbp - {offset}]'
+
+        for vreg, interval in self.intervals.items():
+            if interval.reg:
+                self.locations[vreg] = interval.reg
+
+        # calls
+        area_size = 0
+        saved_regs = set()
+        position = 0
+        for block in self.function.blocks:
+            for instr in block.instrs:
+                if instr.op == 'call':
+                    area_size = max(area_size, self.args_area_size(len(instr.args)))
+                    saved_regs.update(self.live_across(position))
+
+                position += 1
+
+        for reg in sorted(saved_regs, key = EXPRESSION_REGS.index):
+            offset += 8
+            self.save_addresses[reg] = f'qword ptr [rbp - {offset}]'
+
+        offset = self.layout_callee_saved(offset)
+        offset += area_size
+
+        # rsp is 16-aligned at every call
+        self.frame_size = (offset + 15) // 16 * 16
+
+    def live_across(self, position):
+        # registers that hold a value over the call at position
+        regs = [interval.reg for interval in self.intervals.values()
+                if interval.reg and interval.start < position < interval.end]
+
+        return sorted(regs, key = EXPRESSION_REGS.index)
+
+    def operand(self, arg):
+        if isinstance(arg, int):
+            return str(arg)
+
+        return self.locations[arg]
+
+    def source(self, arg):
+        # operand for the second place of an alu instruction
+        if isinstance(arg, int) and not is_imm32(arg):
+            self.write(f'mov {SCRATCH_REG_1}, {arg} ; 64-bit immediate')
+            return SCRATCH_REG_1
+
+        return self.operand(arg)
+
+    def memory(self, address):
+        # qword memory operand at address
+        if address in self.folded:
+            instr = self.folded[address]
+            if instr.op == 'addr':
+                return f'qword ptr {self.slot_addresses[instr.data]}'
+
+            return f'qword ptr {self.global_operand(instr.data)}'
+
+        location = self.operand(address)
+        if is_memory(location) or is_immediate(location):
+            self.write(f'mov {SCRATCH_REG_1}, {location} ; address')
+            location = SCRATCH_REG_1
+
+        return f'qword ptr [{location}]'
+
+    def global_operand(self, name):
+        # a global in an operand. masm makes it rip relative by itself
+        return name
+
+    def mov(self, dst, src):
+        if dst == src:
+            return
+
+        if is_memory(dst) and (is_memory(src) or is_immediate(src) and not is_imm32(int(src))):
+            self.write(f'mov {SCRATCH_REG_0}, {src}')
+            src = SCRATCH_REG_0
+
+        self.write(f'mov {dst}, {src}')
+
+    def work_reg(self, dst):
+        # where to compute a result. the result register or scratch for a spilled one
+        if is_memory(dst):
+            return SCRATCH_REG_0
+
+        return dst
+
+    def lower_instr(self, instr, position, next_label):
+        op = instr.op
+
+        if op in ['addr', 'global'] and instr.dst in self.folded:
+            return
+
+        dst = self.locations.get(instr.dst) if instr.dst is not None else None
+
+        if op == 'const':
+            self.mov(dst, str(instr.data))
+        elif op == 'copy':
+            self.mov(dst, self.operand(instr.args[0]))
+        elif op in ARITH_CMDS:
+            a, b = instr.args
+            if op in COMMUTATIVE_OPS and self.operand(b) == dst and self.operand(a) != dst:
+                a, b = b, a
+
+            work = self.work_reg(dst)
+            if self.operand(b) == work and self.operand(a) != work:
+                work = SCRATCH_REG_0 # would overwrite b
+
+            self.mov(work, self.operand(a))
+            self.write(f'{ARITH_CMDS[op]} {work}, {self.source(b)}')
+            self.mov(dst, work)
+        elif op in ['div', 'mod']:
+            # 32-bit int
+            # edx:eax / divisor. quotient in eax, remainder in edx.
+            a, b = instr.args
+            self.mov(SCRATCH_REG_1, self.operand(b))
+            self.mov('rax', self.operand(a))
+            self.write('mov rdx, rax')
+            self.write('shr rdx, 32')
+            self.write(f'and rax, qword ptr {self.global_operand("right_32f")}')
+            self.write(f'div {SCRATCH_REG_1}d')
+            self.mov(dst, 'rax' if op == 'div' else 'rdx')
+        elif op in ['shl', 'shr']:
+            a, b = instr.args
+            if isinstance(b, int) and 0 <= b < 256:
+                count = str(b)
+            else:
+                self.mov('rcx', self.operand(b))
+                count = 'cl'
+
+            work = self.work_reg(dst)
+            self.mov(work, self.operand(a))
+            self.write(f'{op} {work}, {count}')
+            self.mov(dst, work)
+        elif op in COMPARE_OPS:
+            a, b = instr.args
+            left = self.operand(a)
+            right = self.source(b)
+            if isinstance(a, int) or is_memory(left) and is_memory(right):
+                self.mov(SCRATCH_REG_0, left)
+                left = SCRATCH_REG_0
+
+            self.write(f'cmp {left}, {right}')
+            if instr.dst in self.fused:
+                return # the br uses the flags
+
+            work = self.work_reg(dst)
+            self.write(f'{SET_CMDS[op]} {BYTE_REGS[work]}')
+            self.write(f'movzx {work}, {BYTE_REGS[work]}')
+            self.mov(dst, work)
+        elif op == 'neg':
+            work = self.work_reg(dst)
+            self.mov(work, self.operand(instr.args[0]))
+            self.write(f'neg {work}')
+            self.mov(dst, work)
+        elif op == 'addr':
+            work = self.work_reg(dst)
+            self.write(f'lea {work}, {self.slot_addresses[instr.data]} ; {instr.data}')
+            self.mov(dst, work)
+        elif op == 'global':
+            work = self.work_reg(dst)
+            self.write(f'lea {work}, {self.global_operand(instr.data)}')
+            self.mov(dst, work)
+        elif op == 'load':
+            memory = self.memory(instr.args[0])
+            work = self.work_reg(dst)
+            self.write(f'mov {work}, {memory}')
+            self.mov(dst, work)
+        elif op == 'store':
+            memory = self.memory(instr.args[0])
+            self.mov(memory, self.operand(instr.args[1]))
+        elif op == 'call':
+            self.lower_call(instr, position, dst)
+        elif op == 'jmp':
+            self.write(f'jmp {instr.data}')
+        elif op == 'br':
+            true_label, false_label = instr.data
+            cond = instr.args[0]
+
+            if cond in self.fused:
+                # flags of the compare right before
+                compare_op = self.fused[cond].op
+                true_jump, false_jump = JUMP_CMDS[compare_op], JUMP_CMDS[INVERSE_OPS[compare_op]]
+            else:
+                self.write(f'cmp {self.operand(cond)}, 0')
+                true_jump, false_jump = 'jne', 'je'
+
+            if true_label == next_label:
+                self.write(f'{false_jump} {false_label}')
+            elif false_label == next_label:
+                self.write(f'{true_jump} {true_label}')
+            else:
+                self.write(f'{false_jump} {false_label}')
+                self.write(f'jmp {true_label}')
+        elif op == 'switch':
+            self.lower_switch(instr)
+        elif op == 'ret':
+            if instr.args:
+                self.mov('rax', self.operand(instr.args[0]))
+            else:
+                self.write('xor rax, rax')
+
+            self.lower_ret()
+        else:
+            raise CompilerError(f'lowering unknown ir op [{op}]')
+
+    def lower_ret(self):
+        self.write('leave')
+        self.write('ret')
+
+    def lower_switch(self, instr):
+        default_label, cases = instr.data
+        cases = sorted(cases)
+        strategy = self.switch_strategy(instr)
+
+        value = self.operand(instr.args[0])
+        if is_memory(value):
+            self.mov(SCRATCH_REG_0, value)
+            value = SCRATCH_REG_0
+
+        if cases:
+            description = f'{strategy}. {len(cases)} cases in {cases[0][0]}..{cases[-1][0]}'
+        else:
+            description = f'{strategy}. no cases'
+
+        self.lines.append(f'    ; switch {description}')
+        if self.log is not None:
+            self.log.write('codegen', 'switch [{}] {}', (self.function.name, description), Color.orange)
+
+        if strategy == 'table':
+            low = cases[0][0]
+            span = cases[-1][0] - low + 1
+
+            labels = [default_label] * span
+            for case_value, label in cases:
+                labels[case_value - low] = label
+
+            table_name = self.new_label('table')
+            self.data.append(DataItem('table', table_name, labels, f'switch {description}'))
+
+            # index = value - low. below low is a big unsigned number too
+            self.mov(SCRATCH_REG_0, value)
+            if low != 0:
+                self.write(f'sub {SCRATCH_REG_0}, {self.source(low)}')
+            self.write(f'cmp {SCRATCH_REG_0}, {span - 1}')
+            self.write(f'ja {default_label}')
+            self.write(f'lea {SCRATCH_REG_1}, {self.global_operand(table_name)}')
+            self.write(f'jmp qword ptr [{SCRATCH_REG_1} + {SCRATCH_REG_0} * 8]')
+        elif strategy == 'linear':
+            self.switch_linear(value, cases, default_label)
+        else:
+            self.switch_tree(value, cases, default_label)
+
+    def switch_linear(self, value, cases, default_label):
+        for case_value, label in cases:
+            self.write(f'cmp {value}, {self.source(case_value)}')
+            self.write(f'je {label}')
+
+        self.write(f'jmp {default_label}')
+
+    def switch_tree(self, value, cases, default_label):
+        # cases are sorted. split at the middle one
+        if len(cases) <= SWITCH_LINEAR_MAX:
+            self.switch_linear(value, cases, default_label)
+            return
+
+        middle = len(cases) // 2
+        case_value, label = cases[middle]
+        upper_label = self.new_label('switch_upper')
+
+        self.write(f'cmp {value}, {self.source(case_value)}')
+        self.write(f'je {label}')
+        self.write(f'jg {upper_label}')
+        self.switch_tree(value, cases[:middle], default_label)
+
+        self.lines.append(f'    {upper_label}:')
+        self.switch_tree(value, cases[middle + 1:], default_label)
+
+    def lower_call(self, instr, position, dst):
+        # microsoft abi
+        # rcx rdx r8 r9 and a copy of every arg in the area at rsp. 16-aligned at call.
+
+        saved_regs = self.live_across(position)
+        for reg in saved_regs:
+            self.write(f'mov {self.save_addresses[reg]}, {reg} ; save live vreg')
+
+        args_count = len(instr.args)
+
+        for index, arg in enumerate(instr.args):
+            self.mov(f'qword ptr [rsp + {8 * index}]', self.operand(arg))
+
+        for index, arg in enumerate(instr.args[:4]):
+            self.mov(ARG_REGS[index], self.operand(arg))
+
+        self.write(f'mov {ARGS_COUNT_REG}, {args_count} ; args count')
+        self.write(f'call {instr.data}')
+
+        for reg in saved_regs:
+            self.write(f'mov {reg}, {self.save_addresses[reg]} ; recover live vreg')
+
+        self.mov(dst, 'rax')
+
+
+class Lowering:
+    # windows x64. masm for ml64 and the microsoft abi
+    asm_ext = 'asm'
+    comment = ';'
+    function_lowering = FunctionLowering
+    data_start = ['    .data', '']
+    qword = 'qword'
+    code_start = ['', '    .code', '']
+    code_end = ['end']
+
+    def __init__(self, module, log = None):
+        self.module = module
+        self.log = log
+
+    def lower_data(self):
+        lines = list(self.data_start)
+        lines.append(self.data_label('right_32f', f'{self.qword} {self.hex_value(0xffffffff)}'))
+        defined = {function.name for function in self.module.functions}
+
+        for item in self.module.data:
+            comment = self.comment_text(item.comment) if item.comment else ''
+
+            # qword and bytes are the globals of the c code. other translation units may use them
+            if item.kind == 'qword':
+                lines.append(self.public(item.name))
+                lines.append(self.data_label(item.name, f'{self.qword} {item.value}') + comment)
+            elif item.kind == 'bytes':
+                lines.append(self.public(item.name))
+                lines.append(self.data_label(item.name, self.zero_bytes(item.value)) + comment)
+            elif item.kind == 'string':
+                lines.append(self.data_label(item.name, self.string_bytes(item.value)) + comment)
+            elif item.kind == 'table':
+                # 8 labels a line
+                rows = [item.value[i:i + 8] for i in range(0, len(item.value), 8)]
+                lines.append(self.data_label(item.name, f'{self.qword} {", ".join(rows[0])}') + comment)
+                for row in rows[1:]:
+                    lines.append(f'    {self.qword} {", ".join(row)}')
+            elif item.kind == 'extern':
+                # a prototype of a function defined here is no extern
+                if item.name not in defined:
+                    lines.append(self.extern(item.name))
+            elif item.kind == 'extern_data':
+                lines.append(self.extern_data(item.name))
+            else:
+                raise CompilerError(f'lowering unknown data kind [{item.kind}]')
+
+        return '\n'.join(lines) + '\n'
+
+    # the spelling of the data of a target. lower_data has the one loop over the items
+
+    def comment_text(self, text):
+        return f' {self.comment} {text}'
+
+    def data_label(self, name, text):
+        return f'{name} {text}'
+
+    def hex_value(self, value):
+        return f'0{value:x}h'
+
+    def zero_bytes(self, size):
+        return f'byte {size} dup (0)'
+
+    def string_bytes(self, text):
+        return f'byte {masm_string(text)}'
+
+    def extern(self, name):
+        return f'extern {name}:proc'
+
+    def extern_data(self, name):
+        return f'extern {name}:qword'
+
+    def public(self, name):
+        return f'public {name}'
+
+    # Compiler.lower_functions puts the code together. code_start, lower_function of each function
+    # through peephole or the function cache, code_end, then finish_code. lower_data comes after. it has the switch tables.
+
+    def lower_function(self, function):
+        # the lines of one function and the data it adds. switch tables
+        function_lowering = self.function_lowering(function, self.log)
+        return function_lowering.lower(), function_lowering.data
+
+    def finish_code(self, lines):
+        # code lines after the peephole pass to their final text
+        return lines
@@ -0,0 +1,201 @@
+# cranks c compiler
+# lowering for linux x86-64. gnu as in intel syntax and the system v abi.
+
+# frame of a function
+#   [rbp + 16 + 8 * i]    parameter 6 + i. the first 6 come in rdi rsi rdx rcx r8 r9
+#   [rbp + 8]             return address
+#   [rbp]                 old rbp
+#   [rbp - ...]           slots, register parameters, spilled vregs, registers saved over calls, callee saved registers
+#   [rsp + 8 * i]         argument 6 + i of a call
+# every ret jumps to the one epilogue. it restores the callee saved registers the body used.
+
+# the lines go through the peephole pass in masm form. ; comments and label:: for the
+# labels it must keep. finish_code turns them into gas.
+
+import re
+
+from compiler.lowering import FunctionLowering, Lowering, SCRATCH_REG_0, SCRATCH_REG_1
+from compiler.peephole import REG_NAMES
+from compiler.tool import CompilerError
+
+ARG_REGS = ['rdi', 'rsi', 'rdx', 'rcx', 'r8', 'r9']
+CALLEE_SAVED_REGS = ['rbx', 'r12', 'r13', 'r14', 'r15']
+
+
+def gas_string(text):
+    # c string text to a quoted gas string. only \n is supported. other escapes are dropped like in masm_string.
+    final_string = ''
+    i = 0
+    while i < len(text):
+        if text[i] != '\\':
+            final_string += text[i]
+            i += 1
+        else:
+            if i + 1 >= len(text):
+                raise CompilerError(f'string escape error')
+
+            if text[i + 1] == 'n':
+                final_string += '\\n'
+
+            i += 2
+
+    return f'"{final_string}"'
+
+
+class LinuxFunctionLowering(FunctionLowering):
+    def __init__(self, function, log = None):
+        super().__init__(function, log)
+        self.param_homes = [] # (address, register) of the register parameters
+        self.callee_saved = {} # register -> where the prologue saves it
+        self.epilogue_label = f'{function.name}_epilogue'
+
+    def global_operand(self, name):
+        return f'[rip + {name}]'
+
+    def layout_params(self, offset):
+        # the register parameters get a home in the frame. the prologue stores them there.
+        for slot in self.function.params:
+            if slot.param_index < len(ARG_REGS):
+                offset += 8
+                self.slot_addresses[slot] = f'[rbp - {offset}]'
+                self.param_homes.append((f'qword ptr [rbp - {offset}]', ARG_REGS[slot.param_index]))
+            else:
+                self.slot_addresses[slot] = f'[rbp + {16 + 8 * (slot.param_index - len(ARG_REGS))}]'
+
+        return offset
+
+    def layout_callee_saved(self, offset):
+        # a place for each one the body may use. only the used ones are saved in the end.
+        regs = {interval.reg for interval in self.intervals.values() if interval.reg} | {SCRATCH_REG_0, SCRATCH_REG_1}
+        for reg in CALLEE_SAVED_REGS:
+            if reg in regs:
+                offset += 8
+                self.callee_saved[reg] = f'qword ptr [rbp - {offset}]'
+
+        return offset
+
+    def args_area_size(self, args_count):
+        # no shadow space. only the args after the 6th
+        return 8 * max(0, args_count - len(ARG_REGS))
+
+    def used_callee_saved(self):
+        # the lines are the body when the head and foot are made
+        words = set(re.findall(r'\w+', ' '.join(self.lines)))
+        return [reg for reg in self.callee_saved if words & REG_NAMES[reg]]
+
+    def function_head(self):
+        name = self.function.name
+        lines = [f'    .globl {name}',
+                 f'    .type {name}, @function',
+                 f'{name}::',
+                 '    push rbp ; Standard Entry Sequence',
+                 '    mov rbp, rsp ; Standard Entry Sequence']
+        if self.frame_size > 0:
+            lines.append(f'    sub rsp, {self.frame_size} ; frame')
+
+        for address, reg in self.param_homes:
+            lines.append(f'    mov {address}, {reg} ; param')
+
+        for reg in self.used_callee_saved():
+            lines.append(f'    mov {self.callee_saved[reg]}, {reg} ; callee saved')
+
+        return lines
+
+    def function_foot(self):
+        name = self.function.name
+        lines = [f'    {self.epilogue_label}:']
+        for reg in self.used_callee_saved():
+            lines.append(f'    mov {reg}, {self.callee_saved[reg]} ; callee saved')
+
+        return lines + ['    leave', '    ret', f'    .size {name}, .-{name}', '']
+
+    def lower_ret(self):
+        self.write(f'jmp {self.epilogue_label}')
+
+    def move_args(self, moves):
+        # (register, source). rsi and rdi hold vregs too.
+        # a register is written when no other move still reads it.
+        moves = list(moves)
+        while moves:
+            for index, (reg, source) in enumerate(moves):
+                if all(other_source != reg for other_reg, other_source in moves[:index] + moves[index + 1:]):
+                    self.mov(reg, source)
+                    del moves[index]
+                    break
+            else:
+                # rdi and rsi swap places. one goes by scratch
+                reg = moves[0][0]
+                self.mov(SCRATCH_REG_0, reg)
+                moves = [(other_reg, SCRATCH_REG_0 if source == reg else source) for other_reg, source in moves]
+
+    def lower_call(self, instr, position, dst):
+        # system v abi
+        # rdi rsi rdx rcx r8 r9 then the area at rsp. 16-aligned at call. al = 0 vector args for printf.
+
+        saved_regs = self.live_across(position)
+        for reg in saved_regs:
+            self.write(f'mov {self.save_addresses[reg]}, {reg} ; save live vreg')
+
+        for index, arg in enumerate(instr.args[len(ARG_REGS):]):
+            self.mov(f'qword ptr [rsp + {8 * index}]', self.operand(arg))
+
+        self.move_args([(reg, self.operand(arg)) for reg, arg in zip(ARG_REGS, instr.args)])
+
+        self.write('xor eax, eax ; no vector args')
+        self.write(f'call {instr.data}')
+
+        for reg in saved_regs:
+            self.write(f'mov {reg}, {self.save_addresses[reg]} ; recover live vreg')
+
+        self.mov(dst, 'rax')
+
+
+class LinuxLowering(Lowering):
+    # linux x86-64. gnu as and the system v abi. cranks_libc_linux.s has _start, print and printf
+    asm_ext = 's'
+    comment = '#'
+    function_lowering = LinuxFunctionLowering
+    data_start = ['    .intel_syntax noprefix', '    .data', '']
+    qword = '.quad'
+    code_start = ['', '    .text', '']
+    code_end = ['    .section .note.GNU-stack,"",@progbits', '']
+
+    def data_label(self, name, text):
+        return f'{name}: {text}'
+
+    def hex_value(self, value):
+        return f'0x{value:x}'
+
+    def zero_bytes(self, size):
+        return f'.zero {size}'
+
+    def string_bytes(self, text):
+        return f'.asciz {gas_string(text)}'
+
+    def extern(self, name):
+        return f'    .extern {name}'
+
+    def extern_data(self, name):
+        return f'    .extern {name}'
+
+    def public(self, name):
+        return f'    .globl {name}'
+
+    def finish_code(self, lines):
+        # ; comments to #. label:: to label:
+        finished = []
+        for line in lines:
+            code, separator, comment = line.partition(' ; ')
+            if not separator and code.strip().startswith(';'):
+                code, separator, comment = code.partition(';')
+                separator = '# '
+                comment = comment.lstrip()
+            elif separator:
+                separator = ' # '
+
+            if code.endswith('::'):
+                code = code[:-1]
+
+            finished.append(f'{code}{separator}{comment}')
+
+        return finished
@@ -0,0 +1,63 @@
+# cranks c compiler
+# packrat memo table for the grammar methods.
+
+import collections
+
+
+class PackratCache:
+    # key = (rule, token index, typedef scope version, args)
+    # value = (result, token index after, lineno after)
+
+    # least recently used entries are evicted once max_size is reached.
+    # results that changed typedef scopes are not stored. replaying them would skip the change.
+
+    def __init__(self, max_size = 100000):
+        self.max_size = max_size
+        self.table = collections.OrderedDict()
+        self.stats = {} # rule -> {'hit', 'miss', 'skip', 'evict'}
+
+    def __len__(self):
+        return len(self.table)
+
+    def clear(self):
+        self.table.clear()
+        self.stats = {}
+
+    def rule_stats(self, rule):
+        stats = self.stats.get(rule, None)
+        if stats is None:
+            stats = {'hit':0, 'miss':0, 'skip':0, 'evict':0}
+            self.stats[rule] = stats
+
+        return stats
+
+    def get(self, key):
+        entry = self.table.get(key, None)
+        if entry is None:
+            self.rule_stats(key[0])['miss'] += 1
+            return None
+
+        self.table.move_to_end(key)
+        self.rule_stats(key[0])['hit'] += 1
+        return entry
+
+    def put(self, key, entry):
+        self.table[key] = entry
+
+        while len(self.table) > self.max_size:
+            old_key, _ = self.table.popitem(last = False)
+            self.rule_stats(old_key[0])['evict'] += 1
+
+    def skip(self, rule):
+        self.rule_stats(rule)['skip'] += 1
+
+    def report(self):
+        lines = [f'packrat size = {len(self.table)} max_size = {self.max_size}',
+                 f'{"rule":<36}{"hit":>10}{"miss":>10}{"skip":>10}{"evict":>10}{"hit rate":>10}']
+
+        for rule, stats in sorted(self.stats.items(), key = lambda x: -x[1]['hit']):
+            total = stats['hit'] + stats['miss']
+            rate = stats['hit'] / total if total else 0
+            lines.append(f'{rule:<36}{stats["hit"]:>10}{stats["miss"]:>10}{stats["skip"]:>10}{stats["evict"]:>10}{rate:>10.1%}')
+
+        return '\n'.join(lines)
@@ -0,0 +1,287 @@
+# cranks c compiler
+# peephole optimizer over the masm lines of the code section.
+
+# rules look at a few neighbouring lines and rewrite them. repeat until nothing changes.
+# proc, endp and blank lines are barriers. no rule looks across them.
+# flags set by add are never read by the lowered code. only cmp feeds setcc and jcc.
+
+import re
+
+from compiler.regalloc import BYTE_REGS
+
+JUMP_CMDS = {'jmp', 'je', 'jne', 'jl', 'jg', 'jle', 'jge', 'ja'}
+
+# every name of the same register
+REG_NAMES = {reg: {reg, byte} for reg, byte in BYTE_REGS.items()}
+for reg in ['rax', 'rbx', 'rcx', 'rdx']:
+    REG_NAMES[reg] |= {'e' + reg[1:], reg[1:], reg[1] + 'h'}
+for reg in ['rsi', 'rdi']:
+    REG_NAMES[reg] |= {'e' + reg[1:], reg[1:]}
+for reg in ['r8', 'r9', 'r10', 'r11', 'r12', 'r13', 'r14', 'r15']:
+    REG_NAMES[reg] |= {reg + 'd', reg + 'w'}
+
+FRAME_ADDRESS = re.compile(r'^\[rbp ([+-]) (\d+)\]$')
+
+
+class Line:
+    # kind is 'label', 'instr' or 'other'
+    # a public label:: is used from outside the code. a switch table.
+
+    __slots__ = ('kind', 'text', 'cmd', 'operands', 'comment', 'public')
+
+    def __init__(self, text):
+        self.text = text
+        self.cmd = None
+        self.operands = []
+        self.comment = ''
+        self.public = False
+
+        code = text.strip()
+        if ' ; ' in code:
+            code, self.comment = code.split(' ; ', 1)
+        elif code.startswith(';'):
+            code = ''
+
+        if code.endswith(':') and ' ' not in code:
+            self.kind = 'label'
+            self.cmd = code.rstrip(':')
+            self.public = code.endswith('::')
+        elif code == '' or code.endswith(' proc') or code.endswith(' endp') or code.startswith('.'):
+            self.kind = 'other'
+        else:
+            self.kind = 'instr'
+            parts = code.split(' ', 1)
+            self.cmd = parts[0]
+            if len(parts) > 1:
+                self.operands = [operand.strip() for operand in parts[1].split(',')]
+
+    @classmethod
+    def instr(cls, cmd, operands, comment = ''):
+        text = f'    {cmd} {", ".join(operands)}'
+        if comment:
+            text += f' ; {comment}'
+
+        return cls(text)
+
+    def is_instr(self, *cmds):
+        return self.kind == 'instr' and self.cmd in cmds
+
+
+def is_register(operand):
+    return operand in REG_NAMES
+
+
+def is_immediate(operand):
+    return operand.lstrip('-').isdigit()
+
+
+def mentions(operand, reg):
+    # operand reads or names any part of reg
+    return any(word in REG_NAMES[reg] for word in re.findall(r'\w+', operand))
+
+
+def writes_only(line, reg):
+    # line sets all of reg without reading it
+    return (line.is_instr('mov', 'lea') and line.operands[0] == reg
+            and not mentions(line.operands[1], reg))
+
+
+class Peephole:
+    def __init__(self, lines = ()):
+        self.lines = [Line(text) for text in lines]
+        self.stats = {}
+
+        # in order. each takes the lines and the index and returns
+        # (number of lines replaced, new lines) or None
+        self.rules = [
+            ('self mov', self.self_mov),
+            ('mov back', self.mov_back),
+            ('dead mov', self.dead_mov),
+            ('dead store', self.dead_store),
+            ('rsp pair', self.rsp_pair),
+            ('add chain', self.add_chain),
+            ('lea add', self.lea_add),
+            ('lea load', self.lea_load),
+            ('jmp next', self.jmp_next),
+            ('unreachable', self.unreachable),
+        ]
+
+    def optimize(self, lines):
+        # one more piece of code. a function. the stats add up
+        self.lines = [Line(text) for text in lines]
+        return self.run()
+
+    def run(self):
+        changed = True
+        while changed:
+            changed = self.thread_jumps()
+            changed = self.remove_labels() or changed
+
+            new_lines = []
+            index = 0
+            while index < len(self.lines):
+                for name, rule in self.rules:
+                    result = rule(self.lines, index)
+                    if result is not None:
+                        count, replacement = result
+                        self.stats[name] = self.stats.get(name, 0) + 1
+                        new_lines += replacement
+                        index += count
+                        changed = True
+                        break
+                else:
+                    new_lines.append(self.lines[index])
+                    index += 1
+
+            self.lines = new_lines
+
+        return [line.text for line in self.lines]
+
+    def report(self):
+        if not self.stats:
+            return 'no hits'
+
+        return ' '.join(f'[{name}] = {count}' for name, count in self.stats.items())
+
+    def pair(self, lines, index):
+        # two instructions in a row or None
+        if index + 1 < len(lines) and lines[index].kind == 'instr' and lines[index + 1].kind == 'instr':
+            return lines[index], lines[index + 1]
+
+        return None
+
+    def self_mov(self, lines, index):
+        # mov r10, r10
+        line = lines[index]
+        if line.is_instr('mov') and line.operands[0] == line.operands[1]:
+            return 1, []
+
+    def mov_back(self, lines, index):
+        # mov qword ptr [rbp - 8], r10
+        # mov r10, qword ptr [rbp - 8]      both hold the same value already
+        pair = self.pair(lines, index)
+        if pair and pair[0].is_instr('mov') and pair[1].is_instr('mov'):
+            first, second = pair
+            if first.operands == second.operands[::-1]:
+                # the register must not be part of the address. the first mov may have changed it
+                for reg, other in [first.operands, first.operands[::-1]]:
+                    if is_register(reg) and not mentions(other, reg):
+                        return 2, [first]
+
+    def dead_mov(self, lines, index):
+        # mov r10, rax
+        # lea r10, string_1                 the first value is never read
+        pair = self.pair(lines, index)
+        if pair and pair[0].is_instr('mov', 'lea') and is_register(pair[0].operands[0]):
+            if writes_only(pair[1], pair[0].operands[0]):
+                return 2, [pair[1]]
+
+    def dead_store(self, lines, index):
+        # mov qword ptr [rbp - 8], r10
+        # mov qword ptr [rbp - 8], 666      the first store is never read
+        pair = self.pair(lines, index)
+        if pair and pair[0].is_instr('mov') and pair[1].is_instr('mov'):
+            first, second = pair
+            if 'ptr' in first.operands[0] and first.operands[0] == second.operands[0] and 'ptr' not in second.operands[1]:
+                return 2, [second]
+
+    def rsp_pair(self, lines, index):
+        # add rsp, 32
+        # sub rsp, 32
+        pair = self.pair(lines, index)
+        if pair and pair[0].is_instr('add', 'sub') and pair[1].is_instr('add', 'sub') and pair[0].cmd != pair[1].cmd:
+            if pair[0].operands[0] == 'rsp' and pair[0].operands == pair[1].operands:
+                return 2, []
+
+    def add_chain(self, lines, index):
+        # add r10, 8320
+        # add r10, 1664                     add r10, 9984
+        pair = self.pair(lines, index)
+        if pair and pair[0].is_instr('add') and pair[1].is_instr('add') and pair[0].operands[0] == pair[1].operands[0]:
+            first, second = pair
+            if is_immediate(first.operands[1]) and is_immediate(second.operands[1]) and first.operands[0] != 'rsp':
+                value = int(first.operands[1]) + int(second.operands[1])
+                if -2 ** 31 <= value < 2 ** 31:
+                    return 2, [Line.instr('add', [first.operands[0], str(value)], first.comment)]
+
+    def lea_add(self, lines, index):
+        # lea r10, [rbp - 832]
+        # add r10, 24                       lea r10, [rbp - 808]
+        pair = self.pair(lines, index)
+        if pair and pair[0].is_instr('lea') and pair[1].is_instr('add') and pair[0].operands[0] == pair[1].operands[0]:
+            first, second = pair
+            match = FRAME_ADDRESS.match(first.operands[1])
+            if match and is_immediate(second.operands[1]):
+                offset = int(match.group(2)) * (1 if match.group(1) == '+' else -1) + int(second.operands[1])
+                if -2 ** 31 <= offset < 2 ** 31:
+                    address = f'[rbp + {offset}]' if offset >= 0 else f'[rbp - {-offset}]'
+                    return 2, [Line.instr('lea', [first.operands[0], address], first.comment)]
+
+    def lea_load(self, lines, index):
+        # lea r10, [rbp - 808]
+        # mov r10, qword ptr [r10]          mov r10, qword ptr [rbp - 808]
+        pair = self.pair(lines, index)
+        if pair and pair[0].is_instr('lea') and pair[1].is_instr('mov'):
+            first, second = pair
+            reg = first.operands[0]
+            if second.operands == [reg, f'qword ptr [{reg}]']:
+                return 2, [Line.instr('mov', [reg, f'qword ptr {first.operands[1]}'], first.comment)]
+
+    def jmp_next(self, lines, index):
+        # jmp if_over_3
+        # if_over_3:
+        line = lines[index]
+        if line.is_instr('jmp'):
+            next_index = index + 1
+            while next_index < len(lines) and lines[next_index].kind == 'label':
+                if lines[next_index].cmd == line.operands[0]:
+                    return 1, []
+
+                next_index += 1
+
+    def unreachable(self, lines, index):
+        # code after jmp or ret up to the next label
+        line = lines[index]
+        if line.is_instr('jmp', 'ret') and index + 1 < len(lines) and lines[index + 1].kind == 'instr':
+            return 2, [line]
+
+    def thread_jumps(self):
+        # a jump to a label that only jumps on goes straight to the end of the chain
+        targets = {}
+        for index, line in enumerate(self.lines):
+            if line.kind == 'label':
+                next_index = index + 1
+                while next_index < len(self.lines) and self.lines[next_index].kind == 'label':
+                    next_index += 1
+
+                if next_index < len(self.lines) and self.lines[next_index].is_instr('jmp'):
+                    targets[line.cmd] = self.lines[next_index].operands[0]
+
+        changed = False
+        for index, line in enumerate(self.lines):
+            if line.kind == 'instr' and line.cmd in JUMP_CMDS:
+                label = line.operands[0]
+                seen = {label}
+                while label in targets and targets[label] not in seen:
+                    label = targets[label]
+                    seen.add(label)
+
+                if label != line.operands[0]:
+                    self.lines[index] = Line.instr(line.cmd, [label], line.comment)
+                    self.stats['jump thread'] = self.stats.get('jump thread', 0) + 1
+                    changed = True
+
+        return changed
+
+    def remove_labels(self):
+        # labels no jump goes to
+        used = {line.operands[0] for line in self.lines if line.kind == 'instr' and line.cmd in JUMP_CMDS}
+
+        lines = [line for line in self.lines if line.kind != 'label' or line.cmd in used or line.public]
+        removed = len(self.lines) - len(lines)
+        self.lines = lines
+
+        if removed:
+            self.stats['dead label'] = self.stats.get('dead label', 0) + removed
+
+        return removed > 0
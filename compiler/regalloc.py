@@ -0,0 +1,74 @@
+# cranks c compiler
+# register allocation for ir virtual registers.
+
+# classic linear scan (poletto and sarkar). intervals come from liveness over the
+# linearized blocks of a function. walk them by start point, expire the ones that ended,
+# and when the pool is empty spill the active interval that ends furthest away.
+
+# registers in the pool are caller saved. a call saves the ones live across it.
+
+BYTE_REGS = {'rax':'al', 'rbx':'bl', 'rcx':'cl', 'rdx':'dl', 'rsi':'sil', 'rdi':'dil',
+             'r8':'r8b', 'r9':'r9b', 'r10':'r10b', 'r11':'r11b', 'r12':'r12b', 'r13':'r13b', 'r14':'r14b', 'r15':'r15b'}
+
+
+class Interval:
+    # reg is None when spilled. lowering gives it a stack slot then.
+
+    __slots__ = ('vreg', 'start', 'end', 'reg')
+
+    def __init__(self, vreg, start, end):
+        self.vreg = vreg
+        self.start = start
+        self.end = end
+        self.reg = None
+
+    def __repr__(self):
+        return f'Interval({self.vreg}, {self.start}, {self.end}, {self.reg or "spill"})'
+
+
+class LinearScan:
+    def __init__(self, pool):
+        self.pool = list(pool)
+        self.stats = {'intervals':0, 'spill':0, 'max_live':0}
+
+    def allocate(self, intervals):
+        # sets reg on every interval. returns the spilled ones
+
+        self.stats = {'intervals':len(intervals), 'spill':0, 'max_live':0}
+
+        free = list(self.pool) # lowest first. keeps the output stable
+        active = [] # ordered by end
+        spilled = []
+
+        for interval in sorted(intervals, key = lambda i: (i.start, i.vreg.id)):
+            # an interval that ends where this one starts can hand over its register.
+            # lowering reads the operands of an instruction before it writes the result.
+            while active and active[0].end <= interval.start:
+                free.append(active.pop(0).reg)
+
+            free.sort(key = self.pool.index)
+
+            if free:
+                interval.reg = free.pop(0)
+            else:
+                victim = active[-1]
+                if victim.end > interval.end:
+                    interval.reg = victim.reg
+                    victim.reg = None
+                    active.pop()
+                    spilled.append(victim)
+                else:
+                    spilled.append(interval)
+
+            if interval.reg:
+                active.append(interval)
+                active.sort(key = lambda i: i.end)
+
+            self.stats['max_live'] = max(self.stats['max_live'], len(active))
+
+        self.stats['spill'] = len(spilled)
+
+        return spilled
+
+    def report(self):
+        return f'intervals = {self.stats["intervals"]} spilled = {self.stats["spill"]} max live = {self.stats["max_live"]}'
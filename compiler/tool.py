@@ -1,5 +1,8 @@
 PRINT_INDENT = 2
 
+# python -O is production mode. debug logging is compiled out.
+DEBUG_LOG = __debug__
+
 
 class Color:
     ok = '\33[38;5;34m' # 2 34 35
@@ -29,4 +32,45 @@ class CodeError(Exception):
     def __str__(self):
         return self.msg
         # print(repr(self.msg))
-        # return repr(self.msg)
\ No newline at end of file
+        # return repr(self.msg)
+
+
+def format_log(text, args = (), color = ''):
+    # text is a str.format template or a callable returning the message
+    if callable(text):
+        text = text()
+    elif args:
+        text = text.format(*args)
+
+    if color:
+        return f'{color}{text}{Color.end}'
+
+    return f'{text}'
+
+
+class DebugLog:
+    # debug output by channel. lexer, parser, ir and codegen.
+
+    # messages are built only when their channel is on. a call like
+    # write('parser', 'return {}', tu) never formats tu in a silent build.
+
+    # print_on is the master switch. stage is the channel used by
+    # components, which print while parsing and while generating asm.
+
+    def __init__(self):
+        self.print_on = True
+        self.channels = {'lexer': False, 'parser': DEBUG_LOG, 'ir': False, 'codegen': DEBUG_LOG}
+        self.stage = 'parser'
+
+    def set_channel_on_off(self, channel, on_off):
+        if channel not in self.channels:
+            raise CompilerError(f'unknown log channel {channel}')
+
+        self.channels[channel] = on_off and DEBUG_LOG
+
+    def enabled(self, channel = None):
+        return self.print_on and self.channels[channel or self.stage]
+
+    def write(self, channel, text, args = (), color = ''):
+        if self.print_on and self.channels[channel or self.stage]:
+            print(format_log(text, args, color))
@@ -1,4 +1,5 @@
 import argparse
+import sys
 import traceback
 import compiler.compiler as compiler
 
@@ -8,16 +9,34 @@ if __name__ == '__main__':
         default_win_sdk_lib_path = 'C:/Program Files (x86)/Windows Kits/10/Lib/10.0.22621.0/um/x64/'
 
         parser = argparse.ArgumentParser()
-        parser.add_argument('source_file_name', help = 'default = test.c', nargs = '?', default = 'test.c')
+        parser.add_argument('source_file_names', help = 'one or more. each is a translation unit. default = test.c', nargs = '*', default = ['test.c'])
         parser.add_argument('--ml64_path', help = f'where is ml64.exe?\ndefault = {default_ml64_path} need quotes', default = default_ml64_path)
         parser.add_argument('--win_sdk_lib_path', help = f'where are windows sdk libs such as kernel32.lib?\ndefault = {default_win_sdk_lib_path}', default = default_win_sdk_lib_path)
+        parser.add_argument('--target', help = 'windows: ml64 and the microsoft abi. linux: gnu as, ld and the system v abi. default = the os running this', choices = ['windows', 'linux'], default = 'linux' if sys.platform.startswith('linux') else 'windows')
+        parser.add_argument('--jobs', help = 'run the tests and compile the source files over this many processes. default = 1', type = int, default = 1)
+        parser.add_argument('--packrat', help = 'memoize grammar rules. value is max cache entries. default = 0 (off)', type = int, default = 0)
+        parser.add_argument('--compile_cache', help = 'keep compiled programs in output/cache/compile. value is max megabytes. default = 0 (off)', type = int, default = 0)
+        parser.add_argument('--function_cache', help = 'keep the asm of each function in output/cache/function. value is max megabytes. default = 0 (off)', type = int, default = 0)
+        parser.add_argument('--log', help = 'debug log channels. any of lexer,parser,ir,codegen. default = parser,codegen. python -O turns all off', default = 'parser,codegen')
 
         args = parser.parse_args()
         print(args)
 
-        c = compiler.Compiler(args.ml64_path, args.win_sdk_lib_path)
+        c = compiler.Compiler(args.ml64_path, args.win_sdk_lib_path, args.target)
+        if args.packrat > 0:
+            c.set_packrat_on_off(True, args.packrat)
+        if args.compile_cache > 0:
+            c.set_compile_cache_on_off(True, args.compile_cache << 20)
+        if args.function_cache > 0:
+            c.set_function_cache_on_off(True, args.function_cache << 20)
+        log_channels = args.log.split(',')
+        for channel in ('lexer', 'parser', 'ir', 'codegen'):
+            c.set_log_channel_on_off(channel, channel in log_channels)
         c.simple_self_test()
-        c.run_tests()
-        c.compile_and_run(args.source_file_name)
+        c.run_tests(args.jobs)
+        if len(args.source_file_names) > 1:
+            c.compile_files(args.source_file_names, args.jobs)
+        else:
+            c.compile_and_run(args.source_file_names[0])
     except:
         traceback.print_exc()
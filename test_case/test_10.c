@@ -0,0 +1,88 @@
+int print(char *s);
+int printf(char *s, ...);
+
+// deep nesting. each level used to cost a dozen python frames in the parser.
+
+int parens(int a){
+    return ((((((((((((((((((((a + 1) + 2) + 3) + 4) + 5) + 6) + 7) + 8) + 9) + 10) + 11) + 12) + 13) + 14) + 15) + 16) + 17) + 18) + 19) + 20);
+}
+
+int blocks(int b){
+    int c = 0;
+    if (b > 0) {
+        if (b > 1) {
+            if (b > 2) {
+                if (b > 3) {
+                    if (b > 4) {
+                        if (b > 5) {
+                            if (b > 6) {
+                                if (b > 7) {
+                                    if (b > 8) {
+                                        if (b > 9) {
+                                            if (b > 10) {
+                                                if (b > 11) {
+                                                    if (b > 12) {
+                                                        if (b > 13) {
+                                                            if (b > 14) {
+                                                                if (b > 15) {
+                                                                    if (b > 16) {
+                                                                        if (b > 17) {
+                                                                            if (b > 18) {
+                                                                                if (b > 19) {
+                                                                                    if (b > 20) {
+                                                                                        if (b > 21) {
+                                                                                            if (b > 22) {
+                                                                                                if (b > 23) {
+                                                                                                    if (b > 24) {
+                                                                                                        if (b > 25) {
+                                                                                                            if (b > 26) {
+                                                                                                                if (b > 27) {
+                                                                                                                    if (b > 28) {
+                                                                                                                        if (b > 29) {
+                                                                                                                            c = b;
+                                                                                                                        }
+                                                                                                                    }
+                                                                                                                }
+                                                                                                            }
+                                                                                                        }
+                                                                                                    }
+                                                                                                }
+                                                                                            }
+                                                                                        }
+                                                                                    }
+                                                                                }
+                                                                            }
+                                                                        }
+                                                                    }
+                                                                }
+                                                            }
+                                                        }
+                                                    }
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+    return c;
+}
+
+int main(){
+    printf("parens = %d\n", parens(1));
+
+    int i = 0;
+    int sum = 0;
+    while (i < 3) {
+        sum = sum + blocks(100 + i);
+        i = i + 1;
+    }
+    printf("blocks = %d %d\n", sum, blocks(3));
+
+    return 0;
+}
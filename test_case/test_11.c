@@ -0,0 +1,75 @@
+int print(char *s);
+int printf(char *s, ...);
+
+// constants known at compile time. sizeof, const globals, locals assigned once.
+
+const int WIDTH = 16;
+const int HEIGHT = WIDTH / 2;
+int counter = 3;
+
+struct S1 {
+    int a, b, c;
+    int array[10];
+};
+
+typedef struct S1 TS1;
+typedef int *PI;
+
+int sizes(){
+    int a;
+    int *p;
+    int arr[4][5];
+    struct S1 s1;
+    TS1 ts[3];
+
+    printf("sizes %d %d %d %d %d\n", sizeof(int), sizeof(int *), sizeof(struct S1), sizeof(TS1), sizeof(PI));
+    printf("sizes %d %d %d %d %d %d\n", sizeof a, sizeof(p), sizeof arr, sizeof arr[1], sizeof s1, sizeof ts);
+    printf("sizes %d %d\n", sizeof(int *[3]), sizeof(int[2][3]));
+
+    // not evaluated
+    sizeof(counter++);
+    printf("sizes counter = %d\n", counter);
+
+    int table[sizeof(struct S1) / 8];
+    printf("sizes table = %d\n", sizeof table);
+}
+
+int propagate(int x){
+    int area = WIDTH * HEIGHT;
+    int half = area / 2;
+    int shift = half >> 3;
+    int mask = (shift << 4) | 5;
+
+    printf("propagate %d %d %d %d\n", area, half, shift, mask);
+
+    int debug = 0;
+    if (debug) {
+        printf("propagate never\n");
+    }
+
+    int step = 2;
+    if (x > 0) {
+        step = 2;
+    } else {
+        step = 2;
+    }
+
+    // step is 2 on both paths
+    printf("propagate step = %d\n", x * step + mask);
+
+    int total = 0;
+    int i;
+    for (i = 0; i < 4; i++) {
+        total = total + WIDTH;
+    }
+
+    printf("propagate total = %d\n", total);
+}
+
+int main(){
+    sizes();
+    propagate(7);
+    propagate(-1);
+
+    return 0;
+}
@@ -0,0 +1,67 @@
+int print(char *s);
+int printf(char *s, ...);
+
+// conditions jump. && and || stop at the first item that decides.
+
+int calls = 0;
+
+int check(int id, int result){
+    calls = calls * 10 + id;
+    return result;
+}
+
+int conditions(int a, int b){
+    int *p = 0;
+    int n = 3;
+
+    if (p != 0 && *p == 3) {
+        printf("conditions never\n");
+    }
+
+    p = &n;
+    if (p != 0 && *p == 3) {
+        printf("conditions p = %d\n", *p);
+    }
+
+    calls = 0;
+    if (check(1, 1) && check(2, 0) && check(3, 1)) {
+        printf("conditions never\n");
+    }
+    printf("conditions && calls = %d\n", calls);
+
+    calls = 0;
+    if (check(1, 0) || check(2, 1) || check(3, 1)) {
+        printf("conditions || calls = %d\n", calls);
+    }
+
+    calls = 0;
+    if (check(1, 0) && check(2, 1) || check(3, 1) && check(4, 1)) {
+        printf("conditions mixed calls = %d\n", calls);
+    }
+
+    int count = 0;
+    int i = 0;
+    while (i < a && i != b) {
+        count++;
+        i++;
+    }
+
+    int j;
+    for (j = 10; j >= 0 || j == -5; j = j - 1) {
+        count = count + 100;
+    }
+
+    do {
+        count = count + 1000;
+        a--;
+    } while (a > 0 && (a <= 2 || a == 7));
+
+    printf("conditions count = %d\n", count);
+}
+
+int main(){
+    conditions(5, 3);
+    conditions(3, 9);
+
+    return 0;
+}
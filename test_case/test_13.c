@@ -0,0 +1,100 @@
+int print(char *s);
+int printf(char *s, ...);
+
+// switch. dense cases use a jump table, sparse ones a binary search, a few a compare chain.
+
+const int BASE = 100;
+
+int dense(int x){
+    int r = 0;
+    switch (x) {
+        case 0: r = 10; break;
+        case 1: r = 11; break;
+        case 2: r = 12;
+        case 3: r = r + 13; break;
+        case 5: r = 15; break;
+        case 6: r = 16; break;
+        default: r = -1; break;
+        case 7: r = 17; break;
+        case 8: r = 18;
+    }
+    return r;
+}
+
+int sparse(int x){
+    switch (x) {
+        case -1000: return 1;
+        case -7: return 2;
+        case 3: return 3;
+        case 99: return 4;
+        case BASE + 1: return 5;
+        case 5000: return 6;
+        case 70000: return 7;
+        case 123456: return 8;
+        case 999999: return 9;
+    }
+    return 0;
+}
+
+int tiny(int x){
+    int r = 5;
+    switch (x) {
+        case 1:
+            r = r * 2;
+        case 2:
+            r = r + 1;
+            break;
+        default:
+            r = 0;
+    }
+    return r;
+}
+
+int nested(int a, int b){
+    switch (a) {
+        case 1:
+            switch (b) {
+                case 1: return 11;
+                case 2: return 12;
+                case 3: return 13;
+                case 4: return 14;
+                default: break;
+            }
+            return 10;
+        case 2: {
+            int i;
+            int s = 0;
+            for (i = 0; i < b; i++) {
+                switch (i) {
+                    case 0: s = s + 1; break;
+                    case 1: s = s + 10; break;
+                    default: s = s + 100;
+                }
+            }
+            return s;
+        }
+    }
+    return -1;
+}
+
+int main(){
+    int i;
+    for (i = -1; i < 10; i++) {
+        printf("dense %d = %d\n", i, dense(i));
+    }
+
+    printf("sparse %d %d %d %d %d\n", sparse(-1000), sparse(-7), sparse(3), sparse(99), sparse(101));
+    printf("sparse %d %d %d %d %d %d\n", sparse(5000), sparse(70000), sparse(123456), sparse(999999), sparse(4), sparse(-8));
+
+    printf("tiny %d %d %d\n", tiny(1), tiny(2), tiny(3));
+
+    printf("nested %d %d %d %d\n", nested(1, 2), nested(1, 4), nested(1, 9), nested(3, 1));
+    printf("nested %d %d\n", nested(2, 2), nested(2, 5));
+
+    switch (3) {
+        case 3: print("const 3\n"); break;
+        default: print("const never\n");
+    }
+
+    return 0;
+}
@@ -0,0 +1,94 @@
+int print(char *s);
+int printf(char *s, ...);
+
+// break and continue jump straight out of the loop or to its next round.
+
+int a[6];
+
+int find(int n, int x){
+    int i;
+    for (i = 0; i < n; i++) {
+        if (a[i] == x) {
+            break;
+        }
+    }
+    return i;
+}
+
+int loops(int n){
+    int i = 0;
+    int s = 0;
+
+    while (1) {
+        i++;
+        if (i > n) {
+            break;
+        }
+        if (i % 2 == 0) {
+            continue;
+        }
+        s = s + i;
+    }
+    printf("while %d %d\n", i, s);
+
+    i = 0;
+    s = 0;
+    do {
+        i++;
+        if (i == 3) {
+            continue;
+        }
+        s = s + i;
+    } while (i < n);
+    printf("do %d %d\n", i, s);
+
+    s = 0;
+    int j;
+    for (i = 0; i < n; i++) {
+        for (j = 0; ; j++) {
+            if (j >= i) {
+                break;
+            }
+            if (j == 1) {
+                continue;
+            }
+            s = s + 1;
+        }
+        if (i == 6) {
+            break;
+        }
+    }
+    printf("for %d %d\n", i, s);
+
+    s = 0;
+    for (i = 0; i < n; i++) {
+        switch (i % 3) {
+            case 0:
+                continue;
+            case 1:
+                s = s + 1;
+                break;
+            default:
+                if (i > 7) {
+                    break;
+                }
+                s = s + 100;
+        }
+        s = s + 1000;
+    }
+    printf("switch %d %d\n", i, s);
+}
+
+int main(){
+    int k;
+    for (k = 0; k < 6; k++) {
+        a[k] = k * k;
+    }
+
+    printf("find %d %d %d\n", find(6, 9), find(6, 25), find(6, 7));
+
+    loops(10);
+    loops(4);
+
+    return 0;
+}
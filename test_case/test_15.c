@@ -0,0 +1,84 @@
+int print(char *s);
+int printf(char *s, ...);
+
+// loops over arrays. invariant parts of the index move out. i * stride becomes a pointer that steps.
+
+int m[6][5];
+int v[20];
+
+int fill(){
+    int i;
+    int j;
+    for (i = 0; i < 6; i++) {
+        for (j = 0; j < 5; j++) {
+            m[i][j] = i * 10 + j;
+        }
+    }
+}
+
+int sums(int k){
+    int i;
+    int j;
+    int s = 0;
+    for (i = 0; i < 5; i++) {
+        for (j = 0; j < 5; j++) {
+            s = s + m[i][j] * m[j][i] + k * 2;
+        }
+    }
+    printf("sums %d\n", s);
+
+    s = 0;
+    for (i = 5; i >= 0; i = i - 2) {
+        j = 4;
+        do {
+            s = s + m[i][j];
+            j--;
+        } while (j > 0);
+    }
+    printf("sums down %d\n", s);
+}
+
+int steps(){
+    int i;
+    int n = 0;
+    for (i = 0; i < 20; i++) {
+        v[i] = i * 3;
+    }
+
+    // i changes twice a round. not a simple step
+    int s = 0;
+    i = 0;
+    while (i < 20) {
+        s = s + v[i];
+        i = i + 1;
+        if (i % 4 == 0) {
+            i = i + 3;
+        }
+    }
+    printf("steps %d\n", s);
+
+    // the index is read before i goes up
+    s = 0;
+    i = 0;
+    while (i < 19) {
+        s = s + v[i++];
+    }
+    printf("steps post %d\n", s);
+
+    s = 0;
+    for (i = 0; i < 20; i++) {
+        if (v[i] % 2) {
+            continue;
+        }
+        s = s + v[i] + v[19 - i];
+    }
+    printf("steps continue %d\n", s);
+}
+
+int main(){
+    fill();
+    sums(3);
+    steps();
+
+    return 0;
+}
@@ -0,0 +1,71 @@
+int print(char *s);
+int printf(char *s, ...);
+
+// small leaf functions are copied into their callers.
+
+int grid[4][4];
+
+int get(int i, int j){
+    return grid[i][j];
+}
+
+int set(int i, int j, int value){
+    grid[i][j] = value;
+}
+
+int clamp(int x, int low, int high){
+    if (x < low) {
+        return low;
+    }
+    if (x > high) {
+        return high;
+    }
+    return x;
+}
+
+int swap(int *a, int *b){
+    int t = *a;
+    *a = *b;
+    *b = t;
+}
+
+int twice(int x){
+    int *p = &x;
+    *p = *p * 2;
+    return x;
+}
+
+// calls something. never inlined
+int fact(int n){
+    if (n <= 1) {
+        return 1;
+    }
+    return n * fact(n - 1);
+}
+
+int main(){
+    int i;
+    int j;
+    int s = 0;
+    for (i = 0; i < 4; i++) {
+        for (j = 0; j < 4; j++) {
+            set(i, j, i * 4 + j);
+        }
+    }
+    for (i = 0; i < 4; i++) {
+        s = s + get(i, 3 - i);
+    }
+    printf("get %d\n", s);
+
+    printf("clamp %d %d %d\n", clamp(-5, 0, 10), clamp(5, 0, 10), clamp(50, 0, 10));
+
+    int x = 3;
+    int y = 8;
+    swap(&x, &y);
+    printf("swap %d %d\n", x, y);
+
+    printf("twice %d %d\n", twice(21), twice(twice(x)));
+    printf("fact %d\n", fact(6));
+
+    return 0;
+}
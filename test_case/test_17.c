@@ -0,0 +1,54 @@
+int print(char *s);
+int printf(char *s, ...);
+
+// dead code. functions main never calls, code after return, stores nobody reads.
+
+int unused(int x){
+    printf("unused never\n");
+    return x * 2;
+}
+
+int unused_too(){
+    return unused(3);
+}
+
+int after_return(int x){
+    return x + 1;
+    printf("after return never\n");
+    x = x * 100;
+    return x;
+}
+
+int stores(int n){
+    int a = 1;
+    int b = 2;
+    int last = 0;
+    int i;
+
+    a = 10; // the 1 is never read
+    for (i = 0; i < n; i++) {
+        b = last; // read by the next round
+        last = i * 3;
+    }
+
+    int t = a + b;
+    t = 7; // a + b is never read
+    printf("stores %d %d %d %d\n", a, b, last, t);
+
+    int k = 0;
+    while (1) {
+        k = k + 5;
+        if (k > 20) {
+            break;
+        }
+        k = k - 1;
+    }
+    printf("stores k = %d\n", k);
+}
+
+int main(){
+    printf("after return %d\n", after_return(4));
+    stores(5);
+
+    return 0;
+}
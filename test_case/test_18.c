@@ -0,0 +1,23 @@
+int printf(char *s, ...);
+
+// globals shared between translation units. test_18_lib.c is linked with this file.
+// counter and table are defined here. limit is defined there.
+
+int counter;
+int table[4];
+extern int limit;
+
+int bump(int n);
+int fill(int v);
+
+int main(){
+    counter = 5;
+    printf("bump %d\n", bump(3));
+    printf("counter %d\n", counter);
+
+    fill(7);
+    printf("table %d %d\n", table[0], table[3]);
+    printf("limit %d\n", limit);
+
+    return 0;
+}
@@ -0,0 +1,18 @@
+// the other translation unit of test_18.c
+
+extern int counter;
+extern int table[4];
+int limit = 42;
+
+int bump(int n){
+    counter = counter + n;
+    return counter;
+}
+
+int fill(int v){
+    int i;
+    for (i = 0; i < 4; i++) {
+        table[i] = v + i;
+    }
+    return 0;
+}
@@ -0,0 +1,27 @@
+int printf(char *s, ...);
+
+// operators between literals. folded the same way as the ir is. see constfold.fold_binary
+
+int g = 10 / 2 + 3 == 8;
+int h = 17 % 5 << 2;
+
+int main(){
+    int a = 3 == 3;
+    int b = 3 != 3;
+    int c = 2 != 3;
+    int d = 5 == 2;
+    int x = 7;
+
+    printf("eq %d %d %d %d %d\n", a, b, c, d, x == 7);
+    printf("global %d %d\n", g, h);
+
+    if (2 != 3) printf("2 != 3 then\n"); else printf("2 != 3 else\n");
+    if (3 == 3) printf("3 == 3 then\n"); else printf("3 == 3 else\n");
+    if (3 == 4) printf("3 == 4 then\n"); else printf("3 == 4 else\n");
+    if (4 != 4) printf("4 != 4 then\n"); else printf("4 != 4 else\n");
+
+    printf("logical %d %d %d\n", 2 || 0, 0 && 5, 3 && 4);
+    printf("arith %d %d %d\n", 7 / 2 % 3, 1 << 4, 256 >> 3);
+
+    return 0;
+}